@@ -0,0 +1,170 @@
+from typing import List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import prefetch_related_objects
+
+from booking.models import Booking
+from client.models import Client
+from company import rollups
+from company.models import Company
+from core import outbox, sharding
+from servicetype.models import ServiceType
+from slot.models import Slot, SlotTemplate
+from slot.templates import materialize_slot
+
+
+def _slot_error(slot: Optional[Slot], service_type: ServiceType) -> Optional[str]:
+    if slot is None:
+        return "Slot não encontrado"
+
+    if not slot.is_available:
+        return "Este slot não está disponível"
+
+    if service_type.company_id != slot.company_id:
+        return "O serviço deve pertencer à mesma empresa do slot"
+
+    if service_type.duration > slot.end_time - slot.start_time:
+        return "A duração do serviço excede o tempo disponível no slot"
+
+    return None
+
+
+def _template_error(template: Optional[SlotTemplate], service_type: ServiceType) -> Optional[str]:
+    if template is None:
+        return "Template não encontrado"
+
+    if service_type.company_id != template.company_id:
+        return "O serviço deve pertencer à mesma empresa do slot"
+
+    if service_type.duration > template.duration:
+        return "A duração do serviço excede o tempo disponível no slot"
+
+    return None
+
+
+def _claim(slot_ids) -> int:
+    return Slot.objects.filter(id__in=slot_ids, is_available=True).update(is_available=False)
+
+
+def _claim_free(slot_ids: set) -> set:
+    """
+    Toma os slots ainda livres e retorna quais foram tomados. O UPDATE de
+    todos roda num savepoint; se algum foi ocupado desde a leitura, ele é
+    desfeito e refeito só com os livres.
+    """
+    with sharding.atomic():
+        if _claim(slot_ids) == len(slot_ids):
+            return slot_ids
+        sharding.set_rollback(True)
+
+    free = set(Slot.objects.filter(id__in=slot_ids, is_available=True).values_list('id', flat=True))
+    _claim(free)
+    return free
+
+
+@sharding.atomic
+def book_batch(client: Client, items: list, atomic: bool = True) -> Tuple[List[dict], List[Booking]]:
+    """
+    Reserva vários slots para o mesmo cliente numa única transação.
+
+    Serviços, templates e slots são carregados com uma consulta cada, os slots
+    aceitos são tomados com um único UPDATE condicional e as reservas entram
+    com bulk_create. Com `atomic=True` qualquer item inválido cancela o lote
+    inteiro; caso contrário os itens válidos são reservados mesmo assim, e
+    um slot ocupado por outra requisição depois da leitura falha só o seu item.
+    Retorna o resultado de cada item, na ordem recebida, e as reservas criadas.
+    """
+    errors = {}
+    slot_ids = {}
+
+    service_types = ServiceType.objects.in_bulk({item.service_type_id for item in items})
+    # Empresas em remoção não recebem reservas (core.deletion as apagaria)
+    deleting = set(Company.objects.filter(
+        id__in={service_type.company_id for service_type in service_types.values()}, is_deleting=True
+    ).values_list('id', flat=True))
+    template_ids = {item.template_id for item in items if not item.slot_id and item.template_id}
+    templates = SlotTemplate.objects.prefetch_related('exceptions').in_bulk(template_ids) if template_ids else {}
+
+    for index, item in enumerate(items):
+        service_type = service_types.get(item.service_type_id)
+        if service_type is None:
+            errors[index] = "Tipo de serviço não encontrado"
+        elif service_type.company_id in deleting:
+            errors[index] = "A empresa deste serviço está sendo removida"
+        elif item.slot_id:
+            slot_ids[index] = item.slot_id
+        elif item.template_id and item.start_time:
+            # O slot só passa a existir no banco quando é reservado
+            template = templates.get(item.template_id)
+            errors[index] = _template_error(template, service_type)
+            if errors[index] is None:
+                try:
+                    with sharding.atomic():
+                        slot_ids[index] = materialize_slot(template, item.start_time).id
+                except ValidationError as e:
+                    errors[index] = e.messages[0]
+        else:
+            errors[index] = "Informe slot_id ou template_id com start_time"
+
+    slots = Slot.objects.select_for_update().in_bulk(set(slot_ids.values()))
+    claimed = set()
+    for index, slot_id in slot_ids.items():
+        if slot_id in claimed:
+            errors[index] = "Slot repetido no lote"
+            continue
+
+        errors[index] = _slot_error(slots.get(slot_id), service_types[items[index].service_type_id])
+        if errors[index] is None:
+            claimed.add(slot_id)
+
+    errors = {index: detail for index, detail in errors.items() if detail}
+    bookings = []
+
+    if errors and atomic:
+        sharding.set_rollback(True)
+        claimed = set()
+    elif claimed:
+        if atomic:
+            if _claim(claimed) != len(claimed):
+                raise ValidationError('Os slots foram alterados durante a reserva. Tente novamente.')
+        else:
+            # Só os itens cujo slot foi tomado por outra requisição falham
+            taken = claimed - _claim_free(claimed)
+            for index, slot_id in slot_ids.items():
+                if slot_id in taken and index not in errors:
+                    errors[index] = "Este slot não está disponível"
+            claimed -= taken
+
+    if claimed:
+        accepted = sorted(set(slot_ids) - set(errors))
+        bookings = Booking.objects.bulk_create([
+            Booking(
+                slot=slots[slot_ids[index]],
+                service_type=service_types[items[index].service_type_id],
+                client=client,
+                status='confirmed',
+                notes=items[index].notes
+            )
+            for index in accepted
+        ])
+        for booking in bookings:
+            booking.slot.is_available = False
+        prefetch_related_objects(bookings, 'extra_slots')
+        rollups.touch(slot_ids=claimed)
+        outbox.publish('booking.created', {
+            'booking_ids': [booking.id for booking in bookings],
+            'status': 'confirmed'
+        })
+        by_index = dict(zip(accepted, bookings))
+
+    results = []
+    for index in range(len(items)):
+        if index in errors:
+            results.append({'index': index, 'status': 400, 'detail': errors[index]})
+        elif bookings:
+            results.append({'index': index, 'status': 201, 'booking': by_index[index]})
+        else:
+            # Item válido, mas o lote atômico foi cancelado por outro item
+            results.append({'index': index, 'status': 409, 'detail': "Lote cancelado por erro em outro item"})
+
+    return results, bookings
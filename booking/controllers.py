@@ -1,109 +1,300 @@
+from datetime import timedelta
+from typing import List
+from ninja import Query
 from ninja_extra import api_controller, route
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import F, Prefetch
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from booking.models import Booking, Slot, ServiceType, Client
+from django.utils import timezone
+from booking.models import Booking, Slot, ServiceType, Client, WaitlistEntry
+from company.models import Company
+from slot.models import SlotTemplate
+from booking import states, waitlist
+from booking.batch import book_batch
+from slot.availability import claim_span
+from slot.templates import materialize_slot
 from ninja_extra.pagination import PaginatedResponseSchema, PageNumberPaginationExtra, paginate
 from ninja_extra.searching import searching
-from booking.schema import BookingOut, BookingFilter, BookingIn
+from booking.schema import (
+    BookingOut, BookingFilter, BookingIn, BookingSpanIn, BookingBatchIn, BookingBatchOut,
+    BookingBulkStatusIn, BookingBulkStatusOut, WaitlistIn, WaitlistOut
+)
+from core import outbox, sharding
+from core.rows import Rows, nest
+from core.sharding import sharded
+from core.pagination import CursorPaginatedResponseSchema, CursorPagination
 
 
 
+# Colunas lidas por BookingOut (e pelos schemas aninhados)
+BOOKING_OUT_FIELDS = (
+    'id', 'status', 'created_at', 'expires_at', 'notes', 'slot_id', 'service_type_id', 'client_id',
+    'slot__id', 'slot__start_time', 'slot__end_time', 'slot__is_available', 'slot__company_id',
+    'service_type__id', 'service_type__name', 'service_type__description',
+    'service_type__duration', 'service_type__price', 'service_type__company_id',
+    'client__id', 'client__name', 'client__phone', 'client__user_id',
+    'client__user__id', 'client__user__username', 'client__user__email',
+)
+
+
+def booking_row(row: dict) -> dict:
+    """Linha de .values(BOOKING_OUT_FIELDS) no formato de BookingOut"""
+    booking = nest(row)
+    booking['service_type']['duration_minutes'] = int(booking['service_type']['duration'].total_seconds() / 60)
+    booking['extra_slot_ids'] = []
+    return booking
+
+
+def add_extra_slot_ids(bookings: List[dict]) -> None:
+    """Slots extras da página inteira numa consulta à tabela intermediária"""
+    by_id = {booking['id']: booking for booking in bookings}
+    through = Booking.extra_slots.through
+    rows = through.objects.filter(booking_id__in=by_id).order_by('slot_id').values_list('booking_id', 'slot_id')
+    for booking_id, slot_id in rows:
+        by_id[booking_id]['extra_slot_ids'].append(slot_id)
+
+
 @api_controller('/bookings', tags=['Bookings'])
 class BookingController:
     
-    @property
-    def booking_filters(self):
-        return BookingFilter
+    def get_queryset(self):
+        """Reservas com tudo que BookingOut serializa: um JOIN e um prefetch, sem N+1"""
+        return Booking.objects.select_related(
+            'slot', 'service_type', 'client__user'
+        ).only(*BOOKING_OUT_FIELDS).prefetch_related(
+            Prefetch('extra_slots', queryset=Slot.objects.only('id'))
+        )
+    
+    def filter_bookings(self, filters: BookingFilter):
+        queryset = self.get_queryset()
+        
+        if filters.company_id:
+            queryset = queryset.filter(slot__company_id=filters.company_id)
+        
+        if filters.client_id:
+            queryset = queryset.filter(client_id=filters.client_id)
+        
+        if filters.status:
+            queryset = queryset.filter(status=filters.status)
+        
+        if filters.start_date:
+            queryset = queryset.filter(slot__start_time__gte=filters.start_date)
+        
+        if filters.end_date:
+            queryset = queryset.filter(slot__end_time__lte=filters.end_date)
+        
+        return queryset
     
     @route.get('/', response=PaginatedResponseSchema[BookingOut])
     @paginate(PageNumberPaginationExtra)
+    @sharded(company='filters.company_id')
     @searching
-    def list_bookings(self, search_fields=None, **kwargs):
-        queryset = Booking.objects.all()
-        
-        filters = self.booking_filters(**kwargs) if kwargs else None
+    def list_bookings(self, filters: BookingFilter = Query(...)):
+        # Página lida com .values(): nenhum model é instanciado
+        return Rows(self.filter_bookings(filters), BOOKING_OUT_FIELDS, shape=booking_row, extend=add_extra_slot_ids)
+    
+    @route.get('/cursor', response=CursorPaginatedResponseSchema[BookingOut])
+    @paginate(CursorPagination, ordering=('created_at', 'id'))
+    @sharded(company='filters.company_id')
+    def list_bookings_by_cursor(self, filters: BookingFilter = Query(...)):
+        """Mesmos filtros de list_bookings, paginados por (created_at, id) sem OFFSET"""
+        return self.filter_bookings(filters)
+    
+    @route.post('/', response={201: BookingOut, 400: dict})
+    @sharded(pk='payload.service_type_id')
+    def create_booking(self, payload: BookingIn, client_id: int):
+        return self._book_slot(payload, client_id, status='confirmed')
+    
+    @route.post('/hold', response={201: BookingOut, 400: dict})
+    @sharded(pk='payload.service_type_id')
+    def create_hold(self, payload: BookingIn, client_id: int):
+        """
+        Segura o slot enquanto o cliente conclui o pagamento. A reserva fica
+        'held' até ser confirmada; se expirar antes, o slot volta a ficar livre.
+        """
+        expires_at = timezone.now() + timedelta(seconds=settings.BOOKING_HOLD_TTL)
+        return self._book_slot(payload, client_id, status='held', expires_at=expires_at)
+    
+    @sharding.atomic
+    def _book_slot(self, payload: BookingIn, client_id: int, status: str, expires_at=None):
+        service_type = self._service_type(payload.service_type_id)
+        client = get_object_or_404(Client.objects.active().select_related('user'), id=client_id)
         
-        if filters:
-            if filters.company_id:
-                queryset = queryset.filter(slot__company_id=filters.company_id)
-            
-            if filters.client_id:
-                queryset = queryset.filter(client_id=filters.client_id)
-            
-            if filters.status:
-                queryset = queryset.filter(status=filters.status)
-            
-            if filters.start_date:
-                queryset = queryset.filter(slot__start_time__gte=filters.start_date)
+        if payload.slot_id:
+            slot_id = payload.slot_id
+        elif payload.template_id and payload.start_time:
+            # O slot só passa a existir no banco quando é reservado
+            template = get_object_or_404(SlotTemplate, id=payload.template_id)
             
-            if filters.end_date:
-                queryset = queryset.filter(slot__end_time__lte=filters.end_date)
+            try:
+                slot_id = materialize_slot(template, payload.start_time).id
+            except ValidationError as e:
+                return 400, {"detail": e.messages[0]}
+        else:
+            return 400, {"detail": "Informe slot_id ou template_id com start_time"}
         
-        return queryset
+        # Reserva num único UPDATE condicional: entre duas requisições
+        # concorrentes para o mesmo slot, só uma altera a linha
+        claimed = Slot.objects.claim(
+            slot_id,
+            company_id=service_type.company_id,
+            end_time__gte=F('start_time') + service_type.duration
+        )
+        if not claimed:
+            detail = self._claim_error(slot_id, service_type)
+            # Desfaz também o slot materializado a partir do template
+            sharding.set_rollback(True)
+            return 400, {"detail": detail}
+        
+        booking = Booking(
+            slot_id=slot_id,
+            service_type=service_type,
+            client=client,
+            status=status,
+            expires_at=expires_at,
+            notes=payload.notes
+        )
+        booking.save(validate=False)
+        outbox.publish('booking.created', {'booking_ids': [booking.id], 'status': status})
+        
+        return 201, booking
     
-    @route.post('/', response={201: BookingOut})
-    def create_booking(self, payload: BookingIn, client_id: int):
-        slot = get_object_or_404(Slot, id=payload.slot_id)
-        service_type = get_object_or_404(ServiceType, id=payload.service_type_id)
-        client = get_object_or_404(Client, id=client_id)
+    @staticmethod
+    def _service_type(service_type_id: int) -> ServiceType:
+        """
+        Tipo de serviço lido do banco, e não do cache de catálogo: o cache é
+        por processo e pode estar com a duração antiga. Empresas em remoção
+        não recebem reservas nem entradas na fila: core.deletion apagaria o
+        que fosse criado depois da etapa dela.
+        """
+        return get_object_or_404(
+            ServiceType.objects.filter(company__in=Company.objects.active()),
+            id=service_type_id
+        )
+    
+    @staticmethod
+    def _claim_error(slot_id: int, service_type: ServiceType) -> str:
+        """Motivo da recusa, consultado só quando o UPDATE não alterou nenhuma linha"""
+        slot = get_object_or_404(Slot, id=slot_id)
         
-
         if not slot.is_available:
-            return 400, {"detail": "Este slot não está disponível"}
+            return "Este slot não está disponível"
         
-
-        if service_type.company != slot.company:
-            return 400, {"detail": "O serviço deve pertencer à mesma empresa do slot"}
+        if service_type.company_id != slot.company_id:
+            return "O serviço deve pertencer à mesma empresa do slot"
         
-
-        slot_duration = slot.end_time - slot.start_time
-        if service_type.duration > slot_duration:
-            return 400, {"detail": "A duração do serviço excede o tempo disponível no slot"}
+        return "A duração do serviço excede o tempo disponível no slot"
+    
+    @route.post('/span', response={201: BookingOut, 400: dict})
+    @sharded(pk='payload.service_type_id')
+    @sharding.atomic
+    def create_span_booking(self, payload: BookingSpanIn, client_id: int):
+        """Agenda um serviço sobre slots livres contíguos ou sobre parte de um slot maior"""
+        service_type = self._service_type(payload.service_type_id)
+        client = get_object_or_404(Client.objects.active(), id=client_id)
         
-
-        booking = Booking.objects.create(
-            slot=slot,
+        try:
+            slots = claim_span(
+                service_type.company_id,
+                payload.start_time,
+                payload.start_time + service_type.duration
+            )
+        except ValidationError as e:
+            return 400, {"detail": e.messages[0]}
+        
+        booking = Booking(
+            slot=slots[0],
             service_type=service_type,
             client=client,
-            status='confirmed', 
+            status='confirmed',
             notes=payload.notes
         )
-        
-        slot.is_available = False
-        slot.save()
+        booking.save(validate=False)
+        booking.extra_slots.set(slots[1:])
+        outbox.publish('booking.created', {'booking_ids': [booking.id], 'status': 'confirmed'})
         
         return 201, booking
     
-    @route.get('/{booking_id}', response=BookingOut)
-    def get_booking(self, booking_id: int):
-        return get_object_or_404(Booking, id=booking_id)
+    @route.post('/batch', response={201: BookingBatchOut, 400: BookingBatchOut})
+    @sharded(pk='payload.items.0.service_type_id')
+    def create_batch_booking(self, payload: BookingBatchIn, client_id: int):
+        """Agenda vários slots de uma vez para o mesmo cliente (ex.: um curso semanal)"""
+        client = get_object_or_404(Client.objects.active().select_related('user'), id=client_id)
+        
+        try:
+            results, bookings = book_batch(client, payload.items, atomic=payload.mode == 'atomic')
+        except ValidationError as e:
+            return 400, {"detail": e.messages[0], "results": []}
+        
+        if not bookings:
+            return 400, {"detail": "Nenhuma reserva foi criada", "results": results}
+        
+        return 201, {"results": results}
     
-    @route.patch('/{booking_id}/status', response=BookingOut)
-    def update_booking_status(self, booking_id: int, status: str):
-        booking = get_object_or_404(Booking, id=booking_id)
+    @route.post('/status', response={200: BookingBulkStatusOut, 400: dict})
+    def bulk_update_status(self, payload: BookingBulkStatusIn):
+        """Muda o status de todas as reservas filtradas (ex.: cancelar um dia inteiro da empresa)"""
+        filters = BookingFilter(**payload.model_dump(exclude={'status'}))
+        if not any(filters.model_dump().values()):
+            return 400, {"detail": "Informe ao menos um filtro"}
         
-        if status not in [status_choice[0] for status_choice in Booking.STATUS_CHOICES]:
-            return 400, {"detail": "Status inválido"}
+        updated = 0
+        try:
+            # Um UPDATE por shard (só o da empresa quando company_id é informado)
+            for _ in sharding.each(filters.company_id):
+                updated += states.bulk_transition(self.filter_bookings(filters), payload.status)
+        except ValidationError as e:
+            return 400, {"detail": e.messages[0]}
         
-        old_status = booking.status
-        booking.status = status
-        booking.save()
+        return {"updated": updated}
+    
+    @route.post('/waitlist', response={201: WaitlistOut, 400: dict})
+    @sharded(pk='payload.service_type_id')
+    def join_waitlist(self, payload: WaitlistIn, client_id: int):
+        """Entra na fila de um slot ocupado (ou de uma janela); o primeiro da fila é agendado quando ele vagar"""
+        service_type = self._service_type(payload.service_type_id)
+        client = get_object_or_404(Client.objects.active(), id=client_id)
+        slot = get_object_or_404(Slot, id=payload.slot_id) if payload.slot_id else None
         
-        if old_status != 'cancelled' and status == 'cancelled':
-            booking.slot.is_available = True
-            booking.slot.save()
-        elif old_status == 'cancelled' and status != 'cancelled':
-            booking.slot.is_available = False
-            booking.slot.save()
+        try:
+            entry = waitlist.join(client, service_type, slot, payload.window_start, payload.window_end)
+        except ValidationError as e:
+            return 400, {"detail": e.messages[0]}
         
-        return booking
+        return 201, entry
+    
+    @route.get('/waitlist', response=List[WaitlistOut])
+    @sharded(merge=list)
+    def list_waitlist(self, client_id: int):
+        return WaitlistEntry.objects.filter(client_id=client_id, status='waiting').order_by('created_at', 'id')
+    
+    @route.delete('/waitlist/{entry_id}', response={204: None})
+    @sharded(pk='entry_id')
+    def leave_waitlist(self, entry_id: int):
+        entry = get_object_or_404(WaitlistEntry, id=entry_id, status='waiting')
+        WaitlistEntry.objects.filter(id=entry.id, status='waiting').update(status='cancelled')
+        return 204, None
+    
+    @route.get('/{booking_id}', response=BookingOut)
+    @sharded(pk='booking_id')
+    def get_booking(self, booking_id: int):
+        return get_object_or_404(self.get_queryset(), id=booking_id)
+    
+    @route.patch('/{booking_id}/status', response={200: BookingOut, 400: dict})
+    @sharded(pk='booking_id')
+    def update_booking_status(self, booking_id: int, status: str):
+        booking = get_object_or_404(self.get_queryset(), id=booking_id)
+        
+        try:
+            return states.transition(booking, status)
+        except ValidationError as e:
+            return 400, {"detail": e.messages[0]}
     
     @route.delete('/{booking_id}', response={204: None})
+    @sharded(pk='booking_id')
     def delete_booking(self, booking_id: int):
         booking = get_object_or_404(Booking, id=booking_id)
-        
-        slot = booking.slot
-        slot.is_available = True
-        slot.save()
-        
-        booking.delete()
+        states.delete(booking)
         return 204, None
\ No newline at end of file
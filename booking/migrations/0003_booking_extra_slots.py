@@ -0,0 +1,19 @@
+# Generated by Django 4.2.10 on 2026-10-18 08:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slot', '0004_hot_filter_indexes'),
+        ('booking', '0002_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='extra_slots',
+            field=models.ManyToManyField(blank=True, related_name='spanning_bookings', to='slot.slot'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.10 on 2026-10-18 08:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicetype', '0002_fix_company_fk_column'),
+        ('client', '0001_initial'),
+        ('company', '0004_company_daily_stats'),
+        ('slot', '0004_hot_filter_indexes'),
+        ('booking', '0004_booking_holds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_start', models.DateTimeField(blank=True, null=True)),
+                ('window_end', models.DateTimeField(blank=True, null=True)),
+                ('position', models.PositiveBigIntegerField()),
+                ('status', models.CharField(choices=[('waiting', 'Aguardando'), ('promoted', 'Promovido'), ('cancelled', 'Cancelado')], default='waiting', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entry', to='booking.booking')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='client.client')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='company.company')),
+                ('service_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='servicetype.servicetype')),
+                ('slot', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='slot.slot')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['slot', 'status', 'position'], name='waitlist_slot_queue_idx'), models.Index(fields=['company', 'status', 'position'], name='waitlist_company_queue_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.CheckConstraint(check=models.Q(('slot__isnull', False), models.Q(('window_end__isnull', False), ('window_start__isnull', False)), _connector='OR'), name='waitlist_slot_or_window'),
+        ),
+    ]
@@ -10,18 +10,33 @@ class Booking(models.Model):
     """Agendamento de serviço"""
     STATUS_CHOICES = [
         ('pending', 'Pendente'),
+        ('held', 'Pré-reserva'),
         ('confirmed', 'Confirmado'),
         ('cancelled', 'Cancelado'),
         ('completed', 'Concluído'),
+        ('expired', 'Expirado'),
     ]
     
     slot = models.ForeignKey(Slot, on_delete=models.CASCADE, related_name='bookings')
+    # Slots seguintes ocupados quando o serviço é maior que um único slot
+    extra_slots = models.ManyToManyField(Slot, blank=True, related_name='spanning_bookings')
     service_type = models.ForeignKey(ServiceType, on_delete=models.CASCADE, related_name='bookings')
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='bookings')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Prazo de uma pré-reserva ('held'); depois dele o slot é liberado
+    expires_at = models.DateTimeField(blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='booking_created_idx'),
+            models.Index(fields=['client', 'created_at'], name='booking_client_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='booking_status_created_idx'),
+            models.Index(fields=['slot', 'status'], name='booking_slot_status_idx'),
+            models.Index(fields=['expires_at'], condition=models.Q(status='held'), name='booking_held_expiry_idx'),
+        ]
+    
     def clean(self):
 
         if not self.slot.is_available and self.pk is None:
@@ -36,20 +51,65 @@ class Booking(models.Model):
         if self.service_type.duration > slot_duration:
             raise ValidationError('A duração do serviço excede o tempo disponível no slot.')
     
-    def save(self, *args, **kwargs):
-        self.clean()
-        
-
-        if self.status in ['confirmed', 'completed'] and self.slot.is_available:
-            self.slot.is_available = False
-            self.slot.save()
-        
-
-        if self.status == 'cancelled' and not self.slot.is_available:
-            self.slot.is_available = True
-            self.slot.save()
+    def occupied_slot_ids(self):
+        return [self.slot_id, *self.extra_slots.values_list('id', flat=True)]
+    
+    def save(self, *args, validate=True, **kwargs):
+        # validate=False quando quem chama já validou e reservou os slots:
+        # pula o clean() e a sincronização de slot.is_available
+        if validate:
+            self.clean()
+            
+            if self.status in ['held', 'confirmed', 'completed'] and self.slot.is_available:
+                self.slot.is_available = False
+                self.slot.save()
+            
+            if self.status in ['cancelled', 'expired'] and not self.slot.is_available:
+                self.slot.is_available = True
+                self.slot.save()
         
         super().save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.service_type.name} - {self.client.name} - {self.slot.start_time.strftime('%d/%m/%Y %H:%M')}"
+
+
+
+class WaitlistEntry(models.Model):
+    """
+    Cliente aguardando um slot específico ou, sem slot, qualquer slot da
+    empresa dentro de uma janela. `position` ordena cada fila; entre as
+    filas que disputam um slot, vence quem entrou antes.
+    """
+    STATUS_CHOICES = [
+        ('waiting', 'Aguardando'),
+        ('promoted', 'Promovido'),
+        ('cancelled', 'Cancelado'),
+    ]
+    
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='waitlist_entries')
+    service_type = models.ForeignKey(ServiceType, on_delete=models.CASCADE, related_name='waitlist_entries')
+    # Copiado de service_type para indexar a fila das janelas por empresa
+    company = models.ForeignKey('company.Company', on_delete=models.CASCADE, related_name='waitlist_entries')
+    slot = models.ForeignKey(Slot, on_delete=models.CASCADE, null=True, blank=True, related_name='waitlist_entries')
+    window_start = models.DateTimeField(blank=True, null=True)
+    window_end = models.DateTimeField(blank=True, null=True)
+    position = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
+    booking = models.OneToOneField(Booking, on_delete=models.SET_NULL, null=True, blank=True, related_name='waitlist_entry')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['slot', 'status', 'position'], name='waitlist_slot_queue_idx'),
+            models.Index(fields=['company', 'status', 'position'], name='waitlist_company_queue_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(slot__isnull=False) | models.Q(window_start__isnull=False, window_end__isnull=False),
+                name='waitlist_slot_or_window'
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.client} #{self.position} ({self.status})'
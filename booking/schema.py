@@ -1,16 +1,24 @@
 from ninja import Schema
 from datetime import datetime
-from typing import Optional
-from uuid import UUID
+from typing import List, Literal, Optional
+from pydantic import Field
 from client.schema import ClientOut
 from servicetype.schema import ServiceTypeOut
 from slot.schema import SlotOut
 
 
 class BookingIn(Schema):
-    slot_id: int
+    slot_id: Optional[int] = None
     service_type_id: int
     notes: Optional[str] = None
+    # Alternativa a slot_id: ocorrência de um template recorrente
+    template_id: Optional[int] = None
+    start_time: Optional[datetime] = None
+
+class BookingSpanIn(Schema):
+    service_type_id: int
+    start_time: datetime
+    notes: Optional[str] = None
 
 class BookingOut(Schema):
     id: int
@@ -19,11 +27,63 @@ class BookingOut(Schema):
     client: ClientOut
     status: str
     created_at: datetime
+    expires_at: Optional[datetime] = None
     notes: Optional[str]
+    extra_slot_ids: List[int] = []
+    
+    @staticmethod
+    def resolve_extra_slot_ids(obj):
+        if isinstance(obj, dict):
+            return obj.get('extra_slot_ids', [])
+        return [slot.id for slot in obj.extra_slots.all()]
+
+class BookingBatchIn(Schema):
+    items: List[BookingIn] = Field(..., min_length=1, max_length=100)
+    # atomic: tudo ou nada; best_effort: reserva os itens válidos
+    mode: Literal['atomic', 'best_effort'] = 'atomic'
+
+class BookingBatchItemOut(Schema):
+    index: int
+    status: int
+    booking: Optional[BookingOut] = None
+    detail: Optional[str] = None
+
+class BookingBatchOut(Schema):
+    detail: Optional[str] = None
+    results: List[BookingBatchItemOut]
 
 class BookingFilter(Schema):
-    company_id: Optional[UUID] = None
+    company_id: Optional[int] = None
     client_id: Optional[int] = None
     status: Optional[str] = None
     start_date: Optional[datetime] = None
-    end_date: Optional[datetime] = None
\ No newline at end of file
+    end_date: Optional[datetime] = None
+
+class BookingBulkStatusIn(Schema):
+    status: str  # novo status
+    company_id: Optional[int] = None
+    client_id: Optional[int] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+
+class BookingBulkStatusOut(Schema):
+    updated: int
+
+class WaitlistIn(Schema):
+    service_type_id: int
+    # Um slot ocupado ou uma janela em que qualquer slot da empresa serve
+    slot_id: Optional[int] = None
+    window_start: Optional[datetime] = None
+    window_end: Optional[datetime] = None
+
+class WaitlistOut(Schema):
+    id: int
+    client_id: int
+    service_type_id: int
+    slot_id: Optional[int]
+    window_start: Optional[datetime]
+    window_end: Optional[datetime]
+    position: int
+    status: str
+    booking_id: Optional[int]
+    created_at: datetime
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from booking.models import Booking
+from company import rollups
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def touch_booking_day(sender, instance, **kwargs):
+    rollups.touch(slot_ids=[instance.slot_id])
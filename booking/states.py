@@ -0,0 +1,183 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Q, QuerySet
+from django.utils import timezone
+
+from booking import waitlist
+from booking.models import Booking
+from company import rollups
+from core import outbox, sharding
+from slot.models import Slot
+
+
+# Transições permitidas (ver "Fluxo de Status de Agendamentos" no README)
+TRANSITIONS = {
+    'pending': {'confirmed', 'cancelled'},
+    'held': {'confirmed', 'cancelled', 'expired'},
+    'confirmed': {'completed', 'cancelled'},
+    'completed': set(),
+    'cancelled': set(),
+    'expired': set(),
+}
+
+# Status que só a varredura de pré-reservas (expire_holds) define: os
+# endpoints de status não aceitam
+SWEEP_ONLY = {'expired'}
+
+# Status em que a reserva ocupa seus slots
+OCCUPYING = {'held', 'confirmed', 'completed'}
+
+# Pré-reservas liberadas por UPDATE na varredura de expiração
+HOLD_SWEEP_BATCH_SIZE = 500
+
+
+def sources(target: str) -> set:
+    """Status a partir dos quais se pode chegar a `target`"""
+    return {source for source, targets in TRANSITIONS.items() if target in targets}
+
+
+def can_transition(source: str, target: str) -> bool:
+    return target in TRANSITIONS.get(source, set())
+
+
+def _check_target(target: str) -> None:
+    if target not in TRANSITIONS:
+        raise ValidationError('Status inválido')
+    if target in SWEEP_ONLY:
+        raise ValidationError(f'O status {target} é definido apenas pela expiração das pré-reservas')
+
+
+def _occupied_slots(bookings: QuerySet) -> QuerySet:
+    """Slots (principal e extras) das reservas, como subconsultas"""
+    through = Booking.extra_slots.through
+    return Slot.objects.filter(
+        Q(id__in=bookings.values('slot_id'))
+        | Q(id__in=through.objects.filter(booking_id__in=bookings.values('id')).values('slot_id'))
+    )
+
+
+def _apply(bookings: QuerySet, target: str, ids=None) -> int:
+    """
+    Leva para `target` as reservas do queryset que podem fazer a transição.
+    O custo é fixo: a leitura dos ids afetados (dispensada quando já são
+    conhecidos), um UPDATE nos slots que mudam de ocupação (mais um COUNT
+    quando eles precisam ser tomados ou a leitura dos liberados), um UPDATE
+    nas reservas, o evento no outbox e a consulta à lista de espera.
+    """
+    bookings = bookings.select_related(None).prefetch_related(None).order_by().filter(
+        status__in=sources(target)
+    )
+    if target == 'confirmed':
+        # Pré-reserva vencida não pode mais ser confirmada, mesmo antes da varredura
+        bookings = bookings.exclude(status='held', expires_at__lte=timezone.now())
+    if ids is None:
+        ids = list(bookings.select_for_update().values_list('id', flat=True))
+    if not ids:
+        return 0
+
+    occupies = target in OCCUPYING
+    flipping = bookings.filter(status__in=[
+        source for source in sources(target) if (source in OCCUPYING) != occupies
+    ])
+
+    slots = _occupied_slots(flipping)
+    freed = []
+    if occupies:
+        # Confirmar volta a ocupar os slots, como o claim da criação: cada
+        # reserva toma os seus, todos livres. Conta as referências (principal
+        # e extras) e não os slots distintos, para que duas reservas pendentes
+        # no mesmo slot não sejam confirmadas juntas
+        expected = flipping.aggregate(
+            slots=Count('id', distinct=True) + Count('extra_slots')
+        )['slots']
+        if slots.filter(is_available=True).update(is_available=False) != expected:
+            raise ValidationError('Este slot não está disponível.')
+    else:
+        freed = list(slots.filter(is_available=False).values_list('id', flat=True))
+        slots.update(is_available=True)
+
+    updated = bookings.update(status=target)
+    if updated:
+        outbox.publish(f'booking.{target}', {'booking_ids': ids, 'status': target})
+        rollups.touch(booking_ids=ids)
+    # Os slots liberados vão para o primeiro da lista de espera, na mesma transação
+    waitlist.promote(freed)
+    return updated
+
+
+@sharding.atomic
+def transition(booking: Booking, target: str) -> Booking:
+    """Muda o status de uma reserva, condicionado ao status que foi lido"""
+    _check_target(target)
+
+    if not can_transition(booking.status, target):
+        raise ValidationError(f'Transição de status inválida: {booking.status} → {target}')
+
+    if booking.status == 'held' and target == 'confirmed' and booking.expires_at <= timezone.now():
+        raise ValidationError('A pré-reserva expirou.')
+
+    if not _apply(Booking.objects.filter(pk=booking.pk, status=booking.status), target, ids=[booking.pk]):
+        raise ValidationError('O agendamento foi alterado por outra requisição. Tente novamente.')
+
+    if Booking.slot.is_cached(booking) and (booking.status in OCCUPYING) != (target in OCCUPYING):
+        booking.slot.is_available = target not in OCCUPYING
+    booking.status = target
+    return booking
+
+
+@sharding.atomic
+def delete(booking: Booking) -> None:
+    """
+    Apaga a reserva. Os slots só são liberados (e oferecidos à lista de
+    espera) se ela ainda os ocupava: uma reserva cancelada ou expirada já os
+    devolveu, e eles podem ter sido reservados de novo por outro cliente.
+    """
+    freed = []
+    if booking.status in OCCUPYING:
+        # Condicionado ao status lido, como em _apply
+        slots = _occupied_slots(Booking.objects.filter(pk=booking.pk, status=booking.status))
+        freed = list(slots.filter(is_available=False).values_list('id', flat=True))
+        Slot.objects.filter(id__in=freed).update(is_available=True)
+        rollups.touch(slot_ids=freed)
+
+    booking.delete()
+    waitlist.promote(freed)
+
+
+@sharding.atomic
+def bulk_transition(bookings: QuerySet, target: str, ids=None) -> int:
+    """
+    Aplica `target` a todas as reservas do queryset que podem chegar nele
+    (ex.: cancelar tudo de uma empresa num intervalo), com o mesmo número de
+    consultas para 1 ou 10 mil reservas. Retorna quantas foram alteradas.
+    `ids` evita reler as reservas quando quem chama já as selecionou.
+    """
+    _check_target(target)
+    return _apply(bookings, target, ids)
+
+
+@sharding.atomic
+def _expire(ids, now) -> int:
+    return _apply(Booking.objects.filter(id__in=ids, expires_at__lte=now), 'expired', ids)
+
+
+def expire_holds(now=None, batch_size: int = HOLD_SWEEP_BATCH_SIZE) -> int:
+    """
+    Libera as pré-reservas vencidas em lotes, cada um na sua própria
+    transação. Um lote custa um número fixo de consultas, qualquer que seja
+    seu tamanho: a leitura dos ids pelo índice parcial de expiração, a dos
+    slots liberados, um UPDATE nos slots, um nas reservas, o evento no
+    outbox e a consulta à lista de espera.
+    """
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        ids = list(
+            Booking.objects.filter(status='held', expires_at__lte=now)
+            .order_by('expires_at').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return expired
+
+        expired += _expire(ids, now)
+        if len(ids) < batch_size:
+            return expired
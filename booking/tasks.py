@@ -0,0 +1,10 @@
+from celery import shared_task
+
+from booking import states
+from core import sharding
+
+
+@shared_task
+def release_expired_holds(batch_size: int = states.HOLD_SWEEP_BATCH_SIZE) -> int:
+    """Varredura periódica: expira pré-reservas vencidas e libera seus slots"""
+    return sum(states.expire_holds(batch_size=batch_size) for _ in sharding.each())
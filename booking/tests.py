@@ -1,3 +1,708 @@
-from django.test import TestCase
+import pytest
+import threading
+import time as clock
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from ninja_extra.testing import TestClient
 
-# Create your tests here.
+from booking.controllers import BookingController
+from booking.models import Booking, WaitlistEntry
+from booking.schema import BookingIn
+from client.models import Client
+from company.models import Company
+from servicetype.cache import service_type_cache
+from servicetype.models import ServiceType
+from slot.models import Slot, SlotTemplate
+
+
+def _at(day, hour, minute=0):
+    return timezone.make_aware(datetime(2030, 1, day, hour, minute))
+
+
+@pytest.fixture
+def api_client():
+    return TestClient(BookingController)
+
+
+@pytest.fixture
+def company():
+    user = User.objects.create_user(username='testcompany', password='password123')
+    return Company.objects.create(user=user, name='Test Company')
+
+
+@pytest.fixture
+def client_user():
+    user = User.objects.create_user(username='testclient', password='password123')
+    return Client.objects.create(user=user, name='Test Client', phone='123456789')
+
+
+@pytest.fixture
+def service_type(company):
+    return ServiceType.objects.create(
+        company=company,
+        name='Corte de Cabelo',
+        duration=timedelta(minutes=45),
+        price=Decimal('50.00')
+    )
+
+
+@pytest.fixture
+def slot(company):
+    return Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 10))
+
+
+@pytest.mark.django_db
+class TestCreateBooking:
+
+    def test_create_booking(self, api_client, client_user, service_type, slot):
+        response = api_client.post(f'/?client_id={client_user.id}', json={
+            'slot_id': slot.id,
+            'service_type_id': service_type.id,
+        })
+
+        assert response.status_code == 201
+        assert response.json()['status'] == 'confirmed'
+        slot.refresh_from_db()
+        assert not slot.is_available
+
+    def test_rejects_taken_slot(self, api_client, client_user, service_type, slot):
+        Slot.objects.filter(id=slot.id).update(is_available=False)
+
+        response = api_client.post(f'/?client_id={client_user.id}', json={
+            'slot_id': slot.id,
+            'service_type_id': service_type.id,
+        })
+
+        assert response.status_code == 400
+        assert response.json()['detail'] == 'Este slot não está disponível'
+        assert not Booking.objects.exists()
+
+    def test_rejects_short_slot(self, api_client, company, client_user, service_type):
+        slot = Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 9, 30))
+
+        response = api_client.post(f'/?client_id={client_user.id}', json={
+            'slot_id': slot.id,
+            'service_type_id': service_type.id,
+        })
+
+        assert response.status_code == 400
+        assert response.json()['detail'] == 'A duração do serviço excede o tempo disponível no slot'
+        slot.refresh_from_db()
+        assert slot.is_available
+
+    def test_rejects_company_being_deleted(self, api_client, company, client_user, service_type, slot):
+        Company.objects.filter(id=company.id).update(is_deleting=True)
+        payload = {'slot_id': slot.id, 'service_type_id': service_type.id}
+
+        assert api_client.post(f'/?client_id={client_user.id}', json=payload).status_code == 404
+        assert api_client.post(f'/waitlist?client_id={client_user.id}', json=payload).status_code == 404
+        response = api_client.post(f'/batch?client_id={client_user.id}', json={'items': [payload]})
+        assert response.status_code == 400
+        assert response.json()['results'][0]['detail'] == "A empresa deste serviço está sendo removida"
+        assert not Booking.objects.exists()
+        assert Slot.objects.get(id=slot.id).is_available
+
+    def test_uses_current_duration_not_cached_one(self, api_client, client_user, service_type, slot):
+        service_type_cache.get(service_type.id)
+        # Alterado por outro worker: o cache deste processo não foi invalidado
+        ServiceType.objects.filter(id=service_type.id).update(duration=timedelta(minutes=90))
+
+        response = api_client.post(f'/?client_id={client_user.id}', json={
+            'slot_id': slot.id,
+            'service_type_id': service_type.id,
+        })
+
+        assert response.status_code == 400
+        assert response.json()['detail'] == 'A duração do serviço excede o tempo disponível no slot'
+
+    def test_claim_is_a_single_update(self, client_user, service_type, slot, django_assert_num_queries):
+        payload = BookingIn(slot_id=slot.id, service_type_id=service_type.id)
+        # serviço (com a empresa ativa), cliente, UPDATE do slot, INSERT da
+        # reserva e do evento no outbox, mais o par SAVEPOINT/RELEASE do atomic
+        # dentro da transação do teste
+        with django_assert_num_queries(7):
+            status, booking = BookingController().create_booking(payload, client_user.id)
+
+        assert status == 201
+        assert booking.slot_id == slot.id
+
+    def test_booking_materializes_template_slot(self, api_client, company, client_user, service_type):
+        template = SlotTemplate.objects.create(
+            company=company,
+            days_of_week=[0],
+            day_start=time(9),
+            day_end=time(12),
+            duration=timedelta(hours=1),
+            valid_from=date(2030, 1, 1)
+        )
+        assert Slot.objects.count() == 0
+
+        response = api_client.post(f'/?client_id={client_user.id}', json={
+            'template_id': template.id,
+            'start_time': _at(7, 10).isoformat(),
+            'service_type_id': service_type.id,
+        })
+
+        assert response.status_code == 201, response.json()
+        slot = Slot.objects.get()
+        assert (slot.start_time, slot.end_time, slot.is_available) == (_at(7, 10), _at(7, 11), False)
+        assert Booking.objects.get().slot == slot
+
+    def test_template_start_must_match_occurrence(self, api_client, company, client_user, service_type):
+        template = SlotTemplate.objects.create(
+            company=company,
+            days_of_week=[0],
+            day_start=time(9),
+            day_end=time(12),
+            duration=timedelta(hours=1),
+            valid_from=date(2030, 1, 1)
+        )
+
+        response = api_client.post(f'/?client_id={client_user.id}', json={
+            'template_id': template.id,
+            'start_time': _at(7, 10, 30).isoformat(),
+            'service_type_id': service_type.id,
+        })
+
+        assert response.status_code == 400
+        assert Slot.objects.count() == 0
+
+    def test_rejected_template_booking_leaves_no_phantom_slot(self, api_client, company, client_user,
+                                                              service_type, django_capture_on_commit_callbacks):
+        template = SlotTemplate.objects.create(
+            company=company,
+            days_of_week=[0],
+            day_start=time(9),
+            day_end=time(12),
+            duration=timedelta(hours=1),
+            valid_from=date(2030, 1, 1)
+        )
+        other = Company.objects.create(user=User.objects.create_user(username='other'), name='Outra')
+        foreign = ServiceType.objects.create(company=other, name='Corte', duration=timedelta(minutes=30), price=10)
+        payload = {'template_id': template.id, 'start_time': _at(7, 10).isoformat()}
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(f'/?client_id={client_user.id}', json={**payload, 'service_type_id': foreign.id})
+        assert response.status_code == 400
+        assert Slot.objects.count() == 0
+
+        # O slot desfeito não ficou no índice de sobreposição
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(f'/?client_id={client_user.id}',
+                                       json={**payload, 'service_type_id': service_type.id})
+        assert response.status_code == 201, response.json()
+
+
+@pytest.mark.django_db
+class TestListBookings:
+
+    def test_filters_and_cursor(self, api_client, company, client_user, service_type):
+        other_user = User.objects.create_user(username='otherclient', password='password123')
+        other_client = Client.objects.create(user=other_user, name='Other Client')
+        for hour in range(9, 14):
+            slot = Slot.objects.create(company=company, start_time=_at(7, hour), end_time=_at(7, hour + 1))
+            Booking.objects.create(
+                slot=slot,
+                service_type=service_type,
+                client=client_user if hour < 12 else other_client,
+                status='confirmed'
+            )
+
+        response = api_client.get('/', query_params={'client_id': client_user.id})
+        assert response.json()['count'] == 3
+
+        first = api_client.get('/cursor', query_params={'company_id': company.id, 'page_size': 3}).json()
+        second = api_client.get('/cursor', query_params={
+            'company_id': company.id, 'page_size': 3, 'cursor': first['next']
+        }).json()
+        ids = [booking['id'] for booking in first['results'] + second['results']]
+        assert ids == list(Booking.objects.order_by('created_at', 'id').values_list('id', flat=True))
+        assert second['next'] is None
+
+    def test_list_rows_match_detail(self, api_client, company, client_user, service_type):
+        # A listagem sai de .values(); cada item tem que ser igual ao detalhe (via ORM)
+        first = Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 10))
+        second = Slot.objects.create(company=company, start_time=_at(7, 10), end_time=_at(7, 11))
+        booking = Booking.objects.create(slot=first, service_type=service_type, client=client_user, notes='Primeira vez')
+        booking.extra_slots.add(second)
+        third = Slot.objects.create(company=company, start_time=_at(8, 9), end_time=_at(8, 10))
+        Booking.objects.create(slot=third, service_type=service_type, client=client_user, status='held',
+                               expires_at=_at(8, 8))
+
+        results = api_client.get('/').json()['results']
+
+        assert [item['extra_slot_ids'] for item in results] == [[second.id], []]
+        assert results == [api_client.get(f"/{item['id']}").json() for item in results]
+
+
+@pytest.mark.django_db
+class TestSpanBooking:
+
+    def test_books_across_adjacent_slots(self, api_client, company, client_user):
+        service_type = ServiceType.objects.create(company=company, name='Coloração', duration=timedelta(minutes=90))
+        first = Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 10))
+        second = Slot.objects.create(company=company, start_time=_at(7, 10), end_time=_at(7, 11))
+
+        response = api_client.post(f'/span?client_id={client_user.id}', json={
+            'service_type_id': service_type.id,
+            'start_time': _at(7, 9, 30).isoformat(),
+        })
+
+        assert response.status_code == 201, response.json()
+        slots = list(Slot.objects.order_by('start_time').values_list('start_time', 'end_time', 'is_available'))
+        assert slots == [
+            (_at(7, 9), _at(7, 9, 30), True),
+            (_at(7, 9, 30), _at(7, 10), False),
+            (_at(7, 10), _at(7, 11), False),
+        ]
+        booking = Booking.objects.get()
+        # A ponta parcial foi trocada por linhas novas, não encurtada
+        assert not Slot.objects.filter(id=first.id).exists()
+        assert booking.slot.start_time == _at(7, 9, 30)
+        assert response.json()['extra_slot_ids'] == [second.id]
+
+        response = api_client.patch(f'/{booking.id}/status?status=cancelled')
+        assert response.status_code == 200
+        assert set(Slot.objects.values_list('is_available', flat=True)) == {True}
+
+    def test_keeps_slot_with_history_whole(self, api_client, company, client_user):
+        service_type = ServiceType.objects.create(company=company, name='Corte', duration=timedelta(minutes=30))
+        slot = Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 10))
+        Booking.objects.bulk_create([Booking(slot=slot, service_type=service_type, client=client_user,
+                                             status='cancelled')])
+
+        response = api_client.post(f'/span?client_id={client_user.id}', json={
+            'service_type_id': service_type.id,
+            'start_time': _at(7, 9, 15).isoformat(),
+        })
+
+        assert response.status_code == 201, response.json()
+        # A reserva cancelada continua apontando para o mesmo horário
+        assert list(Slot.objects.values_list('id', 'start_time', 'end_time', 'is_available')) == [
+            (slot.id, _at(7, 9), _at(7, 10), False)
+        ]
+        assert Booking.objects.get(status='confirmed').slot_id == slot.id
+
+    def test_rejects_gap(self, api_client, company, client_user):
+        service_type = ServiceType.objects.create(company=company, name='Coloração', duration=timedelta(minutes=90))
+        Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 10))
+        Slot.objects.create(company=company, start_time=_at(7, 10), end_time=_at(7, 11), is_available=False)
+
+        response = api_client.post(f'/span?client_id={client_user.id}', json={
+            'service_type_id': service_type.id,
+            'start_time': _at(7, 9).isoformat(),
+        })
+
+        assert response.status_code == 400
+        assert not Booking.objects.exists()
+        assert Slot.objects.filter(is_available=True).count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentClaims:
+    WORKERS = 12
+
+    def _book(self, slot_id, service_type_id, client_id, barrier, results):
+        payload = BookingIn(slot_id=slot_id, service_type_id=service_type_id)
+        barrier.wait()
+        try:
+            # O SQLite em memória compartilhada não espera por locks: o
+            # worker tenta de novo, como faria um cliente real
+            for _ in range(200):
+                try:
+                    status, _ = BookingController().create_booking(payload, client_id)
+                    results.append(status)
+                    return
+                except OperationalError:
+                    clock.sleep(0.005)
+            results.append(None)
+        finally:
+            connection.close()
+
+    def test_no_double_booking(self, client_user, service_type, slot):
+        barrier = threading.Barrier(self.WORKERS)
+        results = []
+        workers = [
+            threading.Thread(target=self._book, args=(slot.id, service_type.id, client_user.id, barrier, results))
+            for _ in range(self.WORKERS)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        assert sorted(results) == [201] + [400] * (self.WORKERS - 1)
+        assert Booking.objects.filter(slot=slot).count() == 1
+        slot.refresh_from_db()
+        assert not slot.is_available
+
+
+@pytest.mark.django_db
+class TestBatchBooking:
+
+    @pytest.fixture
+    def weekly_slots(self, company):
+        return [
+            Slot.objects.create(company=company, start_time=_at(day, 9), end_time=_at(day, 10))
+            for day in range(1, 29, 7)
+        ]
+
+    def _items(self, slots, service_type):
+        return [{'slot_id': slot.id, 'service_type_id': service_type.id} for slot in slots]
+
+    def test_books_all_slots(self, api_client, client_user, service_type, weekly_slots, django_assert_max_num_queries):
+        # Custo fixo, independente do tamanho do lote
+        with django_assert_max_num_queries(10):
+            response = api_client.post(f'/batch?client_id={client_user.id}', json={
+                'items': self._items(weekly_slots, service_type),
+            })
+
+        assert response.status_code == 201, response.json()
+        assert [result['status'] for result in response.json()['results']] == [201] * len(weekly_slots)
+        assert Booking.objects.filter(client=client_user, status='confirmed').count() == len(weekly_slots)
+        assert not Slot.objects.filter(is_available=True).exists()
+
+    def test_atomic_batch_rolls_back_on_any_error(self, api_client, client_user, service_type, weekly_slots):
+        Slot.objects.filter(id=weekly_slots[2].id).update(is_available=False)
+
+        response = api_client.post(f'/batch?client_id={client_user.id}', json={
+            'items': self._items(weekly_slots, service_type),
+        })
+
+        assert response.status_code == 400
+        assert [result['status'] for result in response.json()['results']] == [409, 409, 400, 409]
+        assert not Booking.objects.exists()
+        assert Slot.objects.filter(is_available=True).count() == len(weekly_slots) - 1
+
+    def test_best_effort_books_valid_items(self, api_client, client_user, service_type, weekly_slots):
+        items = self._items(weekly_slots, service_type) + self._items(weekly_slots[:1], service_type)
+
+        response = api_client.post(f'/batch?client_id={client_user.id}', json={
+            'items': items,
+            'mode': 'best_effort',
+        })
+
+        assert response.status_code == 201, response.json()
+        results = response.json()['results']
+        assert [result['status'] for result in results] == [201, 201, 201, 201, 400]
+        assert results[4]['detail'] == 'Slot repetido no lote'
+        assert results[0]['booking']['slot']['id'] == weekly_slots[0].id
+        assert Booking.objects.count() == len(weekly_slots)
+
+    def test_best_effort_fails_only_slots_taken_meanwhile(self, api_client, client_user, service_type,
+                                                          weekly_slots, monkeypatch):
+        from booking import batch
+
+        slot_error = batch._slot_error
+
+        def taken_after_read(slot, service_type):
+            # Outra requisição ocupa o segundo slot depois da leitura do lote
+            if slot.id == weekly_slots[1].id:
+                Slot.objects.filter(id=slot.id).update(is_available=False)
+            return slot_error(slot, service_type)
+
+        monkeypatch.setattr(batch, '_slot_error', taken_after_read)
+
+        response = api_client.post(f'/batch?client_id={client_user.id}', json={
+            'items': self._items(weekly_slots, service_type),
+            'mode': 'best_effort',
+        })
+
+        assert response.status_code == 201, response.json()
+        results = response.json()['results']
+        assert [result['status'] for result in results] == [201, 400, 201, 201]
+        assert results[1]['detail'] == 'Este slot não está disponível'
+        assert Booking.objects.count() == len(weekly_slots) - 1
+        assert not Slot.objects.filter(is_available=True).exists()
+
+
+@pytest.mark.django_db
+class TestQueryBudget:
+    """O número de consultas não pode crescer com o tamanho da página"""
+
+    @pytest.fixture
+    def bookings(self, company, client_user, service_type):
+        slots = Slot.objects.bulk_create([
+            Slot(company=company, start_time=_at(day, hour), end_time=_at(day, hour + 1))
+            for day in range(1, 6) for hour in range(9, 13)
+        ])
+        bookings = Booking.objects.bulk_create([
+            Booking(slot=slot, service_type=service_type, client=client_user, status='confirmed')
+            for slot in slots
+        ])
+        bookings[0].extra_slots.add(Slot.objects.create(company=company, start_time=_at(9, 9), end_time=_at(9, 10)))
+        return bookings
+
+    @pytest.mark.parametrize('url, budget', [
+        ('/', 3),  # COUNT, página, extra_slots
+        ('/cursor', 2),
+    ])
+    def test_list_endpoints(self, api_client, bookings, url, budget, django_assert_num_queries):
+        with django_assert_num_queries(budget):
+            response = api_client.get(url, query_params={'page_size': 50})
+
+        assert response.status_code == 200
+        assert len(response.json()['results']) == len(bookings)
+
+    def test_detail_endpoint(self, api_client, bookings, django_assert_num_queries):
+        with django_assert_num_queries(2):
+            response = api_client.get(f'/{bookings[0].id}')
+
+        assert response.status_code == 200
+        assert response.json()['client']['user']['username'] == 'testclient'
+        assert len(response.json()['extra_slot_ids']) == 1
+
+
+@pytest.mark.django_db
+class TestStatusTransitions:
+
+    @pytest.fixture
+    def booking(self, client_user, service_type, slot):
+        Slot.objects.filter(id=slot.id).update(is_available=False)
+        return Booking.objects.create(slot=slot, service_type=service_type, client=client_user, status='confirmed')
+
+    def test_cancel_frees_slot(self, api_client, booking, django_assert_max_num_queries):
+        # leitura da reserva, slots liberados, UPDATE do slot, UPDATE da reserva,
+        # evento e lista de espera (mais savepoints)
+        with django_assert_max_num_queries(9):
+            response = api_client.patch(f'/{booking.id}/status?status=cancelled')
+
+        assert response.status_code == 200
+        assert response.json()['status'] == 'cancelled'
+        assert response.json()['slot']['is_available']
+        assert Slot.objects.get(id=booking.slot_id).is_available
+
+    @pytest.mark.parametrize('source, target', [
+        ('cancelled', 'confirmed'),
+        ('completed', 'cancelled'),
+        ('confirmed', 'pending'),
+        ('confirmed', 'unknown'),
+        ('held', 'expired'),
+    ])
+    def test_rejects_illegal_transitions(self, api_client, booking, source, target):
+        Booking.objects.filter(id=booking.id).update(status=source)
+
+        response = api_client.patch(f'/{booking.id}/status?status={target}')
+
+        assert response.status_code == 400
+        assert Booking.objects.get(id=booking.id).status == source
+
+    def test_confirm_pending_claims_slot(self, api_client, booking):
+        Booking.objects.filter(id=booking.id).update(status='pending')
+        Slot.objects.filter(id=booking.slot_id).update(is_available=True)
+
+        response = api_client.patch(f'/{booking.id}/status?status=confirmed')
+
+        assert response.status_code == 200
+        assert not Slot.objects.get(id=booking.slot_id).is_available
+
+    def test_bulk_confirm_claims_each_slot_once(self, api_client, booking, client_user, service_type):
+        # Duas pendentes no mesmo slot livre: só uma poderia ocupá-lo
+        Booking.objects.filter(id=booking.id).update(status='pending')
+        Slot.objects.filter(id=booking.slot_id).update(is_available=True)
+        Booking.objects.bulk_create([
+            Booking(slot_id=booking.slot_id, service_type=service_type, client=client_user, status='pending')
+        ])
+
+        response = api_client.post('/status', json={'status': 'confirmed', 'client_id': client_user.id})
+
+        assert response.status_code == 400
+        assert not Booking.objects.filter(status='confirmed').exists()
+        assert Slot.objects.get(id=booking.slot_id).is_available
+
+    def test_bulk_cancel_runs_fixed_queries(self, api_client, company, client_user, service_type,
+                                            django_assert_max_num_queries):
+        slots = Slot.objects.bulk_create([
+            Slot(company=company, start_time=_at(day, hour), end_time=_at(day, hour + 1), is_available=False)
+            for day in (7, 8) for hour in range(9, 17)
+        ])
+        Booking.objects.bulk_create([
+            Booking(slot=slot, service_type=service_type, client=client_user, status='confirmed')
+            for slot in slots
+        ])
+
+        # ids afetados, slots liberados, UPDATE dos slots, UPDATE das reservas,
+        # um evento e a lista de espera
+        with django_assert_max_num_queries(8):
+            response = api_client.post('/status', json={
+                'status': 'cancelled',
+                'company_id': company.id,
+                'start_date': _at(7, 0).isoformat(),
+                'end_date': _at(8, 0).isoformat(),
+            })
+
+        assert response.json() == {'updated': 8}
+        assert Slot.objects.filter(is_available=True).count() == 8
+        assert Booking.objects.filter(status='cancelled', slot__start_time__lt=_at(8, 0)).count() == 8
+
+    def test_bulk_requires_a_filter(self, api_client):
+        response = api_client.post('/status', json={'status': 'cancelled'})
+
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestHolds:
+
+    def _hold(self, api_client, client_user, service_type, slot):
+        return api_client.post(f'/hold?client_id={client_user.id}', json={
+            'slot_id': slot.id,
+            'service_type_id': service_type.id,
+        })
+
+    def test_hold_claims_slot_until_confirmed(self, api_client, client_user, service_type, slot):
+        response = self._hold(api_client, client_user, service_type, slot)
+
+        assert response.status_code == 201
+        assert response.json()['status'] == 'held'
+        assert response.json()['expires_at'] is not None
+        assert not Slot.objects.get(id=slot.id).is_available
+        assert self._hold(api_client, client_user, service_type, slot).status_code == 400
+
+        response = api_client.patch(f"/{response.json()['id']}/status?status=confirmed")
+        assert response.json()['status'] == 'confirmed'
+
+    def test_expired_hold_cannot_be_confirmed(self, api_client, client_user, service_type, slot):
+        booking_id = self._hold(api_client, client_user, service_type, slot).json()['id']
+        Booking.objects.filter(id=booking_id).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = api_client.patch(f'/{booking_id}/status?status=confirmed')
+
+        assert response.status_code == 400
+        assert Booking.objects.get(id=booking_id).status == 'held'
+
+    def test_sweeper_releases_expired_holds_in_batches(self, company, client_user, service_type,
+                                                       django_assert_max_num_queries):
+        from booking.tasks import release_expired_holds
+
+        now = timezone.now()
+        slots = Slot.objects.bulk_create([
+            Slot(company=company, start_time=_at(7, hour), end_time=_at(7, hour + 1), is_available=False)
+            for hour in range(6)
+        ])
+        Booking.objects.bulk_create([
+            Booking(slot=slot, service_type=service_type, client=client_user, status='held',
+                    expires_at=now + timedelta(minutes=-5 if i < 5 else 5))
+            for i, slot in enumerate(slots)
+        ])
+
+        # Dois lotes de até 3: leitura de ids, slots liberados, UPDATE de slots,
+        # UPDATE de reservas, evento no outbox e lista de espera cada (mais savepoints)
+        with django_assert_max_num_queries(16):
+            expired = release_expired_holds.delay(batch_size=3).get()
+
+        assert expired == 5
+        assert Booking.objects.filter(status='expired').count() == 5
+        assert list(Slot.objects.filter(is_available=False)) == [slots[5]]
+
+
+@pytest.mark.django_db
+class TestWaitlist:
+
+    @pytest.fixture
+    def booking(self, api_client, client_user, service_type, slot):
+        response = api_client.post(f'/?client_id={client_user.id}', json={
+            'slot_id': slot.id, 'service_type_id': service_type.id,
+        })
+        return Booking.objects.get(id=response.json()['id'])
+
+    def _waiter(self, name):
+        return Client.objects.create(user=User.objects.create_user(username=name), name=name)
+
+    def test_cancellation_promotes_first_in_line(self, api_client, service_type, slot, booking):
+        first, second = self._waiter('first'), self._waiter('second')
+        for waiter in (first, second):
+            response = api_client.post(f'/waitlist?client_id={waiter.id}', json={
+                'slot_id': slot.id, 'service_type_id': service_type.id,
+            })
+            assert response.status_code == 201, response.json()
+
+        api_client.patch(f'/{booking.id}/status?status=cancelled')
+
+        promoted = Booking.objects.get(slot=slot, status='confirmed')
+        assert promoted.client == first
+        assert WaitlistEntry.objects.get(client=first).booking == promoted
+        assert WaitlistEntry.objects.get(client=second).status == 'waiting'
+        assert not Slot.objects.get(id=slot.id).is_available
+
+    def test_window_entry_is_promoted_on_delete(self, api_client, service_type, slot, booking):
+        waiter = self._waiter('window')
+        response = api_client.post(f'/waitlist?client_id={waiter.id}', json={
+            'service_type_id': service_type.id,
+            'window_start': _at(7, 8).isoformat(),
+            'window_end': _at(7, 12).isoformat(),
+        })
+        assert response.status_code == 201
+
+        assert api_client.delete(f'/{booking.id}').status_code == 204
+
+        assert Booking.objects.get(slot=slot).client == waiter
+
+    def test_deleting_cancelled_booking_keeps_rebooked_slot(self, api_client, service_type, slot, booking):
+        # Cancelada, o slot é reservado de novo e alguém entra na fila dele
+        api_client.patch(f'/{booking.id}/status?status=cancelled')
+        rebooked = api_client.post(f"/?client_id={self._waiter('again').id}", json={
+            'slot_id': slot.id, 'service_type_id': service_type.id,
+        })
+        assert rebooked.status_code == 201
+        waiter = self._waiter('waiter')
+        assert api_client.post(f'/waitlist?client_id={waiter.id}', json={
+            'slot_id': slot.id, 'service_type_id': service_type.id,
+        }).status_code == 201
+
+        assert api_client.delete(f'/{booking.id}').status_code == 204
+
+        assert list(Booking.objects.filter(slot=slot).values_list('id', flat=True)) == [rebooked.json()['id']]
+        assert WaitlistEntry.objects.get(client=waiter).status == 'waiting'
+        assert not Slot.objects.get(id=slot.id).is_available
+
+    def test_cannot_wait_for_free_slot(self, api_client, client_user, service_type, slot):
+        response = api_client.post(f'/waitlist?client_id={client_user.id}', json={
+            'slot_id': slot.id, 'service_type_id': service_type.id,
+        })
+
+        assert response.status_code == 400
+
+    def test_earliest_waiter_wins_across_queues(self, api_client, service_type, slot, booking):
+        window, late = self._waiter('window'), self._waiter('late')
+        # A fila das janelas já tem outras entradas: a posição dela é maior
+        WaitlistEntry.objects.bulk_create([
+            WaitlistEntry(client=self._waiter(f'cancelled_{i}'), service_type=service_type,
+                          company_id=service_type.company_id, window_start=_at(7, 8), window_end=_at(7, 12),
+                          position=i + 1, status='cancelled')
+            for i in range(6)
+        ])
+        api_client.post(f'/waitlist?client_id={window.id}', json={
+            'service_type_id': service_type.id,
+            'window_start': _at(7, 8).isoformat(),
+            'window_end': _at(7, 12).isoformat(),
+        })
+        api_client.post(f'/waitlist?client_id={late.id}', json={
+            'slot_id': slot.id, 'service_type_id': service_type.id,
+        })
+        assert WaitlistEntry.objects.get(client=window).position == 7
+        assert WaitlistEntry.objects.get(client=late).position == 1
+
+        api_client.patch(f'/{booking.id}/status?status=cancelled')
+
+        assert Booking.objects.get(slot=slot, status='confirmed').client == window
+
+    def test_promotion_lookup_uses_queue_indexes(self, slot):
+        from booking.waitlist import next_entry
+
+        with CaptureQueriesContext(connection) as queries:
+            assert next_entry(slot) is None
+
+        assert len(queries) == 2
+        plans = []
+        for query in queries:
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {query["sql"]}')
+                plans.append(' '.join(str(row[-1]) for row in cursor.fetchall()))
+        assert 'waitlist_slot_queue_idx' in plans[0]
+        assert 'waitlist_company_queue_idx' in plans[1]
+        assert not any('TEMP B-TREE' in plan for plan in plans)
@@ -0,0 +1,112 @@
+from typing import Iterable, List, Optional
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Max, Q
+
+from booking.models import Booking, WaitlistEntry
+from client.models import Client
+from core import outbox, sharding
+from servicetype.models import ServiceType
+from slot.models import Slot
+
+
+@sharding.atomic
+def join(client: Client, service_type: ServiceType, slot: Optional[Slot] = None,
+         window_start=None, window_end=None) -> WaitlistEntry:
+    """Coloca o cliente no fim da fila do slot (ou da janela da empresa)"""
+    if slot is not None:
+        if slot.company_id != service_type.company_id:
+            raise ValidationError('O serviço deve pertencer à mesma empresa do slot.')
+        if slot.is_available:
+            raise ValidationError('O slot está disponível: agende diretamente.')
+        if service_type.duration > slot.end_time - slot.start_time:
+            raise ValidationError('A duração do serviço excede o tempo disponível no slot.')
+        queue = WaitlistEntry.objects.filter(slot=slot)
+    else:
+        if not window_start or not window_end or window_end - window_start < service_type.duration:
+            raise ValidationError('Informe slot_id ou uma janela que comporte o serviço.')
+        queue = WaitlistEntry.objects.filter(company_id=service_type.company_id, slot__isnull=True)
+
+    # Empates de posição (inserções concorrentes) são desfeitos pelo id
+    last = queue.aggregate(last=Max('position'))['last'] or 0
+    return WaitlistEntry.objects.create(
+        client=client,
+        service_type=service_type,
+        company_id=service_type.company_id,
+        slot=slot,
+        window_start=window_start,
+        window_end=window_end,
+        position=last + 1
+    )
+
+
+def queue_heads(slot: Slot) -> List[WaitlistEntry]:
+    """
+    O primeiro de cada fila que pode ocupar o slot: a do próprio slot e a das
+    janelas da empresa que o contêm, com serviço que cabe nele. Uma consulta
+    por fila, cada uma ordenada pelo seu índice (slot, status, position) ou
+    (company, status, position), sem ordenação em tabela temporária.
+    """
+    waiting = WaitlistEntry.objects.select_related('service_type').filter(status='waiting')
+    heads = [
+        waiting.filter(slot=slot).order_by('position', 'id').first(),
+        waiting.filter(
+            slot__isnull=True,
+            company_id=slot.company_id,
+            window_start__lte=slot.start_time,
+            window_end__gte=slot.end_time,
+            service_type__duration__lte=slot.end_time - slot.start_time
+        ).order_by('position', 'id').first(),
+    ]
+    return [entry for entry in heads if entry is not None]
+
+
+def next_entry(slot: Slot) -> Optional[WaitlistEntry]:
+    """
+    Primeiro da fila para o slot. As posições só valem dentro de cada fila:
+    entre os primeiros de cada uma, vence quem entrou antes (created_at, id).
+    """
+    return min(queue_heads(slot), key=lambda entry: (entry.created_at, entry.id), default=None)
+
+
+def promote(slot_ids: Iterable[int]) -> List[Booking]:
+    """
+    Reserva os slots recém-liberados para o primeiro cliente de cada fila,
+    na transação de quem os liberou. Sem ninguém esperando, custa uma consulta.
+    """
+    slot_ids = list(slot_ids)
+    if not slot_ids:
+        return []
+
+    waiting = WaitlistEntry.objects.filter(status='waiting').filter(
+        Q(slot_id__in=slot_ids)
+        | Q(slot__isnull=True, company_id__in=Slot.objects.filter(id__in=slot_ids).values('company_id'))
+    )
+    if not waiting.exists():
+        return []
+
+    promoted = []
+    for slot in Slot.objects.filter(id__in=slot_ids, is_available=True).order_by('start_time'):
+        entry = next_entry(slot)
+        if entry is None:
+            continue
+
+        claimed = Slot.objects.claim(
+            slot.id,
+            company_id=entry.company_id,
+            end_time__gte=F('start_time') + entry.service_type.duration
+        )
+        if not claimed:
+            continue
+
+        booking = Booking(slot=slot, service_type=entry.service_type, client_id=entry.client_id, status='confirmed')
+        booking.save(validate=False)
+        WaitlistEntry.objects.filter(id=entry.id).update(status='promoted', booking=booking)
+        outbox.publish('booking.created', {
+            'booking_ids': [booking.id],
+            'status': 'confirmed',
+            'waitlist_entry_id': entry.id,
+        })
+        promoted.append(booking)
+
+    return promoted
@@ -1,21 +1,60 @@
+from typing import Optional
+from asgiref.sync import sync_to_async
 from ninja_extra import api_controller, route
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from ninja_extra.pagination import PaginatedResponseSchema, PageNumberPaginationExtra, paginate
+from ninja_extra.searching import searching
 from client.models import Client, User
-from client.schema import ClientIn, ClientOut
+from client.schema import ClientIn, ClientOut, ClientBulkIn
+from core import deletion
+from core.schemas import DeletionJobOut
+from core.search import FullTextSearching
+from user.hashing import PoolSaturated, hashing_pool
+from user.onboarding import bulk_onboard, onboarding_response
+from user.schema import BulkOnboardOut
+
+TEMPORARY_PASSWORD = "temporary_password"  # Deve ser seguro em produção
 
 
 @api_controller('/clients', tags=['Clients'])
 class ClientController:
     
+    def get_queryset(self):
+        """Clientes com o usuário no mesmo SELECT, só com as colunas de ClientOut"""
+        return Client.objects.active().select_related('user').only(
+            'id', 'name', 'phone', 'user__id', 'user__username', 'user__email'
+        )
+    
     @route.get('/', response=PaginatedResponseSchema[ClientOut])
     @paginate(PageNumberPaginationExtra)
+    @searching(FullTextSearching, search_fields=['name', 'phone'])
     def list_clients(self):
-        return Client.objects.all()
+        return self.get_queryset()
     
-    @route.post('/', response={201: ClientOut})
+    @route.post('/', response={201: ClientOut, 400: dict})
     def create_client(self, payload: ClientIn, user_id: int = None):
         """Create a client profile for a user"""
+        password = None if user_id else make_password(TEMPORARY_PASSWORD)
+        return self._create_client(payload, user_id, password)
+    
+    @route.post('/async', response={201: ClientOut, 400: dict, 503: dict})
+    async def create_client_async(self, payload: ClientIn, response: HttpResponse, user_id: int = None):
+        """Mesmo cadastro de POST /clients/ para servidores ASGI, com o hash no pool de hashing"""
+        password = None
+        if not user_id:
+            try:
+                password = await hashing_pool.hash(TEMPORARY_PASSWORD)
+            except PoolSaturated:
+                response['Retry-After'] = '1'
+                return 503, {"detail": "Muitos cadastros em andamento; tente novamente"}
+        
+        return await sync_to_async(self._create_client)(payload, user_id, password)
+    
+    @transaction.atomic
+    def _create_client(self, payload: ClientIn, user_id: Optional[int], password: Optional[str]):
         if user_id:
 
             user = get_object_or_404(User, id=user_id)
@@ -23,17 +62,15 @@ class ClientController:
             from user.controllers import UserController
             from user.schema import UserCreateIn
             
+            # Sem is_client: o perfil é criado logo abaixo, não pelo UserController
             user_payload = UserCreateIn(
                 username=f"client_{payload.name.lower().replace(' ', '_')}",
                 email=f"{payload.name.lower().replace(' ', '_')}@example.com",
-                password="temporary_password",  
-                is_client=True,
-                client_name=payload.name,
-                phone=payload.phone
+                password=TEMPORARY_PASSWORD,
             )
             
             user_controller = UserController()
-            status, user = user_controller.create_user(user_payload)
+            status, user = user_controller._create_user(user_payload, password)
             
             if status != 201:
                 return status, user  
@@ -44,22 +81,44 @@ class ClientController:
         )
         return 201, client
     
+    @route.post('/bulk', response={201: BulkOnboardOut, 400: BulkOnboardOut})
+    def bulk_create_clients(self, payload: ClientBulkIn):
+        """
+        Importa clientes em lote (ex.: a base de uma franquia). Os usuários são
+        criados sem senha e cada item criado traz um convite para defini-la.
+        """
+        results = bulk_onboard(
+            payload.items, Client,
+            lambda user, item: Client(user=user, name=item.name, phone=item.phone),
+            prefix='client'
+        )
+        return onboarding_response(results)
+    
     @route.get('/{client_id}', response=ClientOut)
     def get_client(self, client_id: int):
-        return get_object_or_404(Client, id=client_id)
+        return get_object_or_404(self.get_queryset(), id=client_id)
     
     @route.put('/{client_id}', response=ClientOut)
     def update_client(self, client_id: int, payload: ClientIn):
-        client = get_object_or_404(Client, id=client_id)
+        client = get_object_or_404(self.get_queryset(), id=client_id)
         client.name = payload.name
         client.phone = payload.phone
         client.save()
         return client
     
-    @route.delete('/{client_id}', response={204: None})
+    @route.delete('/{client_id}', response={202: DeletionJobOut, 404: dict})
     def delete_client(self, client_id: int):
+        """
+        Marca o cliente para remoção e responde na hora; as reservas são apagadas
+        em lotes por um job, liberando os slots (ver GET /{client_id}/deletion)
+        """
         client = get_object_or_404(Client, id=client_id)
-        user = client.user
-        client.delete()
-        user.delete()
-        return 204, None
\ No newline at end of file
+        return 202, deletion.request_deletion(client)
+    
+    @route.get('/{client_id}/deletion', response={200: DeletionJobOut, 404: dict})
+    def get_client_deletion(self, client_id: int):
+        """Progresso da remoção do cliente"""
+        job = deletion.latest_job('client', client_id)
+        if job is None:
+            return 404, {"detail": "Nenhuma remoção pedida para este cliente"}
+        return 200, job
\ No newline at end of file
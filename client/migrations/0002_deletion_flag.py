@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='is_deleting',
+            field=models.BooleanField(default=False),
+        ),
+    ]
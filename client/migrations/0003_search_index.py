@@ -0,0 +1,19 @@
+# Generated manually
+
+from django.db import migrations
+
+from core.search import index_operations
+
+# Índice de busca (FTS5 trigram) usado por core.search.FullTextSearching
+forwards, backwards = index_operations('client_client', ['name', 'phone'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('client', '0002_deletion_flag'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
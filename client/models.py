@@ -1,12 +1,26 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from company.models import ProfileQuerySet
+
 
 class Client(models.Model):
     """Cliente que agenda serviços"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='client')
     name = models.CharField(max_length=255)
     phone = models.CharField(max_length=20, blank=True, null=True)
+    # Remoção pedida: as reservas estão sendo apagadas em segundo plano
+    is_deleting = models.BooleanField(default=False)
+    
+    objects = ProfileQuerySet.as_manager()
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Dono lido do banco: se o perfil trocar de usuário, o perfil em cache
+        # do antigo também é invalidado (user.signals)
+        instance.loaded_user_id = instance.__dict__.get('user_id')
+        return instance
     
     def __str__(self):
         return self.name
\ No newline at end of file
@@ -1,5 +1,6 @@
 from ninja import Schema
-from typing import Optional
+from typing import List, Optional
+from pydantic import Field
 from core.schemas import UserOut
 
 
@@ -11,4 +12,12 @@ class ClientOut(Schema):
     id: int
     name: str
     phone: Optional[str]
-    user: UserOut
\ No newline at end of file
+    user: UserOut
+
+class ClientBulkItemIn(ClientIn):
+    # Sem username, usa o mesmo formato de POST /clients/ (client_<nome>)
+    username: Optional[str] = None
+    email: Optional[str] = None
+
+class ClientBulkIn(Schema):
+    items: List[ClientBulkItemIn] = Field(..., min_length=1, max_length=10000)
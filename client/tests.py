@@ -1,3 +1,78 @@
-from django.test import TestCase
+import pytest
+from django.contrib.auth.models import User
+from ninja_extra.testing import TestClient
 
-# Create your tests here.
+from client.controllers import ClientController
+from client.models import Client
+
+
+@pytest.fixture
+def api_client():
+    return TestClient(ClientController)
+
+
+@pytest.fixture
+def clients():
+    return [
+        Client.objects.create(user=User.objects.create_user(username=f'client{i}', email=f'client{i}@example.com'), name=f'Client {i}')
+        for i in range(15)
+    ]
+
+
+@pytest.mark.django_db
+class TestQueryBudget:
+    """Consultas por endpoint fixas, independentes do tamanho da página"""
+
+    def test_list_clients(self, api_client, clients, django_assert_num_queries):
+        # COUNT e página (usuário via JOIN)
+        with django_assert_num_queries(2):
+            response = api_client.get('/', query_params={'page_size': 50})
+
+        assert response.status_code == 200
+        assert {client['user']['username'] for client in response.json()['results']} == {
+            f'client{i}' for i in range(15)
+        }
+
+    def test_get_client(self, api_client, clients, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            response = api_client.get(f'/{clients[0].id}')
+
+        assert response.json()['user']['email'] == 'client0@example.com'
+
+
+@pytest.mark.django_db
+class TestBulkOnboarding:
+
+    def test_creates_in_chunks_without_hashing(self, api_client, settings, django_assert_num_queries):
+        settings.BULK_ONBOARDING_CHUNK_SIZE = 10
+        items = [{'name': f'Cliente {i}', 'phone': '11999999999'} for i in range(25)]
+
+        # Por lote: nomes existentes, SAVEPOINT, INSERT de usuários e de clientes, RELEASE
+        with django_assert_num_queries(15):
+            response = api_client.post('/bulk', json={'items': items})
+
+        assert response.status_code == 201
+        body = response.json()
+        assert body['created'] == 25
+        assert body['results'][0]['username'] == 'client_cliente_0'
+        assert all(result['invite_token'] for result in body['results'])
+        assert Client.objects.count() == 25
+        assert not any(user.has_usable_password() for user in User.objects.all())
+
+    def test_rejects_taken_and_repeated_usernames(self, api_client, clients):
+        response = api_client.post('/bulk', json={'items': [
+            {'name': 'Novo', 'username': 'client0'},
+            {'name': 'Maria'},
+            {'name': 'Maria'},
+        ]})
+
+        results = response.json()['results']
+        assert [result['status'] for result in results] == [400, 201, 400]
+        assert results[0]['detail'] == 'Nome de usuário já existe'
+        assert results[2]['detail'] == 'Nome de usuário repetido no lote'
+
+    def test_nothing_created(self, api_client, clients):
+        response = api_client.post('/bulk', json={'items': [{'name': 'Novo', 'username': 'client1'}]})
+
+        assert response.status_code == 400
+        assert response.json()['detail'] == 'Nenhum cadastro foi criado'
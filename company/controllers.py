@@ -1,32 +1,99 @@
+from typing import Optional
+from asgiref.sync import sync_to_async
 from ninja_extra import api_controller, route
+from django.contrib.auth.hashers import make_password
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from ninja_extra.pagination import PaginatedResponseSchema, PageNumberPaginationExtra, paginate
+from ninja_extra.searching import searching
 from django.contrib.auth.models import User
 from user.controllers import UserController
 from user.schema import UserCreateIn
-from django.db import IntegrityError
+from django.db import IntegrityError, connections, transaction
 from ninja import NinjaAPI
+from datetime import date
+from django.db.models import Value
+from django.db.models.functions import Lower
 
+from company import rollups
 from company.models import Company
 from company.schema import (
-    CompanyIn, CompanyOut,
+    CompanyIn, CompanyOut, CompanyStatsOut, CompanyBulkIn,
 )
+from core import deletion
+from core.schemas import DeletionJobOut
+from core.search import FullTextSearching
+from core.sharding import sharded
+from user.hashing import PoolSaturated, hashing_pool
+from user.onboarding import bulk_onboard, onboarding_response
+from user.schema import BulkOnboardOut
+
+TEMPORARY_PASSWORD = "temporary_password"  # Deve ser seguro em produção
+
+
+def _name_taken(name: str) -> bool:
+    """
+    Se alguma empresa já usa o nome, comparado como o índice
+    company_name_ci_unique compara: pelo LOWER do banco, não pelo lower() do
+    Python (o do SQLite só converte letras ASCII)
+    """
+    return Company.objects.annotate(lower_name=Lower('name')).filter(lower_name=Lower(Value(name))).exists()
+
+
+def _taken_names(names):
+    """
+    Chave de cada nome (em minúsculas pelo LOWER do banco, como o índice
+    company_name_ci_unique compara) e quais chaves já são usadas por alguma
+    empresa. Duas consultas por lote; a segunda usa o índice em Lower(name).
+    """
+    names = list(names)
+    if not names:
+        return {}, set()
+
+    connection = connections[Company.objects.db]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT column1, LOWER(column1) FROM (VALUES {})'.format(', '.join(['(%s)'] * len(names))),
+            names
+        )
+        keys = dict(cursor.fetchall())
+    used = set(
+        Company.objects.annotate(lower_name=Lower('name'))
+        .filter(lower_name__in=set(keys.values())).values_list('lower_name', flat=True)
+    )
+    return keys, used
+
 
 @api_controller('/companies', tags=['Companies'])
 class CompanyController:
     
     @route.get('/', response=PaginatedResponseSchema[CompanyOut])
     @paginate(PageNumberPaginationExtra)
+    @searching(FullTextSearching, search_fields=['name', 'description'])
     def list_companies(self):
-        companies = Company.objects.all()
+        companies = Company.objects.active()
         return companies
     
     @route.post('/', response={201: CompanyOut, 400: dict})
     def create_company(self, payload: CompanyIn, user_id: int = None):
-        # Verificar se já existe empresa com esse nome
-        if Company.objects.filter(name__iexact=payload.name).exists():
-            return 400, {"error": "Já existe uma empresa com este nome"}
+        password = None if user_id else make_password(TEMPORARY_PASSWORD)
+        return self._create_company(payload, user_id, password)
+    
+    @route.post('/async', response={201: CompanyOut, 400: dict, 503: dict})
+    async def create_company_async(self, payload: CompanyIn, response: HttpResponse, user_id: int = None):
+        """Mesmo cadastro de POST /companies/ para servidores ASGI, com o hash no pool de hashing"""
+        password = None
+        if not user_id:
+            try:
+                password = await hashing_pool.hash(TEMPORARY_PASSWORD)
+            except PoolSaturated:
+                response['Retry-After'] = '1'
+                return 503, {"error": "Muitos cadastros em andamento; tente novamente"}
         
+        return await sync_to_async(self._create_company)(payload, user_id, password)
+    
+    @transaction.atomic
+    def _create_company(self, payload: CompanyIn, user_id: Optional[int], password: Optional[str]):
         if user_id:
             user = get_object_or_404(User, id=user_id)
             
@@ -34,55 +101,104 @@ class CompanyController:
             if Company.objects.filter(user=user).exists():
                 return 400, {"error": "Este usuário já possui uma empresa associada"}
         else:                
+            # Sem is_company: a empresa é criada logo abaixo, não pelo UserController
             user_payload = UserCreateIn(
                 username=f"company_{payload.name.lower().replace(' ', '_')}",
                 email=f"{payload.name.lower().replace(' ', '_')}@example.com",
-                password="temporary_password",  # Deve ser seguro em produção
-                is_company=True,
-                company_name=payload.name
+                password=TEMPORARY_PASSWORD,
             )
             
-            # Chamar o controlador de usuário para criar um usuário com perfil de empresa
+            # Chamar o controlador de usuário para criar o usuário dono da empresa
             user_controller = UserController()
-            status, user = user_controller.create_user(user_payload)
+            try:
+                with transaction.atomic():
+                    status, user = user_controller._create_user(user_payload, password)
+            except IntegrityError:
+                # O nome de usuário sai do nome da empresa, mas pode colidir
+                # com outro usuário sem uma empresa com o mesmo nome
+                if _name_taken(payload.name):
+                    return 400, {"error": "Já existe uma empresa com este nome"}
+                return 400, {"error": f"Já existe um usuário com o nome {user_payload.username}"}
             
             if status != 201:
                 return status, user  # Retornar erro se a criação do usuário falhar
                 
         try:
-            company = Company.objects.create(
-                user=user,
-                name=payload.name,
-                description=payload.description
-            )
+            # A unicidade do nome (sem diferenciar maiúsculas) é garantida pelo índice
+            with transaction.atomic():
+                company = Company.objects.create(
+                    user=user,
+                    name=payload.name,
+                    description=payload.description
+                )
             return 201, company
             
-        except IntegrityError as e:
-            # Captura qualquer outro erro de integridade não previsto
-            return 400, {"error": str(e)}
+        except IntegrityError:
+            # Qual restrição falhou, consultado antes de marcar o rollback
+            if not _name_taken(payload.name) and Company.objects.filter(user=user).exists():
+                error = "Este usuário já possui uma empresa associada"
+            else:
+                error = "Já existe uma empresa com este nome"
+            # Desfaz também o usuário criado acima
+            transaction.set_rollback(True)
+            return 400, {"error": error}
+    
+    @route.post('/bulk', response={201: BulkOnboardOut, 400: BulkOnboardOut})
+    def bulk_create_companies(self, payload: CompanyBulkIn):
+        """
+        Importa empresas em lote (ex.: as unidades de uma franquia). Os usuários
+        são criados sem senha e cada item criado traz um convite para defini-la.
+        """
+        results = bulk_onboard(
+            payload.items, Company,
+            lambda user, item: Company(user=user, name=item.name, description=item.description),
+            prefix='company', taken_names=_taken_names
+        )
+        return onboarding_response(results)
     
     @route.get('/{company_id}', response=CompanyOut)
     def get_company(self, company_id: int):
-        company = get_object_or_404(Company, id=company_id)
+        company = get_object_or_404(Company.objects.active(), id=company_id)
         return company
     
+    @route.get('/{company_id}/stats', response={200: CompanyStatsOut, 400: dict})
+    @sharded(company='company_id')
+    def get_company_stats(self, company_id: int, start_date: date, end_date: date):
+        """Slots, ocupação e reservas por status no período, somando o resumo diário"""
+        get_object_or_404(Company, id=company_id)
+        
+        if end_date < start_date:
+            return 400, {"error": "A data final deve ser posterior à inicial"}
+        
+        return 200, rollups.summarize(company_id, start_date, end_date)
+    
     @route.put('/{company_id}', response={200: CompanyOut, 400: dict})
     def update_company(self, company_id: int, payload: CompanyIn):
-        company = get_object_or_404(Company, id=company_id)
-        
-        # Verificar se o novo nome já existe em outra empresa
-        if Company.objects.exclude(id=company_id).filter(name__iexact=payload.name).exists():
-            return 400, {"error": "Já existe outra empresa com este nome"}
-            
+        company = get_object_or_404(Company.objects.active(), id=company_id)
         company.name = payload.name
         company.description = payload.description
-        company.save()
+        
+        try:
+            with transaction.atomic():
+                company.save()
+        except IntegrityError:
+            # Único motivo possível: o novo nome já existe em outra empresa
+            return 400, {"error": "Já existe outra empresa com este nome"}
         return 200, company
     
-    @route.delete('/{company_id}', response={204: None, 404: dict})
+    @route.delete('/{company_id}', response={202: DeletionJobOut, 404: dict})
     def delete_company(self, company_id: int):
+        """
+        Marca a empresa para remoção e responde na hora; slots, reservas e o
+        restante são apagados em lotes por um job (ver GET /{company_id}/deletion)
+        """
         company = get_object_or_404(Company, id=company_id)
-        user = company.user
-        company.delete()
-        user.delete()
-        return 204, None
\ No newline at end of file
+        return 202, deletion.request_deletion(company)
+    
+    @route.get('/{company_id}/deletion', response={200: DeletionJobOut, 404: dict})
+    def get_company_deletion(self, company_id: int):
+        """Progresso da remoção da empresa"""
+        job = deletion.latest_job('company', company_id)
+        if job is None:
+            return 404, {"error": "Nenhuma remoção pedida para esta empresa"}
+        return 200, job
\ No newline at end of file
@@ -0,0 +1,58 @@
+import timeit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+
+from company.models import Company
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a checagem de nome de empresa duplicado conforme a tabela cresce: a busca '
+        'antiga (name__iexact) contra o índice único em Lower(name). As empresas de teste '
+        'são criadas numa transação desfeita no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Quantidades de empresas a medir (padrão: 1000 10000 100000)')
+        parser.add_argument('--repeat', type=int, default=200, help='Checagens por medida (padrão: 200)')
+
+    def _grow(self, current: int, size: int) -> None:
+        users = User.objects.bulk_create(
+            [User(username=f'benchmark_{i}') for i in range(current, size)], batch_size=1000
+        )
+        Company.objects.bulk_create(
+            [Company(user=user, name=f'Empresa Benchmark {i}') for i, user in zip(range(current, size), users)],
+            batch_size=1000
+        )
+
+    def _duplicate_insert(self, user: User, name: str) -> None:
+        try:
+            with transaction.atomic():
+                Company.objects.create(user=user, name=name)
+        except IntegrityError:
+            pass
+
+    def handle(self, *args, sizes=None, repeat=200, **options):
+        self.stdout.write(f"{'empresas':>9}  {'iexact (µs)':>12}  {'índice (µs)':>12}")
+        try:
+            with transaction.atomic():
+                user = User.objects.create(username='benchmark_owner')
+                current = 0
+                for size in sorted(sizes):
+                    self._grow(current, size)
+                    current = size
+                    # Um nome no fim da tabela, com outra caixa
+                    name = f'EMPRESA BENCHMARK {size - 1}'
+                    scan = timeit.timeit(lambda: Company.objects.filter(name__iexact=name).exists(), number=repeat)
+                    index = timeit.timeit(lambda: self._duplicate_insert(user, name), number=repeat)
+                    self.stdout.write(f'{size:>9}  {scan * 1e6 / repeat:>12.1f}  {index * 1e6 / repeat:>12.1f}')
+                raise _Rollback
+        except _Rollback:
+            pass
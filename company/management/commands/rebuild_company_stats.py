@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from company import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recalcula do zero o resumo diário (CompanyDailyStats) a partir de slots e reservas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, action='append', dest='company_ids',
+                            help='Recalcula só esta empresa (pode repetir)')
+
+    def handle(self, *args, company_ids=None, **options):
+        rebuilt = rollups.rebuild(company_ids)
+        self.stdout.write(self.style.SUCCESS(f'Resumo diário recalculado para {rebuilt} empresa(s)'))
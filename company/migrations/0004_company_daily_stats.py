@@ -0,0 +1,28 @@
+# Generated by Django 4.2.10 on 2026-10-18 08:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0003_auto_revert_to_default_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('metric', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='company.company')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='companydailystats',
+            constraint=models.UniqueConstraint(fields=('company', 'day', 'metric'), name='company_daily_stats_unique'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:01
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+def renamed_duplicates(rows):
+    """
+    Novos nomes para as empresas cujo nome repete o de uma mais antiga sem
+    diferenciar maiúsculas. `rows` são (id, nome, nome em minúsculas pelo
+    banco), em ordem de id; a mais antiga mantém o nome e as outras ganham
+    um sufixo " (2)", " (3)"... ainda livre.
+    """
+    taken = {lowered for _, _, lowered in rows}
+    seen = set()
+    renamed = {}
+    for company_id, name, lowered in rows:
+        if lowered not in seen:
+            seen.add(lowered)
+            continue
+
+        number = 2
+        while f'{lowered} ({number})' in taken:
+            number += 1
+        suffix = f' ({number})'
+        renamed[company_id] = name[:255 - len(suffix)] + suffix
+        taken.add(f'{lowered} ({number})')
+    return renamed
+
+
+def rename_duplicates(apps, schema_editor):
+    # Sem isso o índice único abaixo não pode ser criado num banco com nomes repetidos
+    Company = apps.get_model('company', 'Company')
+    rows = Company.objects.order_by('id').values_list(
+        'id', 'name', django.db.models.functions.text.Lower('name')
+    )
+    for company_id, name in renamed_duplicates(list(rows)).items():
+        Company.objects.filter(id=company_id).update(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0004_company_daily_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='company',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='company_name_ci_unique', violation_error_message='Já existe uma empresa com este nome'),
+        ),
+    ]
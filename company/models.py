@@ -1,12 +1,60 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 
 
+class ProfileQuerySet(models.QuerySet):
+    def active(self):
+        """Sem os perfis marcados para remoção (core.deletion)"""
+        return self.filter(is_deleting=False)
+
+
 class Company(models.Model):
     """Empresa/prestador de serviços"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='company')
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
+    # Remoção pedida: os dependentes estão sendo apagados em segundo plano
+    is_deleting = models.BooleanField(default=False)
+    
+    objects = ProfileQuerySet.as_manager()
+    
+    class Meta:
+        constraints = [
+            # Nome único sem diferenciar maiúsculas; o índice também atende buscas por Lower('name')
+            models.UniqueConstraint(
+                Lower('name'),
+                name='company_name_ci_unique',
+                violation_error_message='Já existe uma empresa com este nome'
+            ),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Dono lido do banco: se o perfil trocar de usuário, o perfil em cache
+        # do antigo também é invalidado (user.signals)
+        instance.loaded_user_id = instance.__dict__.get('user_id')
+        return instance
+    
+    def __str__(self):
+        return self.name
+
+class CompanyDailyStats(models.Model):
+    """
+    Contagens diárias por empresa (slots, slots livres e reservas por status),
+    mantidas por company.rollups a cada escrita em slots e reservas
+    """
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    # 'slots', 'available' ou um status de reserva
+    metric = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['company', 'day', 'metric'], name='company_daily_stats_unique'),
+        ]
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f'{self.company_id} {self.day} {self.metric}={self.count}'
@@ -0,0 +1,171 @@
+import threading
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Optional, Set
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from booking.models import Booking
+from company.models import Company, CompanyDailyStats
+from core import sharding
+from slot.models import Slot
+
+
+_pending = threading.local()
+
+
+def _state():
+    if not hasattr(_pending, 'cells'):
+        _pending.cells = set()
+        _pending.slot_ids = set()
+        _pending.booking_ids = set()
+    return _pending
+
+
+def local_day(moment: datetime) -> date:
+    return timezone.localtime(moment).date() if timezone.is_aware(moment) else moment.date()
+
+
+def touch(company_id: Optional[int] = None, start: Optional[datetime] = None, end: Optional[datetime] = None,
+          slot_ids: Iterable[int] = (), booking_ids: Iterable[int] = ()) -> None:
+    """
+    Marca dias de uma empresa (ou os dias de slots/reservas) para serem
+    recalculados quando a transação atual for confirmada. Várias marcações na
+    mesma transação viram um único recálculo.
+    """
+    state = _state()
+    if company_id is not None and start is not None:
+        day, last = local_day(start), local_day(end or start)
+        while day <= last:
+            state.cells.add((company_id, day))
+            day += timedelta(days=1)
+    state.slot_ids.update(slot_ids)
+    state.booking_ids.update(booking_ids)
+
+    # Só o primeiro flush da transação tem trabalho; os demais encontram as
+    # marcações vazias. Se a transação for desfeita, as marcações ficam para o
+    # próximo recálculo (recalcular um dia intacto não muda nada). Uma falha
+    # aqui não derruba a requisição já confirmada: rebuild() corrige o resumo
+    sharding.on_commit(flush, robust=True)
+
+
+def discard() -> None:
+    """Esquece as marcações pendentes desta thread"""
+    _pending.cells, _pending.slot_ids, _pending.booking_ids = set(), set(), set()
+
+
+def flush() -> None:
+    """Recalcula os dias marcados por touch()"""
+    state = _state()
+    cells = state.cells
+    slot_ids, booking_ids = state.slot_ids, state.booking_ids
+    if not (cells or slot_ids or booking_ids):
+        return
+    discard()
+
+    if slot_ids:
+        for company_id, start in Slot.objects.filter(id__in=slot_ids).values_list('company_id', 'start_time'):
+            cells.add((company_id, local_day(start)))
+    if booking_ids:
+        rows = Booking.objects.filter(id__in=booking_ids).values_list('slot__company_id', 'slot__start_time')
+        for company_id, start in rows:
+            cells.add((company_id, local_day(start)))
+
+    days_by_company: Dict[int, Set[date]] = defaultdict(set)
+    for company_id, day in cells:
+        days_by_company[company_id].add(day)
+
+    for company_id, days in days_by_company.items():
+        refresh(company_id, min(days), max(days))
+
+
+def _window(first_day: date, last_day: date):
+    start = timezone.make_aware(datetime.combine(first_day, time()))
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time()))
+    return start, end
+
+
+@sharding.atomic
+def refresh(company_id: int, first_day: date, last_day: date) -> None:
+    """
+    Recalcula as linhas da empresa entre os dois dias (inclusive) com duas
+    agregações pelos índices (company, start_time) e regrava o intervalo.
+    """
+    start, end = _window(first_day, last_day)
+    counts = defaultdict(int)
+
+    slot_rows = Slot.objects.filter(
+        company_id=company_id, start_time__gte=start, start_time__lt=end
+    ).annotate(day=TruncDate('start_time')).values('day').annotate(
+        slots=Count('id'), available=Count('id', filter=Q(is_available=True))
+    ).order_by()
+    for row in slot_rows:
+        counts[(row['day'], 'slots')] = row['slots']
+        counts[(row['day'], 'available')] = row['available']
+
+    booking_rows = Booking.objects.filter(
+        slot__company_id=company_id, slot__start_time__gte=start, slot__start_time__lt=end
+    ).annotate(day=TruncDate('slot__start_time')).values('day', 'status').annotate(n=Count('id')).order_by()
+    for row in booking_rows:
+        counts[(row['day'], row['status'])] = row['n']
+
+    CompanyDailyStats.objects.filter(company_id=company_id, day__gte=first_day, day__lte=last_day).delete()
+    CompanyDailyStats.objects.bulk_create([
+        CompanyDailyStats(company_id=company_id, day=day, metric=metric, count=count)
+        for (day, metric), count in counts.items() if count
+    ])
+
+
+def rebuild(company_ids: Optional[Iterable[int]] = None) -> int:
+    """Recalcula do zero as linhas das empresas (todas, por padrão). Retorna quantas empresas"""
+    companies = Company.objects.all()
+    if company_ids is not None:
+        companies = companies.filter(id__in=company_ids)
+
+    rebuilt = 0
+    for company_id in companies.values_list('id', flat=True):
+        with sharding.for_company(company_id):
+            CompanyDailyStats.objects.filter(company_id=company_id).delete()
+            bounds = Slot.objects.filter(company_id=company_id).order_by('start_time').values_list(
+                'start_time', flat=True
+            )
+            first, last = bounds.first(), bounds.last()
+            if first is not None:
+                refresh(company_id, local_day(first), local_day(last))
+        rebuilt += 1
+    return rebuilt
+
+
+def summarize(company_id: int, first_day: date, last_day: date) -> dict:
+    """Soma as linhas do intervalo: totais e um resumo por dia (uma consulta)"""
+    rows = CompanyDailyStats.objects.filter(
+        company_id=company_id, day__gte=first_day, day__lte=last_day
+    ).values_list('day', 'metric', 'count').order_by('day')
+
+    days = defaultdict(lambda: defaultdict(int))
+    totals = defaultdict(int)
+    for day, metric, count in rows:
+        days[day][metric] += count
+        totals[metric] += count
+
+    return {
+        'company_id': company_id,
+        'start_date': first_day,
+        'end_date': last_day,
+        'totals': _stats(totals),
+        'days': [{'day': day, **_stats(metrics)} for day, metrics in days.items()],
+    }
+
+
+def _stats(metrics: dict) -> dict:
+    slots, available = metrics.get('slots', 0), metrics.get('available', 0)
+    booked = slots - available
+    return {
+        'slots': slots,
+        'available': available,
+        'booked': booked,
+        'utilization': round(100 * booked / slots, 1) if slots else 0.0,
+        'by_status': {metric: count for metric, count in metrics.items() if metric not in ('slots', 'available')},
+    }
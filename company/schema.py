@@ -1,5 +1,7 @@
 from ninja import Schema
-from typing import Optional
+from datetime import date
+from typing import Dict, List, Optional
+from pydantic import Field
 
 
 
@@ -11,7 +13,37 @@ class CompanyIn(Schema):
     description: Optional[str] = None
 
 
+class CompanyBulkItemIn(CompanyIn):
+    # Sem username, usa o mesmo formato de POST /companies/ (company_<nome>)
+    username: Optional[str] = None
+    email: Optional[str] = None
+
+
+class CompanyBulkIn(Schema):
+    items: List[CompanyBulkItemIn] = Field(..., min_length=1, max_length=10000)
+
+
 class CompanyOut(Schema):
     id: int
     name: str
-    description: Optional[str]
\ No newline at end of file
+    description: Optional[str]
+
+
+class StatsOut(Schema):
+    slots: int
+    available: int
+    booked: int
+    utilization: float  # % dos slots ocupados
+    by_status: Dict[str, int]
+
+
+class DayStatsOut(StatsOut):
+    day: date
+
+
+class CompanyStatsOut(Schema):
+    company_id: int
+    start_date: date
+    end_date: date
+    totals: StatsOut
+    days: List[DayStatsOut]
\ No newline at end of file
@@ -1,3 +1,4 @@
+import importlib
 import pytest
 from django.urls import reverse
 from rest_framework.test import APIClient
@@ -117,3 +118,218 @@ class TestCompanyAPI:
         
         assert response.status_code == 200
         assert len(response.data) == 0  # Inicialmente não há slots
+
+
+@pytest.mark.django_db
+class TestCompanyStats:
+
+    @pytest.fixture
+    def stats_client(self):
+        from ninja_extra.testing import TestClient
+        from company.controllers import CompanyController
+
+        return TestClient(CompanyController)
+
+    @pytest.fixture
+    def company(self, user):
+        return Company.objects.create(user=user, name='Test Company')
+
+    def _book(self, company, slot_ids):
+        from datetime import timedelta
+        from ninja_extra.testing import TestClient
+        from booking.controllers import BookingController
+        from client.models import Client
+        from servicetype.models import ServiceType
+
+        client = Client.objects.create(user=User.objects.create_user(username='client'), name='Client')
+        service_type = ServiceType.objects.create(company=company, name='Corte', duration=timedelta(minutes=30))
+        booking_client = TestClient(BookingController)
+        return [
+            booking_client.post(f'/?client_id={client.id}', json={
+                'slot_id': slot_id, 'service_type_id': service_type.id
+            }).json()['id']
+            for slot_id in slot_ids
+        ]
+
+    def test_rollups_follow_writes(self, stats_client, company, django_capture_on_commit_callbacks,
+                                   django_assert_num_queries):
+        from datetime import datetime
+        from ninja_extra.testing import TestClient
+        from booking.controllers import BookingController
+        from slot.generation import generate_slots
+        from slot.models import Slot
+
+        with django_capture_on_commit_callbacks(execute=True):
+            generate_slots(company, datetime(2030, 1, 7), datetime(2030, 1, 8), start_hour=9, end_hour=13)
+        slot_ids = list(Slot.objects.filter(start_time__day=7).values_list('id', flat=True))
+        with django_capture_on_commit_callbacks(execute=True):
+            booking_ids = self._book(company, slot_ids[:3])
+        with django_capture_on_commit_callbacks(execute=True):
+            TestClient(BookingController).patch(f'/{booking_ids[0]}/status?status=cancelled')
+
+        # A empresa e uma leitura do resumo, sem tocar em slots ou reservas
+        with django_assert_num_queries(2):
+            response = stats_client.get(f'/{company.id}/stats', query_params={
+                'start_date': '2030-01-07', 'end_date': '2030-01-08'
+            })
+
+        stats = response.json()
+        assert stats['totals'] == {
+            'slots': 8, 'available': 6, 'booked': 2, 'utilization': 25.0,
+            'by_status': {'confirmed': 2, 'cancelled': 1},
+        }
+        assert [(day['day'], day['booked']) for day in stats['days']] == [('2030-01-07', 2), ('2030-01-08', 0)]
+
+    def test_moved_slot_leaves_its_old_day(self, stats_client, company, django_capture_on_commit_callbacks):
+        from datetime import datetime
+        from django.utils import timezone
+        from ninja_extra.testing import TestClient
+        from slot.controllers import SlotController
+        from slot.models import Slot
+
+        start = timezone.make_aware(datetime(2030, 1, 7, 9))
+        with django_capture_on_commit_callbacks(execute=True):
+            slot = Slot.objects.create(company=company, start_time=start, end_time=start.replace(hour=10))
+        with django_capture_on_commit_callbacks(execute=True):
+            response = TestClient(SlotController).put(f'/{slot.id}', json={
+                'start_time': start.replace(day=8).isoformat(),
+                'end_time': start.replace(day=8, hour=10).isoformat(),
+            })
+        assert response.status_code == 200
+
+        stats = stats_client.get(f'/{company.id}/stats', query_params={
+            'start_date': '2030-01-07', 'end_date': '2030-01-08'
+        }).json()
+        # O dia 7 não conta mais o slot (dias vazios nem aparecem)
+        assert [(day['day'], day['slots']) for day in stats['days']] == [('2030-01-08', 1)]
+
+    def test_rebuild_command_matches_incremental(self, company, django_capture_on_commit_callbacks):
+        from datetime import date, datetime
+        from django.core.management import call_command
+        from company.models import CompanyDailyStats
+        from slot.generation import generate_slots
+        from slot.models import Slot
+
+        with django_capture_on_commit_callbacks(execute=True):
+            generate_slots(company, datetime(2030, 1, 7), datetime(2030, 1, 9), start_hour=9, end_hour=12)
+            self._book(company, Slot.objects.values_list('id', flat=True)[:2])
+        incremental = set(CompanyDailyStats.objects.values_list('day', 'metric', 'count'))
+
+        CompanyDailyStats.objects.all().delete()
+        call_command('rebuild_company_stats', stdout=open('/dev/null', 'w'))
+
+        assert set(CompanyDailyStats.objects.values_list('day', 'metric', 'count')) == incremental
+        assert (date(2030, 1, 7), 'confirmed', 2) in incremental
+
+
+@pytest.mark.django_db
+class TestCompanyNames:
+
+    @pytest.fixture
+    def names_client(self):
+        from ninja_extra.testing import TestClient
+        from company.controllers import CompanyController
+
+        return TestClient(CompanyController)
+
+    def test_duplicate_name_ignores_case(self, names_client, user):
+        Company.objects.create(user=User.objects.create_user(username='other'), name='Barbearia Central')
+
+        response = names_client.post(f'/?user_id={user.id}', json={'name': 'BARBEARIA central'})
+
+        assert response.status_code == 400
+        assert response.json() == {'error': 'Já existe uma empresa com este nome'}
+        assert Company.objects.count() == 1
+
+    def test_create_without_user_rolls_back_on_conflict(self, names_client):
+        response = names_client.post('/', json={'name': 'Barbearia Central'})
+        assert response.status_code == 201
+        assert Company.objects.get().user.username == 'company_barbearia_central'
+
+        response = names_client.post('/', json={'name': 'barbearia central'})
+        assert response.status_code == 400
+        assert User.objects.count() == 1
+
+    @pytest.mark.parametrize('name', ['ÓTICA BOA', 'Ótica Boa'])
+    @pytest.mark.parametrize('with_user', [True, False])
+    def test_accented_duplicate_name(self, names_client, user, name, with_user):
+        Company.objects.create(user=User.objects.create_user(username='other'), name='Ótica Boa')
+
+        url = f'/?user_id={user.id}' if with_user else '/'
+        response = names_client.post(url, json={'name': name})
+
+        assert response.status_code == 400
+        assert response.json() == {'error': 'Já existe uma empresa com este nome'}
+        assert Company.objects.count() == 1
+
+    def test_username_collision_is_not_reported_as_company_name(self, names_client):
+        User.objects.create_user(username='company_barbearia_central')
+
+        response = names_client.post('/', json={'name': 'Barbearia Central'})
+
+        assert response.status_code == 400
+        assert response.json() == {'error': 'Já existe um usuário com o nome company_barbearia_central'}
+
+    def test_migration_renames_case_duplicates(self):
+        migration = importlib.import_module('company.migrations.0005_company_name_ci_unique')
+
+        renamed = migration.renamed_duplicates([
+            (1, 'Barbearia', 'barbearia'),
+            (2, 'BARBEARIA', 'barbearia'),
+            (3, 'barbearia (2)', 'barbearia (2)'),
+            (4, 'Salão', 'salão'),
+            (5, 'barbearia', 'barbearia'),
+        ])
+
+        # A mais antiga mantém o nome; os sufixos pulam nomes já usados
+        assert renamed == {2: 'BARBEARIA (3)', 5: 'barbearia (4)'}
+
+    def test_rename_to_existing_name(self, names_client, user):
+        Company.objects.create(user=User.objects.create_user(username='other'), name='Barbearia Central')
+        company = Company.objects.create(user=user, name='Salão Norte')
+
+        response = names_client.put(f'/{company.id}', json={'name': 'Barbearia CENTRAL'})
+        assert response.status_code == 400
+        assert response.json() == {'error': 'Já existe outra empresa com este nome'}
+
+        response = names_client.put(f'/{company.id}', json={'name': 'SALÃO NORTE'})
+        assert response.status_code == 200
+
+    def test_bulk_rejects_names_in_use(self, names_client):
+        Company.objects.create(user=User.objects.create_user(username='other'), name='Barbearia Central')
+
+        response = names_client.post('/bulk', json={'items': [
+            {'name': 'BARBEARIA CENTRAL'},
+            {'name': 'Salão Norte'},
+            {'name': 'salão norte', 'username': 'salao_2'},
+        ]})
+
+        assert response.status_code == 201
+        assert [result['status'] for result in response.json()['results']] == [400, 201, 400]
+        assert set(Company.objects.values_list('name', flat=True)) == {'Barbearia Central', 'Salão Norte'}
+
+    def test_bulk_rejects_accented_name_in_use(self, names_client):
+        Company.objects.create(user=User.objects.create_user(username='other'), name='Ótica Boa')
+
+        response = names_client.post('/bulk', json={'items': [{'name': 'ÓTICA BOA'}, {'name': 'Padaria'}]})
+
+        assert response.status_code == 201
+        results = response.json()['results']
+        assert [result['status'] for result in results] == [400, 201]
+        assert results[0]['detail'] == 'Já existe uma empresa com este nome'
+
+    def test_bulk_conflict_at_insert_fails_only_that_item(self):
+        from user.onboarding import bulk_onboard
+        from company.schema import CompanyBulkIn
+
+        Company.objects.create(user=User.objects.create_user(username='other'), name='Ótica Boa')
+        items = CompanyBulkIn(items=[{'name': 'ÓTICA BOA'}, {'name': 'Padaria'}]).items
+
+        # Como se a empresa tivesse sido criada depois da checagem dos nomes
+        results = bulk_onboard(
+            items, Company, lambda user, item: Company(user=user, name=item.name),
+            prefix='company', taken_names=lambda names: ({name: name for name in names}, set())
+        )
+
+        assert [result['status'] for result in results] == [400, 201]
+        assert Company.objects.filter(name='Padaria').exists()
@@ -0,0 +1,32 @@
+import pytest
+
+# Bancos dos shards nos testes (core/testes/test_sharding.py). Ficam
+# desligados (DATABASE_SHARDS vazio) fora da fixture `shards`
+TEST_SHARDS = ['shard_0', 'shard_1']
+
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix):
+    from django.conf import settings
+    from django.db import connections
+
+    for alias in TEST_SHARDS:
+        settings.DATABASES.setdefault(alias, {'ENGINE': 'django.db.backends.sqlite3', 'NAME': f'{alias}.sqlite3'})
+    connections.configure_settings(settings.DATABASES)
+
+
+@pytest.fixture(autouse=True)
+def reset_in_process_state():
+    # Cada teste roda numa transação desfeita no final; índices e caches em
+    # memória montados durante o teste não podem vazar para o próximo
+    from django.core.cache import cache
+    from company import rollups
+    from slot.intervals import slot_index
+
+    slot_index.invalidate()
+    cache.clear()
+    rollups.discard()
+    yield
+    slot_index.invalidate()
+    cache.clear()
+    rollups.discard()
@@ -1,15 +1,20 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
 from ninja_extra import NinjaExtraAPI
 from ninja.openapi.docs import Swagger
 
 from company.controllers import CompanyController
 from client.controllers import ClientController
 from servicetype.controllers import ServiceTypeController
-from slot.controllers import SlotController
+from slot.controllers import SlotController, SlotTemplateController
 from booking.controllers import BookingController
 from user.controllers import UserController
 
 docs = Swagger(settings={'docExpansion': 'none'})
-api = NinjaExtraAPI(title="API de Agendamento", version="1.0.0", docs=docs, urls_namespace="api-1.0.0")
+renderer = import_string(getattr(settings, 'API_RENDERER', 'ninja.renderers.JSONRenderer'))()
+api = NinjaExtraAPI(
+    title="API de Agendamento", version="1.0.0", docs=docs, urls_namespace="api-1.0.0", renderer=renderer
+)
 
 # Registrando os controllers
 api.register_controllers(
@@ -17,6 +22,7 @@ api.register_controllers(
     ClientController,
     ServiceTypeController,
     SlotController,
+    SlotTemplateController,
     BookingController,
     UserController
 )
\ No newline at end of file
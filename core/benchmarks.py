@@ -0,0 +1,156 @@
+import importlib
+import inspect
+import timeit
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List
+
+from django.utils import timezone
+from ninja import Schema
+from ninja.renderers import JSONRenderer
+
+from booking.schema import (
+    BookingBatchItemOut, BookingBatchOut, BookingBulkStatusOut, BookingOut, WaitlistOut,
+)
+from client.schema import ClientOut
+from company.schema import CompanyOut, CompanyStatsOut, DayStatsOut, StatsOut
+from core import schemas as core_schemas
+from core.renderers import ORJSONRenderer
+from servicetype.schema import ServiceTypeCacheStatsOut, ServiceTypeOut
+from slot.schema import AvailabilityOut, FreeIntervalOut, SlotOut, SlotTemplateOut
+from user import schema as user_schema
+from user.schema import BulkOnboardItemOut, BulkOnboardOut, InviteOut
+
+# Módulos de schema varridos atrás de classes *Out
+SCHEMA_MODULES = (
+    'booking.schema', 'client.schema', 'company.schema', 'core.schemas',
+    'servicetype.schema', 'slot.schema', 'user.schema',
+)
+
+NOW = timezone.make_aware(datetime(2030, 1, 1, 9, 30, 15, 123456))
+
+
+def _user(i: int) -> dict:
+    return {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com', 'first_name': 'Ana', 'last_name': None}
+
+
+def _slot(i: int) -> dict:
+    return {'id': i, 'start_time': NOW, 'end_time': NOW + timedelta(hours=1), 'is_available': False, 'company_id': 1}
+
+
+def _service_type(i: int) -> dict:
+    return {
+        'id': i, 'name': 'Corte', 'description': 'Corte simples', 'duration_minutes': 45,
+        'price': Decimal('35.00'), 'company_id': 1,
+    }
+
+
+def _client(i: int) -> dict:
+    return {'id': i, 'name': f'Cliente {i}', 'phone': '11999999999', 'user': _user(i)}
+
+
+def _booking(i: int) -> dict:
+    return {
+        'id': i, 'slot': _slot(i), 'service_type': _service_type(i), 'client': _client(i),
+        'status': 'confirmed', 'created_at': NOW, 'expires_at': None, 'notes': None, 'extra_slot_ids': [i + 1],
+    }
+
+
+def _onboarded(i: int) -> dict:
+    return {
+        'index': i, 'status': 201, 'id': i, 'user_id': i, 'username': f'client_cliente_{i}',
+        'invite_uid': 'MTIz', 'invite_token': 'ck2x9a-0c6a2f1b9d8e7f6a5b4c3d2e1f0a9b8c', 'detail': None,
+    }
+
+
+def _stats(i: int) -> dict:
+    return {'slots': 24, 'available': 10, 'booked': 14, 'utilization': 58.33,
+            'by_status': {'confirmed': 12, 'cancelled': 2}}
+
+
+# Uma linha de exemplo por schema, no formato de .values() (ver core.rows)
+SAMPLES: Dict[type, Callable[[int], dict]] = {
+    BookingOut: _booking,
+    BookingBatchItemOut: lambda i: {'index': i, 'status': 201, 'booking': _booking(i), 'detail': None},
+    BookingBatchOut: lambda i: {'detail': None, 'results': [
+        {'index': n, 'status': 201, 'booking': _booking(n)} for n in range(10)
+    ]},
+    BookingBulkStatusOut: lambda i: {'updated': i},
+    WaitlistOut: lambda i: {
+        'id': i, 'client_id': 1, 'service_type_id': 1, 'slot_id': i, 'window_start': None, 'window_end': None,
+        'position': i, 'status': 'waiting', 'booking_id': None, 'created_at': NOW,
+    },
+    ClientOut: _client,
+    CompanyOut: lambda i: {'id': i, 'name': f'Empresa {i}', 'description': None},
+    StatsOut: _stats,
+    DayStatsOut: lambda i: {**_stats(i), 'day': NOW.date()},
+    CompanyStatsOut: lambda i: {
+        'company_id': i, 'start_date': NOW.date(), 'end_date': NOW.date() + timedelta(days=30),
+        'totals': _stats(i), 'days': [{**_stats(i), 'day': NOW.date() + timedelta(days=n)} for n in range(31)],
+    },
+    core_schemas.UserOut: _user,
+    core_schemas.DeletionJobOut: lambda i: {
+        'id': i, 'target': 'company', 'object_id': i, 'status': 'running', 'step': 'bookings',
+        'deleted': 1500, 'total': 4000, 'progress': 37.5, 'error': '', 'created_at': NOW, 'finished_at': None,
+    },
+    user_schema.UserOut: _user,
+    InviteOut: lambda i: {'uid': 'MTIz', 'token': 'ck2x9a-0c6a2f1b9d8e7f6a5b4c3d2e1f0a9b8c'},
+    BulkOnboardItemOut: _onboarded,
+    BulkOnboardOut: lambda i: {'created': 100, 'results': [_onboarded(n) for n in range(100)]},
+    ServiceTypeOut: _service_type,
+    ServiceTypeCacheStatsOut: lambda i: {'hits': i, 'misses': 1, 'hit_rate': 0.5},
+    SlotOut: _slot,
+    FreeIntervalOut: lambda i: {'start_time': NOW, 'end_time': NOW + timedelta(hours=i)},
+    AvailabilityOut: lambda i: {
+        'intervals': [{'start_time': NOW, 'end_time': NOW + timedelta(hours=8)}],
+        'start_times': [NOW + timedelta(minutes=30 * n) for n in range(16)],
+    },
+    SlotTemplateOut: lambda i: {
+        'id': i, 'company_id': 1, 'days_of_week': [0, 1, 2, 3, 4], 'day_start': time(9), 'day_end': time(18),
+        'duration': timedelta(minutes=30), 'valid_from': date(2030, 1, 1), 'valid_until': None,
+        'is_active': True, 'exception_dates': [date(2030, 1, 6)],
+    },
+}
+
+
+def out_schemas() -> List[type]:
+    """Todas as classes *Out declaradas nos módulos de schema"""
+    found = []
+    for module_name in SCHEMA_MODULES:
+        module = importlib.import_module(module_name)
+        found += [
+            cls for name, cls in inspect.getmembers(module, inspect.isclass)
+            if name.endswith('Out') and issubclass(cls, Schema) and cls.__module__ == module_name
+        ]
+    return found
+
+
+def _best(func: Callable, repeat: int) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def benchmark(schema: type, rows: int = 100, repeat: int = 5) -> dict:
+    """
+    Tempo (µs por linha, melhor de `repeat`) de cada etapa para uma página de
+    `rows` linhas: validação pelo schema, model_dump e renderização com o
+    json da stdlib e com orjson.
+    """
+    data = [SAMPLES[schema](i) for i in range(1, rows + 1)]
+    validated = [schema.model_validate(row) for row in data]
+    dumped = [item.model_dump() for item in validated]
+    json_renderer, orjson_renderer = JSONRenderer(), ORJSONRenderer()
+
+    timings = {
+        'validate': _best(lambda: [schema.model_validate(row) for row in data], repeat),
+        'dump': _best(lambda: [item.model_dump() for item in validated], repeat),
+        'json': _best(lambda: json_renderer.render(None, dumped, response_status=200), repeat),
+        'orjson': _best(lambda: orjson_renderer.render(None, dumped, response_status=200), repeat),
+    }
+    return {stage: seconds * 1e6 / rows for stage, seconds in timings.items()}
+
+
+def run(schemas: Iterable[type] = None, rows: int = 100, repeat: int = 5) -> Dict[str, dict]:
+    return {
+        f'{schema.__module__}.{schema.__name__}': benchmark(schema, rows, repeat)
+        for schema in (schemas or out_schemas())
+    }
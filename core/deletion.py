@@ -0,0 +1,226 @@
+from datetime import timedelta
+from typing import Callable, List, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, models, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from booking import waitlist
+from booking.models import Booking, WaitlistEntry
+from booking.states import OCCUPYING, _occupied_slots
+from client.models import Client
+from company import rollups
+from company.models import Company, CompanyDailyStats
+from core import sharding
+from core.models import DeletionJob
+from servicetype.models import ServiceType
+from slot.intervals import slot_index
+from slot.models import Slot, SlotTemplate, SlotTemplateException
+
+
+class Step:
+    """
+    Uma tabela esvaziada em lotes: `rows(object_id)` seleciona as linhas que
+    dependem do alvo e `before(ids)`, quando informado, roda na transação de
+    cada lote, antes do DELETE (ex.: limpar as tabelas que apontam para elas).
+    """
+
+    def __init__(self, name: str, rows: Callable[[int], models.QuerySet],
+                 before: Optional[Callable[[List[int]], None]] = None):
+        self.name = name
+        self.rows = rows
+        self.before = before
+
+
+def chunk_size() -> int:
+    return getattr(settings, 'DELETION_CHUNK_SIZE', 500)
+
+
+def raw_delete(model: type, ids: List[int], column: Optional[str] = None) -> int:
+    """
+    DELETE ... WHERE <coluna> IN (...) direto no banco, sem o Collector do
+    ORM (que carrega cada objeto e segue as cascatas uma a uma). Quem chama
+    é responsável pela ordem: dependentes antes das linhas referenciadas.
+    """
+    if not ids:
+        return 0
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    column = column or model._meta.pk.column
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} IN ({placeholders})', ids
+        )
+        return cursor.rowcount
+
+
+def _drop_booking_links(booking_ids: List[int]) -> None:
+    """Solta as reservas do lote das vagas extras e das entradas promovidas da lista de espera"""
+    raw_delete(Booking.extra_slots.through, booking_ids, column='booking_id')
+    WaitlistEntry.objects.filter(booking_id__in=booking_ids).update(booking=None)
+
+
+def _drop_late_bookings(**lookup) -> None:
+    # Reservas e entradas na fila criadas depois que a etapa delas já tinha
+    # terminado (a empresa segue aceitando reservas em slots já lidos do cache)
+    WaitlistEntry.objects.filter(**{f'{field}__in': ids for field, ids in lookup.items()}).delete()
+    late = list(Booking.objects.filter(**{f'{field}__in': ids for field, ids in lookup.items()})
+                .values_list('id', flat=True))
+    _drop_booking_links(late)
+    raw_delete(Booking, late)
+
+
+def _drop_slots(slot_ids: List[int]) -> None:
+    _drop_late_bookings(slot_id=slot_ids)
+    raw_delete(Booking.extra_slots.through, slot_ids, column='slot_id')
+
+
+def _drop_service_types(service_type_ids: List[int]) -> None:
+    _drop_late_bookings(service_type_id=service_type_ids)
+
+
+def _release_client_bookings(booking_ids: List[int]) -> None:
+    """Libera os slots ocupados pelas reservas do cliente e os repassa à lista de espera"""
+    slots = _occupied_slots(Booking.objects.filter(id__in=booking_ids, status__in=OCCUPYING))
+    freed = list(slots.filter(is_available=False).values_list('id', flat=True))
+    _drop_booking_links(booking_ids)
+    Slot.objects.filter(id__in=freed).update(is_available=True)
+    rollups.touch(slot_ids=freed)
+    # As novas reservas têm outros ids e não entram no DELETE deste lote
+    waitlist.promote(freed)
+
+
+COMPANY_STEPS = [
+    Step('waitlist', lambda company_id: WaitlistEntry.objects.filter(
+        Q(company_id=company_id) | Q(service_type__company_id=company_id) | Q(slot__company_id=company_id)
+    )),
+    Step('bookings', lambda company_id: Booking.objects.filter(
+        Q(slot__company_id=company_id) | Q(service_type__company_id=company_id)
+    ), before=_drop_booking_links),
+    Step('slots', lambda company_id: Slot.objects.filter(company_id=company_id), before=_drop_slots),
+    Step('slot_template_exceptions', lambda company_id: SlotTemplateException.objects.filter(
+        template__company_id=company_id
+    )),
+    Step('slot_templates', lambda company_id: SlotTemplate.objects.filter(company_id=company_id)),
+    Step('service_types', lambda company_id: ServiceType.objects.filter(company_id=company_id),
+         before=_drop_service_types),
+    Step('daily_stats', lambda company_id: CompanyDailyStats.objects.filter(company_id=company_id)),
+]
+
+CLIENT_STEPS = [
+    Step('waitlist', lambda client_id: WaitlistEntry.objects.filter(client_id=client_id)),
+    Step('bookings', lambda client_id: Booking.objects.filter(client_id=client_id),
+         before=_release_client_bookings),
+]
+
+TARGETS = {
+    'company': (Company, COMPANY_STEPS),
+    'client': (Client, CLIENT_STEPS),
+}
+
+
+def target_of(instance: models.Model) -> str:
+    return next(target for target, (model, _) in TARGETS.items() if isinstance(instance, model))
+
+
+@transaction.atomic
+def request_deletion(instance) -> DeletionJob:
+    """
+    Marca a empresa ou o cliente como em remoção e agenda o job que apaga os
+    dependentes. Repetir o pedido devolve o job já existente (ou reinicia um
+    que falhou).
+    """
+    target = target_of(instance)
+    job = DeletionJob.objects.select_for_update().filter(
+        target=target, object_id=instance.pk
+    ).exclude(status='done').order_by('-id').first()
+
+    if job is None:
+        job = DeletionJob.objects.create(target=target, object_id=instance.pk, user_id=instance.user_id)
+    elif job.status == 'failed':
+        job.status, job.error = 'pending', ''
+        job.save(update_fields=['status', 'error', 'updated_at'])
+
+    type(instance).objects.filter(pk=instance.pk).update(is_deleting=True)
+    instance.is_deleting = True
+
+    from core.tasks import run_deletion_job
+    transaction.on_commit(lambda: run_deletion_job.delay(job.id))
+    return job
+
+
+def latest_job(target: str, object_id: int) -> Optional[DeletionJob]:
+    return DeletionJob.objects.filter(target=target, object_id=object_id).order_by('-id').first()
+
+
+def _stale_before():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'DELETION_STALE_AFTER', 5 * 60))
+
+
+def runnable() -> models.QuerySet:
+    """Jobs na fila ou parados no meio (o worker morreu) há mais de DELETION_STALE_AFTER"""
+    return DeletionJob.objects.filter(
+        Q(status='pending') | Q(status='running', updated_at__lt=_stale_before())
+    )
+
+
+def _run_step(job: DeletionJob, step: Step, size: int) -> None:
+    rows = step.rows(job.object_id).order_by()
+    while True:
+        # Cada lote é uma transação curta: os locks duram só um DELETE de `size` linhas
+        with sharding.atomic():
+            ids = list(rows.values_list('pk', flat=True)[:size])
+            if not ids:
+                return
+            if step.before:
+                step.before(ids)
+            deleted = raw_delete(rows.model, ids)
+            DeletionJob.objects.filter(id=job.id).update(
+                step=step.name, deleted=F('deleted') + deleted, updated_at=timezone.now()
+            )
+
+
+def run(job_id: int) -> Optional[DeletionJob]:
+    """
+    Executa o job: esvazia cada tabela dependente em lotes de
+    DELETION_CHUNK_SIZE e, no fim, remove o perfil e o usuário pelo ORM.
+    Retorna None quando o job não estava disponível (concluído ou com outro
+    worker). Depois de uma falha o job pode ser retomado: cada etapa recomeça
+    pelo que ainda resta.
+    """
+    claimed = runnable().filter(id=job_id).update(status='running', updated_at=timezone.now())
+    if not claimed:
+        return None
+
+    job = DeletionJob.objects.get(id=job_id)
+    model, steps = TARGETS[job.target]
+    # Os dados de uma empresa ficam no shard dela; os de um cliente, em qualquer um
+    company_id = job.object_id if job.target == 'company' else None
+    try:
+        remaining = 0
+        for _ in sharding.each(company_id):
+            remaining += sum(step.rows(job.object_id).count() for step in steps)
+        DeletionJob.objects.filter(id=job.id).update(total=job.deleted + remaining)
+
+        for _ in sharding.each(company_id):
+            for step in steps:
+                _run_step(job, step, chunk_size())
+
+        with transaction.atomic():
+            # Perfil e usuário pelo ORM: dispara os sinais de cache e pega
+            # qualquer dependente criado depois da última etapa
+            model.objects.filter(pk=job.object_id).delete()
+            User.objects.filter(pk=job.user_id).delete()
+            DeletionJob.objects.filter(id=job.id).update(
+                status='done', step='', finished_at=timezone.now(), updated_at=timezone.now()
+            )
+        if job.target == 'company':
+            slot_index.invalidate(job.object_id)
+    except Exception as e:
+        DeletionJob.objects.filter(id=job.id).update(status='failed', error=str(e), updated_at=timezone.now())
+
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,153 @@
+import hashlib
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import IdempotencyKey
+
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class CacheStore:
+    """
+    Guarda as respostas num cache do Django (IDEMPOTENCY_CACHE_ALIAS). Com o
+    LocMemCache padrão não depende de serviço externo, mas vale só por processo.
+    """
+
+    def __init__(self):
+        self.cache = caches[getattr(settings, 'IDEMPOTENCY_CACHE_ALIAS', 'default')]
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.cache.get(key)
+
+    def add(self, key: str, record: dict, ttl: int) -> bool:
+        return self.cache.add(key, record, ttl)
+
+    def set(self, key: str, record: dict, ttl: int) -> None:
+        self.cache.set(key, record, ttl)
+
+    def delete(self, key: str) -> None:
+        self.cache.delete(key)
+
+
+class DatabaseStore:
+    """Guarda as respostas na tabela IdempotencyKey, compartilhada entre processos"""
+
+    def get(self, key: str) -> Optional[dict]:
+        row = IdempotencyKey.objects.filter(key=key, expires_at__gt=timezone.now()).first()
+        if row is None:
+            return None
+        return {
+            'fingerprint': row.fingerprint,
+            'status': row.status_code,
+            'content': row.content,
+            'content_type': row.content_type,
+        }
+
+    def add(self, key: str, record: dict, ttl: int) -> bool:
+        now = timezone.now()
+        # Uma chave vencida não impede a nova requisição
+        IdempotencyKey.objects.filter(key=key, expires_at__lte=now).delete()
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    key=key,
+                    fingerprint=record['fingerprint'],
+                    expires_at=now + timedelta(seconds=ttl)
+                )
+        except IntegrityError:
+            return False
+        return True
+
+    def set(self, key: str, record: dict, ttl: int) -> None:
+        IdempotencyKey.objects.filter(key=key).update(
+            fingerprint=record['fingerprint'],
+            status_code=record['status'],
+            content=record['content'],
+            content_type=record['content_type'],
+            expires_at=timezone.now() + timedelta(seconds=ttl)
+        )
+
+    def delete(self, key: str) -> None:
+        IdempotencyKey.objects.filter(key=key).delete()
+
+
+def _caller(request) -> str:
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user={user.pk}'
+    return f'client={request.GET.get("client_id", "")}'
+
+
+def get_store():
+    return import_string(getattr(settings, 'IDEMPOTENCY_STORE', 'core.idempotency.CacheStore'))()
+
+
+class IdempotencyMiddleware:
+    """
+    Repete a primeira resposta para escritas enviadas de novo com o mesmo
+    header Idempotency-Key. A repetição custa uma leitura no store e não passa
+    pela validação nem pelos INSERTs do endpoint.
+
+    A chave vale por quem chama (usuário autenticado ou client_id), método e
+    caminho; reutilizá-la com outro corpo é erro 422 e uma repetição que chega
+    antes de a primeira terminar recebe 409. A marca de "em andamento" expira
+    em IDEMPOTENCY_LOCK_TTL, para que um processo que morreu no meio não
+    bloqueie a chave pelo IDEMPOTENCY_TTL inteiro.
+    Respostas 5xx não são guardadas, para que o cliente possa tentar de novo.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = request.META.get(HEADER)
+        if not key or request.method not in UNSAFE_METHODS:
+            return self.get_response(request)
+
+        store = get_store()
+        ttl = getattr(settings, 'IDEMPOTENCY_TTL', 24 * 60 * 60)
+        lock_ttl = getattr(settings, 'IDEMPOTENCY_LOCK_TTL', 60)
+        scoped_key = f'idempotency:{_caller(request)}:{request.method}:{request.path}:{key}'
+        fingerprint = hashlib.sha256(request.get_full_path().encode() + b'\n' + request.body).hexdigest()
+
+        record = store.get(scoped_key)
+        if record is None and store.add(scoped_key, {'fingerprint': fingerprint, 'status': None}, lock_ttl):
+            return self._first_response(request, store, scoped_key, fingerprint, ttl)
+
+        record = record or store.get(scoped_key)
+        if record is None or record['fingerprint'] != fingerprint:
+            return JsonResponse({'detail': 'Idempotency-Key já usada com outra requisição'}, status=422)
+
+        if record['status'] is None:
+            return JsonResponse({'detail': 'Requisição com esta Idempotency-Key ainda em andamento'}, status=409)
+
+        response = HttpResponse(record['content'], status=record['status'], content_type=record['content_type'])
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    def _first_response(self, request, store, scoped_key: str, fingerprint: str, ttl: int):
+        try:
+            response = self.get_response(request)
+        except Exception:
+            store.delete(scoped_key)
+            raise
+
+        if response.status_code >= 500 or response.streaming:
+            store.delete(scoped_key)
+        else:
+            store.set(scoped_key, {
+                'fingerprint': fingerprint,
+                'status': response.status_code,
+                'content': response.content.decode(response.charset),
+                'content_type': response.get('Content-Type', ''),
+            }, ttl)
+        return response
@@ -0,0 +1,63 @@
+import timeit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ninja_extra.searching import Searching
+
+from company.models import Company
+from core.search import FullTextSearching
+
+WORDS = ['Barbearia', 'Salão', 'Estúdio', 'Clínica', 'Oficina', 'Academia', 'Pet Shop', 'Consultório']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a busca da listagem de empresas (primeira página de ?search=) conforme a tabela '
+        'cresce: icontains (ninja_extra Searching) contra o índice FTS5. As empresas de teste '
+        'são criadas numa transação desfeita no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help='Quantidades de empresas a medir (padrão: 10000 100000 1000000)')
+        parser.add_argument('--repeat', type=int, default=50, help='Buscas por medida (padrão: 50)')
+        parser.add_argument('--search', default='4242', help='Texto buscado (padrão: "4242")')
+
+    def _grow(self, current: int, size: int) -> None:
+        for start in range(current, size, 10000):
+            batch = range(start, min(start + 10000, size))
+            users = User.objects.bulk_create([User(username=f'benchmark_search_{i}') for i in batch])
+            Company.objects.bulk_create([
+                Company(user=user, name=f'{WORDS[i % len(WORDS)]} Benchmark {i}', description=f'Unidade {i}')
+                for i, user in zip(batch, users)
+            ])
+
+    def _page(self, backend, search: str):
+        page = backend.searching_queryset(Company.objects.all(), backend.Input(search=search))[:20]
+        return list(page)
+
+    def handle(self, *args, sizes=None, repeat=50, search='', **options):
+        backends = {
+            'icontains': Searching(search_fields=['name', 'description']),
+            'fts5': FullTextSearching(search_fields=['name', 'description']),
+        }
+        self.stdout.write(f"{'empresas':>9}  {'icontains (ms)':>14}  {'fts5 (ms)':>10}")
+        try:
+            with transaction.atomic():
+                current = 0
+                for size in sorted(sizes):
+                    self._grow(current, size)
+                    current = size
+                    timings = {
+                        name: timeit.timeit(lambda: self._page(backend, search), number=repeat) * 1000 / repeat
+                        for name, backend in backends.items()
+                    }
+                    self.stdout.write(f"{size:>9}  {timings['icontains']:>14.2f}  {timings['fts5']:>10.2f}")
+                raise _Rollback
+        except _Rollback:
+            pass
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark da serialização de cada schema *Out (µs por linha em cada etapa)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Linhas por página (padrão: 100)')
+        parser.add_argument('--repeat', type=int, default=5, help='Repetições; vale a melhor (padrão: 5)')
+
+    def handle(self, *args, rows=100, repeat=5, **options):
+        results = benchmarks.run(rows=rows, repeat=repeat)
+        width = max(len(name) for name in results)
+        self.stdout.write(f"{'schema':<{width}}  {'validate':>9}  {'dump':>9}  {'json':>9}  {'orjson':>9}")
+        for name, timings in results.items():
+            self.stdout.write(
+                f"{name:<{width}}  {timings['validate']:>9.2f}  {timings['dump']:>9.2f}  "
+                f"{timings['json']:>9.2f}  {timings['orjson']:>9.2f}"
+            )
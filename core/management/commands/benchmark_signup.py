@@ -0,0 +1,86 @@
+import asyncio
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+
+from user.controllers import UserController
+from user.hashing import hashing_pool
+from user.schema import UserCreateIn
+
+PREFIX = 'benchmark_signup_'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara cadastros por segundo (e por núcleo) entre POST /users/, com o hash no '
+        'worker, e POST /users/async, com o hash no pool. Os usuários criados são removidos no final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=64, help='Cadastros por caminho (padrão: 64)')
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help='Requisições simultâneas no caminho async (padrão: 32)')
+
+    def _payload(self, name: str) -> UserCreateIn:
+        return UserCreateIn(username=f'{PREFIX}{name}', email=f'{name}@example.com', password='S3nha-forte-123')
+
+    def _sync(self, users: int) -> float:
+        # Um worker WSGI: cada cadastro ocupa o worker durante o hash inteiro
+        controller = UserController()
+        started = time.perf_counter()
+        blocked = 0.0
+        for i in range(users):
+            tick = time.perf_counter()
+            controller.create_user(self._payload(f'sync_{i}'))
+            blocked = max(blocked, time.perf_counter() - tick)
+        return time.perf_counter() - started, blocked
+
+    async def _async(self, users: int, concurrency: int) -> float:
+        # Um event loop ASGI com `concurrency` requisições em andamento
+        controller = UserController()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def signup(i):
+            async with slots:
+                while True:
+                    status, _ = await controller.create_user_async(self._payload(f'async_{i}'), HttpResponse())
+                    if status != 503:
+                        return
+                    await asyncio.sleep(0.01)  # o cliente respeita o Retry-After
+
+        async def heartbeat(done):
+            # Maior atraso do loop: quanto tempo o worker ficou sem atender outras requisições
+            lag = 0.0
+            while not done.is_set():
+                tick = time.perf_counter()
+                await asyncio.sleep(0.005)
+                lag = max(lag, time.perf_counter() - tick - 0.005)
+            return lag
+
+        done = asyncio.Event()
+        monitor = asyncio.create_task(heartbeat(done))
+        started = time.perf_counter()
+        await asyncio.gather(*[signup(i) for i in range(users)])
+        elapsed = time.perf_counter() - started
+        done.set()
+        return elapsed, await monitor
+
+    def handle(self, *args, users=64, concurrency=32, **options):
+        cores = os.cpu_count() or 1
+        try:
+            timings = {
+                'sync': self._sync(users),
+                'async': asyncio.run(self._async(users, concurrency)),
+            }
+        finally:
+            hashing_pool.shutdown()
+            User.objects.filter(username__startswith=PREFIX).delete()
+
+        self.stdout.write(f'{cores} núcleo(s), {hashing_pool.workers} thread(s) de hashing')
+        self.stdout.write(f"{'caminho':<8}  {'cadastros/s':>12}  {'por núcleo':>11}  {'worker bloqueado (ms)':>22}")
+        for path, (seconds, blocked) in timings.items():
+            rate = users / seconds
+            self.stdout.write(f'{path:<8}  {rate:>12.1f}  {rate / cores:>11.1f}  {blocked * 1000:>22.1f}')
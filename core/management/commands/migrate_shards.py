@@ -0,0 +1,40 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from client.models import Client
+from company.models import Company
+from core import sharding
+
+
+class Command(BaseCommand):
+    help = (
+        'Aplica as migrações em cada shard (DATABASE_SHARDS), posiciona a numeração das tabelas '
+        'particionadas na faixa do shard e copia usuários, empresas e clientes do banco default. '
+        'Pode ser repetido: as cópias são atualizadas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Linhas copiadas por INSERT')
+
+    def handle(self, *args, batch_size=1000, **options):
+        if not sharding.enabled():
+            self.stdout.write('SHARD_COUNT=0: nenhum shard configurado')
+            return
+
+        for alias in sharding.aliases():
+            call_command('migrate', database=alias, interactive=False, verbosity=options['verbosity'])
+            # O post_migrate já faz isso; repetido para shards sem migração pendente
+            sharding.seed_sequences(alias)
+
+        for model in (User, Company, Client):
+            copied = 0
+            queryset = model._base_manager.order_by('pk')
+            for start in range(0, queryset.count(), batch_size):
+                rows = list(queryset[start:start + batch_size])
+                sharding.replicate(model, rows)
+                copied += len(rows)
+            self.stdout.write(f'{model._meta.label}: {copied} linha(s) copiadas')
+
+        self.stdout.write(self.style.SUCCESS(f'{len(sharding.aliases())} shard(s) prontos'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.search import SEARCH_INDEXES, create_index_sql, drop_index_sql
+
+
+class Command(BaseCommand):
+    help = (
+        'Recria os índices de busca (FTS5) e seus triggers a partir das tabelas. O migrate já '
+        'recria os triggers que uma migração descartou ao recriar a tabela no SQLite (ALTER de '
+        'coluna); este comando refaz todos os índices.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Banco onde recriar os índices (ex.: um dos shards)')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            self.stdout.write('Banco sem FTS5: a busca usa icontains, nada a recriar')
+            return
+
+        with connection.cursor() as cursor:
+            for table, fields in SEARCH_INDEXES.items():
+                for statement in drop_index_sql(table) + create_index_sql(table, fields):
+                    cursor.execute(statement)
+                self.stdout.write(f'{table}: {", ".join(fields)}')
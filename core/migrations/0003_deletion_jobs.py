@@ -0,0 +1,33 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(choices=[('company', 'Empresa'), ('client', 'Cliente')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('user_id', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Na fila'), ('running', 'Em andamento'), ('done', 'Concluída'), ('failed', 'Falhou')], default='pending', max_length=20)),
+                ('step', models.CharField(blank=True, default='', max_length=100)),
+                ('deleted', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['target', 'object_id'], name='deletion_target_idx')],
+            },
+        ),
+    ]
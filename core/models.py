@@ -0,0 +1,90 @@
+from django.db import models
+
+
+class IdempotencyKey(models.Model):
+    """Primeira resposta de uma requisição com Idempotency-Key (store em banco)"""
+    key = models.CharField(max_length=255, unique=True)
+    fingerprint = models.CharField(max_length=64)
+    # Nulo enquanto a primeira requisição ainda está em andamento
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    content = models.TextField(blank=True, default='')
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.key
+
+
+class OutboxEvent(models.Model):
+    """
+    Evento gravado na mesma transação da mudança que o originou e entregue
+    depois aos sinks pelo despachante (core.outbox.dispatch)
+    """
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Próxima tentativa de entrega (recuo exponencial após falhas)
+    available_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    delivered_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'],
+                condition=models.Q(delivered_at__isnull=True),
+                name='outbox_pending_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.topic} #{self.id}'
+
+
+class DeletionJob(models.Model):
+    """
+    Remoção em segundo plano de uma empresa ou cliente e de tudo que depende
+    dele, em lotes (core.deletion). O progresso pode ser consultado pela API.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Na fila'),
+        ('running', 'Em andamento'),
+        ('done', 'Concluída'),
+        ('failed', 'Falhou'),
+    ]
+    TARGET_CHOICES = [
+        ('company', 'Empresa'),
+        ('client', 'Cliente'),
+    ]
+    
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    object_id = models.PositiveIntegerField()
+    user_id = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Etapa atual (tabela sendo esvaziada) e linhas removidas até agora
+    step = models.CharField(max_length=100, blank=True, default='')
+    deleted = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Atualizado a cada lote: um job 'running' parado há muito tempo é retomado
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['target', 'object_id'], name='deletion_target_idx'),
+        ]
+    
+    @property
+    def progress(self) -> float:
+        if self.status == 'done':
+            return 100.0
+        if not self.total:
+            return 0.0
+        return round(min(self.deleted, self.total) * 100 / self.total, 2)
+    
+    def __str__(self):
+        return f'{self.target} #{self.object_id} ({self.status})'
@@ -0,0 +1,152 @@
+import json
+import urllib.request
+from collections import deque
+from datetime import timedelta
+from typing import List
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core import sharding
+from core.models import OutboxEvent
+
+
+# Eventos por rodada do despachante
+DISPATCH_BATCH_SIZE = 100
+
+
+def publish(topic: str, payload: dict) -> OutboxEvent:
+    """
+    Grava um evento no outbox. Deve ser chamado dentro da transação da
+    mudança: se ela for desfeita, o evento também é.
+    """
+    return OutboxEvent.objects.create(topic=topic, payload=payload, available_at=timezone.now())
+
+
+def serialize(event: OutboxEvent) -> dict:
+    # O id permite ao consumidor descartar repetições (entrega pelo menos uma vez)
+    return {
+        'id': event.id,
+        'topic': event.topic,
+        'payload': event.payload,
+        'created_at': event.created_at.isoformat(),
+    }
+
+
+class MemorySink:
+    """Fila em memória do processo, para testes e desenvolvimento"""
+    queue = deque()
+
+    def send(self, events: List[dict]) -> None:
+        self.queue.extend(events)
+
+
+class LogSink:
+    """Acrescenta os eventos a um arquivo, um JSON por linha"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, events: List[dict]) -> None:
+        with open(self.path, 'a', encoding='utf-8') as log:
+            for event in events:
+                log.write(json.dumps(event) + '\n')
+
+
+class WebhookSink:
+    """Envia o lote num único POST JSON; qualquer resposta fora de 2xx é falha"""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, events: List[dict]) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(events).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if not 200 <= response.status < 300:
+                raise RuntimeError(f'Webhook respondeu {response.status}')
+
+
+def get_sinks() -> list:
+    return [
+        import_string(sink['BACKEND'])(**sink.get('OPTIONS', {}))
+        for sink in getattr(settings, 'OUTBOX_SINKS', [])
+    ]
+
+
+def backoff(attempts: int) -> timedelta:
+    """Espera antes da próxima tentativa: 2, 4, 8... segundos, até OUTBOX_MAX_BACKOFF"""
+    return timedelta(seconds=min(2 ** attempts, getattr(settings, 'OUTBOX_MAX_BACKOFF', 3600)))
+
+
+@sharding.atomic
+def _claim(now, batch_size: int) -> List[OutboxEvent]:
+    """
+    Reserva um lote adiando `available_at` por OUTBOX_CLAIM_LEASE: outros
+    despachantes passam a ignorá-lo sem que a transação fique aberta durante
+    a entrega. Se o processo morrer antes de marcar o resultado, o lote volta
+    a ser entregue quando a reserva vencer.
+    """
+    events = list(
+        OutboxEvent.objects.select_for_update(skip_locked=True).filter(
+            delivered_at__isnull=True,
+            available_at__lte=now,
+            attempts__lt=getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 10)
+        ).order_by('available_at', 'id')[:batch_size]
+    )
+    if events:
+        lease = timedelta(seconds=getattr(settings, 'OUTBOX_CLAIM_LEASE', 5 * 60))
+        OutboxEvent.objects.filter(id__in=[event.id for event in events]).update(available_at=now + lease)
+    return events
+
+
+def dispatch(batch_size: int = DISPATCH_BATCH_SIZE) -> int:
+    """
+    Entrega um lote de eventos pendentes a todos os sinks. O lote é reservado
+    numa transação curta e entregue fora dela, para que a espera pela rede
+    não segure locks. Sucesso marca o lote inteiro como entregue num UPDATE;
+    falha adia o lote com recuo exponencial. Eventos que atingem
+    OUTBOX_MAX_ATTEMPTS ficam parados para análise. Retorna quantos eventos
+    foram entregues.
+    """
+    now = timezone.now()
+    events = _claim(now, batch_size)
+    if not events:
+        return 0
+
+    ids = [event.id for event in events]
+    try:
+        batch = [serialize(event) for event in events]
+        for sink in get_sinks():
+            sink.send(batch)
+    except Exception as exc:
+        # Uma rodada de UPDATE por número de tentativas já feitas (normalmente uma)
+        with sharding.atomic():
+            for attempts in {event.attempts for event in events}:
+                OutboxEvent.objects.filter(id__in=ids, attempts=attempts).update(
+                    attempts=attempts + 1,
+                    available_at=now + backoff(attempts + 1),
+                    last_error=repr(exc)
+                )
+        return 0
+
+    OutboxEvent.objects.filter(id__in=ids).update(delivered_at=now)
+    return len(events)
+
+
+def drain(batch_size: int = DISPATCH_BATCH_SIZE) -> int:
+    """Despacha lotes até o outbox de cada shard esvaziar ou uma entrega falhar"""
+    delivered = 0
+    for _ in sharding.each():
+        while True:
+            sent = dispatch(batch_size)
+            delivered += sent
+            if sent < batch_size:
+                break
+    return delivered
@@ -0,0 +1,140 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import date, datetime, time
+from typing import Any, Generic, List, Optional, Sequence, Type, TypeVar, Union
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, QuerySet
+from django.http import HttpRequest
+from ninja import Schema
+from ninja.pagination import PaginationBase
+from pydantic import Field
+
+from ninja_extra.exceptions import ValidationError
+
+T = TypeVar("T")
+
+
+class CursorPaginatedResponseSchema(Schema, Generic[T]):
+    count: Optional[int] = None
+    next: Optional[str] = None
+    previous: Optional[str] = None
+    results: List[T]
+
+
+class CursorPagination(PaginationBase):
+    """
+    Paginação por chave (keyset): cada página filtra a partir da última linha
+    vista em vez de usar OFFSET, então o custo não cresce com a profundidade.
+
+    `ordering` deve terminar num campo único (normalmente `id`) para que a
+    chave seja total. O cursor é opaco para o cliente; o total (COUNT) só é
+    calculado quando `include_count=true`.
+    """
+
+    class Input(Schema):
+        cursor: Optional[str] = None
+        page_size: int = Field(100, gt=0, lt=201)
+        include_count: bool = False
+
+    def __init__(self, ordering: Sequence[str] = ('id',), page_size: int = 100,
+                 max_page_size: int = 200, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.Input = self.create_input()  # type:ignore
+
+    def create_input(self) -> Type[Input]:
+        class DynamicInput(CursorPagination.Input):
+            page_size: int = Field(self.page_size, gt=0, lt=self.max_page_size + 1)
+
+        return DynamicInput
+
+    def encode_cursor(self, item: Any, reverse: bool = False) -> str:
+        values = [self._value(item, field) for field in self.ordering]
+        raw = json.dumps({'v': values, 'r': reverse}, default=self._serialize)
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, queryset: QuerySet, cursor: str):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values = [
+                queryset.model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.ordering, data['v'])
+            ]
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return values, bool(data['r'])
+        except Exception as exc:
+            raise ValidationError({'cursor': 'Cursor inválido'}) from exc
+
+    @staticmethod
+    def _serialize(value: Any) -> Any:
+        # O DjangoJSONEncoder corta datetimes em milissegundos, o que faria o
+        # cursor repetir linhas criadas no mesmo milissegundo
+        if isinstance(value, (datetime, date, time)):
+            return value.isoformat()
+        return DjangoJSONEncoder().default(value)
+
+    @staticmethod
+    def _value(item: Any, field: str) -> Any:
+        return item[field] if isinstance(item, dict) else getattr(item, field)
+
+    def _after(self, values: List[Any], reverse: bool) -> Q:
+        """Condição de tupla (k1, k2, ...) > valores (ou < quando `reverse`)"""
+        lookup = 'lt' if reverse else 'gt'
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            step = Q(**{f'{field}__{lookup}': values[i]})
+            for previous_field, previous_value in zip(self.ordering[:i], values[:i]):
+                step &= Q(**{previous_field: previous_value})
+            condition |= step
+        return condition
+
+    def paginate_queryset(
+        self,
+        queryset: QuerySet,
+        pagination: Input,
+        request: Optional[HttpRequest] = None,
+        **params: Any,
+    ) -> Any:
+        page_size = pagination.page_size
+        reverse = False
+        page = queryset.order_by(*self.ordering)
+
+        if pagination.cursor:
+            values, reverse = self.decode_cursor(queryset, pagination.cursor)
+            page = page.filter(self._after(values, reverse))
+            if reverse:
+                page = page.order_by(*[f'-{field}' for field in self.ordering])
+
+        items = list(page[:page_size + 1])
+        has_more = len(items) > page_size
+        items = items[:page_size]
+        if reverse:
+            items.reverse()
+
+        next_cursor = previous_cursor = None
+        if items:
+            if has_more or reverse:
+                next_cursor = self.encode_cursor(items[-1])
+            if pagination.cursor and (has_more or not reverse):
+                previous_cursor = self.encode_cursor(items[0], reverse=True)
+
+        return OrderedDict(
+            [
+                ("count", self._items_count(queryset) if pagination.include_count else None),
+                ("next", next_cursor),
+                ("previous", previous_cursor),
+                ("results", items),
+            ]
+        )
+
+    @classmethod
+    def get_response_schema(
+        cls, response_schema: Union[Type[Schema], Type[Any]]
+    ) -> Any:
+        return CursorPaginatedResponseSchema[response_schema]  # type: ignore[valid-type]
@@ -0,0 +1,32 @@
+from typing import Any
+
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpRequest
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Renderiza as respostas com orjson, que gera os bytes direto em C em vez
+    de passar pelo json da stdlib. Tipos que o orjson não conhece (Decimal,
+    timedelta, modelos pydantic...) caem no NinjaJSONEncoder, então o corpo
+    é o mesmo do JSONRenderer, exceto pelos datetimes, que mantêm os
+    microssegundos em vez de serem cortados em milissegundos.
+    """
+
+    media_type = 'application/json'
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def __init__(self):
+        if orjson is None:
+            raise ImproperlyConfigured('ORJSONRenderer requer o pacote orjson (pip install orjson)')
+        self.encoder = NinjaJSONEncoder()
+
+    def render(self, request: HttpRequest, data: Any, *, response_status: int) -> Any:
+        return orjson.dumps(data, default=self.encoder.default, option=self.options)
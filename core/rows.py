@@ -0,0 +1,58 @@
+from typing import Callable, Iterable, List, Optional, Sequence
+
+from django.db.models import QuerySet
+
+
+def nest(row: dict) -> dict:
+    """Converte as chaves 'slot__start_time' de um .values() em {'slot': {'start_time': ...}}"""
+    nested = {}
+    for key, value in row.items():
+        target = nested
+        *path, field = key.split('__')
+        for part in path:
+            target = target.setdefault(part, {})
+        target[field] = value
+    return nested
+
+
+class Rows:
+    """
+    Linhas de um .values() já no formato do schema de resposta, sem
+    instanciar models: o Pydantic valida dicts uma vez e o renderer os
+    serializa direto.
+
+    Para a paginação se comporta como o queryset (fatiar vira LIMIT/OFFSET e
+    a contagem vira COUNT). `shape` ajusta cada linha; `extend` recebe as
+    linhas de cada fatia para completar o que não cabe num .values(), como
+    ids de relações muitos-para-muitos, com uma consulta por página.
+    """
+
+    def __init__(self, queryset: QuerySet, fields: Sequence[str],
+                 shape: Callable[[dict], dict] = nest,
+                 extend: Optional[Callable[[List[dict]], None]] = None):
+        self.queryset = queryset.select_related(None).prefetch_related(None).values(*fields)
+        self.shape = shape
+        self.extend = extend
+
+    def _rows(self, rows: Iterable[dict]) -> List[dict]:
+        rows = [self.shape(row) for row in rows]
+        if rows and self.extend:
+            self.extend(rows)
+        return rows
+
+    def all(self) -> 'Rows':
+        return self
+
+    def count(self) -> int:
+        return self.queryset.count()
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __iter__(self):
+        return iter(self._rows(self.queryset))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._rows(self.queryset[index])
+        return self._rows(self.queryset[index:index + 1])[0]
@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import Optional
+
 from ninja import Schema
 #from uuid import UUID
 
@@ -6,3 +9,17 @@ class UserOut(Schema):
     id: int
     username: str
     email: str
+
+
+class DeletionJobOut(Schema):
+    id: int
+    target: str
+    object_id: int
+    status: str
+    step: str
+    deleted: int
+    total: int
+    progress: float
+    error: str
+    created_at: datetime
+    finished_at: Optional[datetime] = None
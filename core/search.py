@@ -0,0 +1,153 @@
+import operator
+from functools import reduce
+from typing import List, Sequence, Union
+
+from django.db import connections
+from django.db.models import Q, QuerySet
+from ninja_extra.searching import Searching
+
+# Tabelas com índice de busca e os campos indexados (cada app cria o seu
+# numa migração; rebuild_search_index recria todos)
+SEARCH_INDEXES = {
+    'company_company': ('name', 'description'),
+    'client_client': ('name', 'phone'),
+    'servicetype_servicetype': ('name', 'description'),
+}
+
+# O tokenizador trigram indexa trechos de 3 caracteres: termos menores não
+# têm como usar o índice e viram um filtro por prefixo
+MIN_TERM_LENGTH = 3
+
+
+def index_table(table: str) -> str:
+    return f'{table}_fts'
+
+
+def create_index_sql(table: str, fields: Sequence[str]) -> List[str]:
+    """
+    Tabela FTS5 (tokenizador trigram) com o conteúdo de `fields` da tabela
+    `table`, mantida pelos triggers em qualquer escrita: save(), update(),
+    bulk_create() e DELETE direto em SQL (core.deletion).
+    """
+    fts = index_table(table)
+    columns = ', '.join(fields)
+    new = ', '.join(f'new.{field}' for field in fields)
+    old = ', '.join(f'old.{field}' for field in fields)
+    delete = f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old});"
+    insert = f'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new});'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{columns}, content='{table}', content_rowid='id', tokenize='trigram')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON {table} BEGIN {delete} {insert} END',
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def drop_index_sql(table: str) -> List[str]:
+    fts = index_table(table)
+    return [f'DROP TRIGGER IF EXISTS {fts}_{suffix}' for suffix in ('ai', 'ad', 'au')] + [
+        f'DROP TABLE IF EXISTS {fts}'
+    ]
+
+
+def index_operations(table: str, fields: Sequence[str]):
+    """
+    Funções (forwards, backwards) de RunPython que criam e removem o índice.
+    Só o SQLite tem FTS5; nos outros bancos a busca continua por icontains.
+    """
+    def run(statements):
+        def operation(apps, schema_editor):
+            if schema_editor.connection.vendor == 'sqlite':
+                for statement in statements:
+                    schema_editor.execute(statement)
+        return operation
+
+    return run(create_index_sql(table, fields)), run(drop_index_sql(table))
+
+
+def repair_indexes(using: str) -> List[str]:
+    """
+    Recria os triggers (e reconstrói o índice) das tabelas que têm o índice
+    mas perderam algum trigger: o SQLite descarta os triggers quando uma
+    migração recria a tabela. Sem nada faltando, não escreve nada.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return []
+
+    repaired = []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {name for name, in cursor.fetchall()}
+        for table, fields in SEARCH_INDEXES.items():
+            fts = index_table(table)
+            triggers = {f'{fts}_{suffix}' for suffix in ('ai', 'ad', 'au')}
+            if table in existing and fts in existing and not triggers <= existing:
+                for statement in drop_index_sql(table) + create_index_sql(table, fields):
+                    cursor.execute(statement)
+                repaired.append(table)
+    return repaired
+
+
+def match_expression(terms: Sequence[str]) -> str:
+    # Cada termo entre aspas (aspas internas dobradas): nada é lido como
+    # operador do FTS5 e todos os termos precisam aparecer
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def has_index(queryset: QuerySet) -> bool:
+    return connections[queryset.db].vendor == 'sqlite'
+
+
+class FullTextSearching(Searching):
+    """
+    `?search=` pelo índice FTS5 da tabela (ver create_index_sql) em vez de
+    LIKE '%termo%' em cada campo. Cada termo casa em qualquer parte dos
+    `search_fields` e os resultados vêm ordenados por relevância (bm25),
+    com quem começa pelo termo na frente.
+
+    Listas (ex.: o catálogo em cache de uma empresa) e bancos sem FTS5
+    continuam com a busca por icontains.
+    """
+
+    def searching_queryset(self, items: Union[QuerySet, list], searching_input: Searching.Input):
+        terms = self.get_search_terms(searching_input.search)
+        if not (self.search_fields and terms):
+            return items
+        if isinstance(items, list):
+            return [item for item in items if self._matches(item, terms)]
+        if not has_index(items):
+            return super().searching_queryset(items, searching_input)
+
+        indexed = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+        for term in terms:
+            if term not in indexed:
+                items = items.filter(reduce(operator.or_, [
+                    Q(**{f'{field}__istartswith': term}) for field in self.search_fields
+                ]))
+        if not indexed:
+            return items
+
+        table = items.model._meta.db_table
+        fts = index_table(table)
+        first = self.search_fields[0]
+        return items.extra(
+            tables=[fts],
+            where=[f'{fts}.rowid = {table}.id', f'{fts} MATCH %s'],
+            params=[match_expression(indexed)],
+            select={
+                'search_prefix': f'{table}.{first} NOT LIKE %s',
+                'search_rank': f'bm25({fts})',
+            },
+            select_params=[f'{indexed[0]}%'],
+            order_by=['search_prefix', 'search_rank', 'id'],
+        )
+
+    def _matches(self, item, terms: List[str]) -> bool:
+        values = [
+            str((item.get(field) if isinstance(item, dict) else getattr(item, field)) or '').lower()
+            for field in self.search_fields
+        ]
+        return all(any(term.lower() in value for value in values) for term in terms)
@@ -0,0 +1,399 @@
+import contextvars
+import copy
+import functools
+import heapq
+from collections import defaultdict
+from contextlib import ContextDecorator, contextmanager
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models import QuerySet
+from django.http import Http404
+
+from core.rows import Rows
+
+# Tabelas de agenda de cada empresa: ficam no shard da empresa
+SHARDED_APPS = {'slot', 'booking', 'servicetype'}
+SHARDED_MODELS = {'company.companydailystats', 'core.outboxevent'}
+
+# Tabelas de referência copiadas para todos os shards, para que as chaves
+# estrangeiras e os JOINs (reserva → cliente → usuário) funcionem dentro de
+# cada um. A cópia principal continua no banco default
+REPLICATED_MODELS = ('auth.user', 'company.company', 'client.client')
+
+# Cada shard numera as linhas a partir de índice << SHARD_ID_BITS: o id de um
+# slot, reserva ou tipo de serviço diz em que shard ele está
+SHARD_ID_BITS = 40
+
+_current = contextvars.ContextVar('shard', default=None)
+
+
+class ShardNotSelected(Exception):
+    """Consulta a uma tabela particionada sem empresa ou shard definido"""
+
+
+def aliases() -> List[str]:
+    return list(getattr(settings, 'DATABASE_SHARDS', []))
+
+
+def enabled() -> bool:
+    return bool(aliases())
+
+
+def check_backends() -> None:
+    """
+    Os ids só dizem o shard se cada um numerar as linhas na sua faixa (ver
+    seed_sequences), o que só está implementado para o SQLite. Em outro
+    banco toda busca por id iria para o shard_0 sem erro nenhum.
+    """
+    for alias in aliases():
+        if connections[alias].vendor != 'sqlite':
+            raise ImproperlyConfigured(
+                f'DATABASE_SHARDS: o banco {alias!r} ({connections[alias].vendor}) não é suportado; '
+                'a numeração por shard só existe para o SQLite'
+            )
+
+
+def is_sharded(model: type) -> bool:
+    return model._meta.app_label in SHARDED_APPS or model._meta.label_lower in SHARDED_MODELS
+
+
+def shard_for_company(company_id: int) -> str:
+    shards = aliases()
+    return shards[int(company_id) % len(shards)]
+
+
+def shard_for_id(pk: int) -> Optional[str]:
+    """Shard de uma linha particionada pelo id (None se o id não for de nenhum)"""
+    shards = aliases()
+    index = int(pk) >> SHARD_ID_BITS
+    return shards[index] if 0 <= index < len(shards) else None
+
+
+def db_for_id(pk: int) -> Optional[str]:
+    """Banco da linha particionada `pk`: o shard dela, ou o default quando não há shards"""
+    return shard_for_id(pk) if enabled() else DEFAULT_DB_ALIAS
+
+
+def current() -> str:
+    """Alias do shard em uso (o default quando não há shards)"""
+    return _current.get() or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use(alias: Optional[str]):
+    """Direciona as consultas às tabelas particionadas para `alias` dentro do bloco"""
+    token = _current.set(alias)
+    try:
+        yield alias
+    finally:
+        _current.reset(token)
+
+
+def for_company(company_id: int):
+    return use(shard_for_company(company_id) if enabled() else None)
+
+
+def for_id(pk: int):
+    """Contexto do shard que guarda a linha `pk`; 404 quando o id não é de nenhum shard"""
+    if not enabled():
+        return use(None)
+    alias = shard_for_id(pk)
+    if alias is None:
+        raise Http404
+    return use(alias)
+
+
+def each(company_id: Optional[int] = None) -> Iterator[Optional[str]]:
+    """Entra em cada shard (só no da empresa, quando informada); sem shards, roda uma vez"""
+    if not enabled():
+        yield None
+        return
+    for alias in ([shard_for_company(company_id)] if company_id else aliases()):
+        with use(alias):
+            yield alias
+
+
+def by_company(company_ids: Iterable[int]) -> Iterator[List[int]]:
+    """Agrupa as empresas por shard e entra em cada um, devolvendo as empresas dele"""
+    company_ids = list(company_ids)
+    if not enabled():
+        yield company_ids
+        return
+    groups = defaultdict(list)
+    for company_id in company_ids:
+        groups[shard_for_company(company_id)].append(company_id)
+    for alias, group in groups.items():
+        with use(alias):
+            yield group
+
+
+class _Atomic(ContextDecorator):
+    def __init__(self, savepoint: bool = True):
+        self.savepoint = savepoint
+
+    def _recreate_cm(self):
+        # Um bloco novo por chamada: o shard só é conhecido na entrada
+        return _Atomic(self.savepoint)
+
+    def __enter__(self):
+        self.block = transaction.atomic(using=current(), savepoint=self.savepoint)
+        return self.block.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self.block.__exit__(*exc_info)
+
+
+def atomic(func: Optional[Callable] = None, savepoint: bool = True):
+    """transaction.atomic no shard em uso, como decorator ou bloco `with`"""
+    if callable(func):
+        return _Atomic(savepoint)(func)
+    return _Atomic(savepoint)
+
+
+def on_commit(func: Callable, robust: bool = False) -> None:
+    """transaction.on_commit no shard em uso; o callback roda no mesmo shard"""
+    alias = _current.get()
+
+    def callback():
+        with use(alias):
+            func()
+
+    transaction.on_commit(callback, using=current(), robust=robust)
+
+
+def set_rollback(rollback: bool) -> None:
+    transaction.set_rollback(rollback, using=current())
+
+
+class CompanyShardRouter:
+    """
+    Manda as tabelas particionadas (SHARDED_APPS, SHARDED_MODELS) para o
+    shard em uso (ver `use`, `for_company`, `sharded`) ou, fora de um
+    contexto, para o shard da instância. O resto fica no default.
+
+    Com DATABASE_SHARDS vazio o router não decide nada e tudo fica no default.
+    """
+
+    def _db(self, model, **hints):
+        if not enabled() or not is_sharded(model):
+            return None
+        alias = _current.get()
+        if alias:
+            return alias
+        instance = hints.get('instance')
+        if instance is not None and is_sharded(type(instance)):
+            if instance._state.db:
+                return instance._state.db
+            if getattr(instance, 'company_id', None):
+                return shard_for_company(instance.company_id)
+        raise ShardNotSelected(f'{model._meta.label}: nenhum shard selecionado')
+
+    db_for_read = _db
+    db_for_write = _db
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # As tabelas de referência existem em todos os bancos
+        return True if enabled() else None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Esquema completo em todos os bancos
+        return None
+
+
+def _get(source, path: str):
+    value = source
+    for part in path.split('.'):
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, (list, tuple)):
+            value = value[int(part)] if int(part) < len(value) else None
+        else:
+            value = getattr(value, part, None)
+    return value
+
+
+def _value(item, field: str):
+    for part in field.split('__'):
+        if part == 'pk':
+            part = 'id'
+        item = item[part] if isinstance(item, dict) else getattr(item, part)
+    return item
+
+
+def _queryset(source) -> Optional[QuerySet]:
+    if isinstance(source, QuerySet):
+        return source
+    if isinstance(source, Rows):
+        return source.queryset
+    return None
+
+
+class FanOut:
+    """
+    A mesma consulta em vários shards, vista como um único queryset pela
+    paginação: a contagem soma as dos shards e uma fatia [a:b] lê as b
+    primeiras linhas de cada shard e as mescla pela ordenação da consulta.
+    `filter` e `order_by` valem para todos (a paginação por cursor usa os dois).
+    """
+
+    def __init__(self, sources: Sequence[Tuple[str, object]], ordering: Optional[Sequence[str]] = None):
+        self.sources = list(sources)
+        self.ordering = list(ordering or self._ordering())
+
+    def _ordering(self) -> List[str]:
+        queryset = next((_queryset(source) for _, source in self.sources if _queryset(source) is not None), None)
+        if queryset is None:
+            return ['id']
+        query = queryset.query
+        return list(query.extra_order_by or query.order_by or queryset.model._meta.ordering or ['id'])
+
+    @property
+    def model(self):
+        return next(_queryset(source) for _, source in self.sources).model
+
+    def _each(self, method: str, *args, **kwargs) -> List[Tuple[str, object]]:
+        return [(alias, getattr(source, method)(*args, **kwargs)) for alias, source in self.sources]
+
+    def all(self) -> 'FanOut':
+        return self
+
+    def filter(self, *args, **kwargs) -> 'FanOut':
+        return FanOut(self._each('filter', *args, **kwargs), self.ordering)
+
+    def order_by(self, *fields) -> 'FanOut':
+        return FanOut(self._each('order_by', *fields), fields)
+
+    def count(self) -> int:
+        total = 0
+        for alias, source in self.sources:
+            with use(alias):
+                total += len(source) if isinstance(source, list) else source.count()
+        return total
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def _compare(self, a, b) -> int:
+        for field in self.ordering:
+            descending = field.startswith('-')
+            name = field.lstrip('-')
+            x, y = _value(a, name), _value(b, name)
+            if x == y:
+                continue
+            # NULL primeiro na ordem crescente, como no SQLite
+            less = x is None or (y is not None and x < y)
+            return (1 if less else -1) if descending else (-1 if less else 1)
+        return 0
+
+    def _fetch(self, stop: Optional[int]) -> list:
+        pages = []
+        for alias, source in self.sources:
+            with use(alias):
+                pages.append(list(source[:stop] if stop is not None else source))
+        return list(heapq.merge(*pages, key=functools.cmp_to_key(self._compare)))
+
+    def __iter__(self):
+        return iter(self._fetch(None))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._fetch(index.stop)[index]
+        return self._fetch(index + 1)[index]
+
+
+def _bind(result, alias: str):
+    """Prende o resultado ao shard: querysets são avaliados depois, fora do contexto"""
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[0], int):
+        return result[0], _bind(result[1], alias)
+    if isinstance(result, QuerySet):
+        return result.using(alias)
+    if isinstance(result, Rows):
+        return FanOut([(alias, result)])
+    if callable(getattr(result, 'using', None)):
+        return result.using(alias)
+    return result
+
+
+def sharded(company: Optional[str] = None, pk: Optional[str] = None, merge: Optional[Callable] = None):
+    """
+    Roda o endpoint no shard da empresa (`company`: caminho do company_id nos
+    parâmetros, ex.: 'filters.company_id') ou no shard da linha (`pk`: caminho
+    do id de um slot, reserva, tipo de serviço...). Sem essa informação, roda
+    em todos os shards e junta os resultados num FanOut (para a paginação)
+    ou, com `merge`, no que ele devolver (ex.: list).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def view(controller, *args, **kwargs):
+            if not enabled():
+                return func(controller, *args, **kwargs)
+
+            if company and _get(kwargs, company):
+                context = for_company(_get(kwargs, company))
+            elif pk and _get(kwargs, pk):
+                context = for_id(_get(kwargs, pk))
+            else:
+                results = []
+                for alias in each():
+                    results.append((alias, func(controller, *args, **kwargs)))
+                merged = FanOut(results)
+                return merge(merged) if merge else merged
+
+            with context as alias:
+                return _bind(func(controller, *args, **kwargs), alias)
+        return view
+    return decorator
+
+
+def replicate(model: type, instances: Sequence[models.Model]) -> None:
+    """Grava (ou atualiza) as cópias de linhas de referência em todos os shards"""
+    if not (enabled() and instances):
+        return
+    fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+    for alias in aliases():
+        model._base_manager.using(alias).bulk_create(
+            [copy.copy(instance) for instance in instances],
+            update_conflicts=True, unique_fields=[model._meta.pk.name], update_fields=fields
+        )
+
+
+def unreplicate(model: type, pks: Sequence[int]) -> None:
+    """Remove as cópias dos shards, em cascata com o que depende delas lá"""
+    if not enabled():
+        return
+    for alias in aliases():
+        model._base_manager.using(alias).filter(pk__in=pks).delete()
+
+
+def seed_sequences(using: str) -> None:
+    """
+    Faz as tabelas particionadas do shard numerarem a partir do início da
+    faixa dele (índice << SHARD_ID_BITS). Só SQLite (sqlite_sequence).
+    """
+    if using not in aliases():
+        return
+    check_backends()
+    connection = connections[using]
+
+    from django.apps import apps
+
+    start = aliases().index(using) << SHARD_ID_BITS
+    tables = [
+        model._meta.db_table for model in apps.get_models(include_auto_created=True) if is_sharded(model)
+    ]
+    existing = set(connection.introspection.table_names())
+    with connection.cursor() as cursor:
+        for table in tables:
+            if table not in existing:
+                continue
+            cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, start])
+            elif row[0] < start:
+                cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [start, table])
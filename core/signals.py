@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from client.models import Client
+from company.models import Company
+from core import sharding
+from core.search import repair_indexes
+
+
+# As cópias são gravadas (e removidas) só depois do commit no default: uma
+# criação desfeita não pode deixar linhas órfãs nos shards
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Company)
+@receiver(post_save, sender=Client)
+def replicate_reference(sender, instance, using, raw=False, **kwargs):
+    if using == DEFAULT_DB_ALIAS and not raw and sharding.enabled():
+        transaction.on_commit(lambda: sharding.replicate(sender, [instance]), using=DEFAULT_DB_ALIAS)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Company)
+@receiver(post_delete, sender=Client)
+def unreplicate_reference(sender, instance, using, **kwargs):
+    if using == DEFAULT_DB_ALIAS and sharding.enabled():
+        pk = instance.pk
+        transaction.on_commit(lambda: sharding.unreplicate(sender, [pk]), using=DEFAULT_DB_ALIAS)
+
+
+@receiver(post_migrate)
+def seed_shard_sequences(sender, using, **kwargs):
+    # Uma vez por migrate (o sinal vem para cada app)
+    if sender.name == 'core':
+        sharding.seed_sequences(using)
+
+
+@receiver(post_migrate)
+def repair_search_indexes(sender, using, **kwargs):
+    # Depois de todas as migrações: uma delas pode ter recriado uma tabela
+    # indexada (e descartado os triggers do índice de busca)
+    if sender.name == 'core':
+        repair_indexes(using)
@@ -0,0 +1,34 @@
+from celery import shared_task
+from django.utils import timezone
+
+from core import deletion, outbox
+from core.models import IdempotencyKey
+
+
+@shared_task
+def purge_expired_idempotency_keys() -> int:
+    """Remove do DatabaseStore as respostas que já passaram do prazo de repetição"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+@shared_task
+def dispatch_outbox() -> int:
+    """Entrega os eventos pendentes do outbox, em lotes"""
+    return outbox.drain()
+
+
+@shared_task
+def run_deletion_job(job_id: int) -> str:
+    """Remove em lotes a empresa ou o cliente do job (ver core.deletion)"""
+    job = deletion.run(job_id)
+    return job.status if job else 'skipped'
+
+
+@shared_task
+def resume_deletion_jobs() -> int:
+    """Retoma os jobs de remoção que ficaram na fila ou parados no meio"""
+    job_ids = list(deletion.runnable().values_list('id', flat=True))
+    for job_id in job_ids:
+        deletion.run(job_id)
+    return len(job_ids)
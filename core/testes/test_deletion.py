@@ -0,0 +1,120 @@
+import pytest
+from datetime import datetime, timedelta
+from django.contrib.auth.models import User
+from django.utils import timezone
+from ninja_extra.testing import TestClient
+
+from booking.models import Booking, WaitlistEntry
+from client.controllers import ClientController
+from client.models import Client
+from company.controllers import CompanyController
+from company.models import Company
+from core import deletion
+from core.models import DeletionJob
+from servicetype.models import ServiceType
+from slot.models import Slot, SlotTemplate
+
+
+@pytest.fixture
+def company():
+    return Company.objects.create(user=User.objects.create_user(username='company'), name='Barbearia')
+
+
+@pytest.fixture
+def client():
+    return Client.objects.create(user=User.objects.create_user(username='client'), name='Maria')
+
+
+@pytest.fixture
+def service_type(company):
+    return ServiceType.objects.create(company=company, name='Corte', duration=timedelta(minutes=30), price=30)
+
+
+@pytest.fixture
+def slots(company):
+    start = timezone.make_aware(datetime(2030, 1, 7, 9))
+    return Slot.objects.bulk_create([
+        Slot(company=company, start_time=start + timedelta(hours=i), end_time=start + timedelta(hours=i + 1),
+             is_available=False)
+        for i in range(12)
+    ])
+
+
+@pytest.fixture
+def bookings(slots, service_type, client):
+    bookings = Booking.objects.bulk_create([
+        Booking(slot=slot, service_type=service_type, client=client, status='confirmed') for slot in slots[:10]
+    ])
+    bookings[0].extra_slots.add(slots[10])
+    return bookings
+
+
+@pytest.mark.django_db
+class TestDeletion:
+
+    def test_delete_company_returns_202_and_hides_it(self, company, slots, django_capture_on_commit_callbacks):
+        api_client = TestClient(CompanyController)
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            response = api_client.delete(f'/{company.id}')
+
+        assert response.status_code == 202
+        assert response.json()['status'] == 'pending'
+        assert len(callbacks) == 1
+        # Os dados ainda existem, mas a empresa some da API
+        assert Slot.objects.count() == 12
+        assert api_client.get(f'/{company.id}').status_code == 404
+        assert api_client.get(f'/{company.id}/deletion').json()['status'] == 'pending'
+
+    def test_company_dependents_are_deleted_in_chunks(self, settings, company, bookings, slots, service_type):
+        settings.DELETION_CHUNK_SIZE = 4
+        SlotTemplate.objects.create(
+            company=company, days_of_week=[0], day_start='09:00', day_end='18:00',
+            duration=timedelta(minutes=30), valid_from='2030-01-01'
+        )
+        job = deletion.request_deletion(company)
+
+        job = deletion.run(job.id)
+
+        assert job.status == 'done'
+        assert job.progress == 100.0
+        # 10 reservas, 12 slots, o modelo de agenda e o tipo de serviço
+        assert job.deleted == job.total == 24
+        assert not Company.objects.exists()
+        assert not User.objects.filter(username='company').exists()
+        assert not (Slot.objects.exists() or Booking.objects.exists() or ServiceType.objects.exists())
+        assert not Booking.extra_slots.through.objects.exists()
+        assert Client.objects.exists()
+
+    def test_client_deletion_frees_slots(self, settings, client, bookings, slots, service_type):
+        settings.DELETION_CHUNK_SIZE = 3
+        other = Client.objects.create(user=User.objects.create_user(username='other'), name='João')
+        WaitlistEntry.objects.create(client=other, service_type=service_type, company_id=service_type.company_id,
+                                     slot=slots[0], position=1)
+        job = deletion.request_deletion(client)
+
+        assert deletion.run(job.id).status == 'done'
+        assert deletion.run(job.id) is None
+
+        assert not Client.objects.filter(id=client.id).exists()
+        # O primeiro slot foi repassado a quem estava na fila; os demais ficaram livres
+        assert list(Booking.objects.values_list('client_id', 'slot_id')) == [(other.id, slots[0].id)]
+        assert Slot.objects.filter(is_available=True).count() == 10
+        assert not Slot.objects.get(id=slots[11].id).is_available
+
+    def test_stale_job_is_resumed(self, company, slots):
+        job = deletion.request_deletion(company)
+        DeletionJob.objects.filter(id=job.id).update(status='running', updated_at=timezone.now())
+        assert deletion.run(job.id) is None
+
+        DeletionJob.objects.filter(id=job.id).update(updated_at=timezone.now() - timedelta(hours=1))
+        assert deletion.run(job.id).status == 'done'
+        assert not Slot.objects.exists()
+
+    def test_client_is_rejected_while_deleting(self, client):
+        api_client = TestClient(ClientController)
+        deletion.request_deletion(client)
+
+        assert api_client.get(f'/{client.id}').status_code == 404
+        assert api_client.get('/').json()['count'] == 0
+        assert api_client.get('/999/deletion').status_code == 404
@@ -0,0 +1,110 @@
+import pytest
+from datetime import datetime, timedelta
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.utils import timezone
+
+from booking.models import Booking
+from client.models import Client
+from company.models import Company
+from core.idempotency import IdempotencyMiddleware
+from core.models import IdempotencyKey
+from servicetype.models import ServiceType
+from slot.models import Slot
+
+# Pelo cliente do Django, para passar pelo middleware, com as URLs do projeto
+# (e não as de core/testes/conftest.py)
+pytestmark = pytest.mark.urls('scheduling_api.urls')
+
+START = timezone.make_aware(datetime(2030, 1, 7, 9))
+
+
+@pytest.fixture(params=['core.idempotency.CacheStore', 'core.idempotency.DatabaseStore'])
+def store(request, settings):
+    settings.IDEMPOTENCY_STORE = request.param
+    return request.param
+
+
+@pytest.fixture
+def booking_request(db):
+    company = Company.objects.create(user=User.objects.create_user(username='company'), name='Company')
+    client = Client.objects.create(user=User.objects.create_user(username='client'), name='Client')
+    service_type = ServiceType.objects.create(company=company, name='Corte', duration=timedelta(minutes=30))
+    slot = Slot.objects.create(company=company, start_time=START, end_time=START + timedelta(hours=1))
+    return f'/api/bookings/?client_id={client.id}', {'slot_id': slot.id, 'service_type_id': service_type.id}
+
+
+def _post(client, url, payload, key):
+    return client.post(url, payload, content_type='application/json', HTTP_IDEMPOTENCY_KEY=key)
+
+
+@pytest.mark.django_db
+class TestIdempotencyKey:
+
+    def test_retry_replays_first_response(self, client, store, booking_request, django_assert_max_num_queries):
+        url, payload = booking_request
+        first = _post(client, url, payload, 'abc')
+        assert first.status_code == 201
+
+        # A repetição é uma leitura no store, sem passar pelo endpoint
+        with django_assert_max_num_queries(1 if store.endswith('DatabaseStore') else 0):
+            retry = _post(client, url, payload, 'abc')
+
+        assert retry.status_code == 201
+        assert retry.json() == first.json()
+        assert retry['Idempotent-Replayed'] == 'true'
+        assert Booking.objects.count() == 1
+
+    def test_key_reused_with_other_body(self, client, store, booking_request):
+        url, payload = booking_request
+        _post(client, url, payload, 'abc')
+
+        response = _post(client, url, {**payload, 'notes': 'outra'}, 'abc')
+
+        assert response.status_code == 422
+
+    def test_without_key_nothing_is_stored(self, client, store, booking_request):
+        url, payload = booking_request
+        client.post(url, payload, content_type='application/json')
+
+        assert _post(client, url, payload, 'abc').status_code == 400
+        assert not IdempotencyKey.objects.filter(status_code=201).exists()
+
+    def test_expired_db_key_runs_again(self, client, booking_request, settings):
+        settings.IDEMPOTENCY_STORE = 'core.idempotency.DatabaseStore'
+        url, payload = booking_request
+        _post(client, url, payload, 'abc')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = _post(client, url, payload, 'abc')
+
+        assert response.status_code == 400
+        assert response.json()['detail'] == 'Este slot não está disponível'
+
+    def test_in_flight_key_has_short_lease(self, booking_request, settings):
+        settings.IDEMPOTENCY_STORE = 'core.idempotency.DatabaseStore'
+        seen = {}
+
+        def view(request):
+            # Ainda dentro da primeira requisição: só a marca de em andamento
+            seen['expires_at'] = IdempotencyKey.objects.get().expires_at
+            return HttpResponse('{}', status=201, content_type='application/json')
+
+        url, payload = booking_request
+        request = RequestFactory().post(url, payload, content_type='application/json', HTTP_IDEMPOTENCY_KEY='abc')
+        IdempotencyMiddleware(view)(request)
+
+        assert seen['expires_at'] <= timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_LOCK_TTL)
+        assert IdempotencyKey.objects.get().expires_at > timezone.now() + timedelta(hours=1)
+
+    def test_key_is_scoped_to_the_caller(self, client, store, booking_request):
+        url, payload = booking_request
+        other = Client.objects.create(user=User.objects.create_user(username='other'), name='Other')
+        _post(client, url, payload, 'abc')
+
+        # A mesma chave enviada por outro cliente não repete a resposta do primeiro
+        response = _post(client, f'/api/bookings/?client_id={other.id}', payload, 'abc')
+
+        assert response.status_code == 400
+        assert 'Idempotent-Replayed' not in response
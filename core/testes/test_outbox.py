@@ -0,0 +1,109 @@
+import pytest
+from datetime import datetime, timedelta
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from ninja_extra.testing import TestClient
+
+from booking.controllers import BookingController
+from client.models import Client
+from company.models import Company
+from core import outbox
+from core.models import OutboxEvent
+from servicetype.models import ServiceType
+from slot.models import Slot
+
+
+class FailingSink:
+    def send(self, events):
+        raise ConnectionError('consumidor fora do ar')
+
+
+class RecordingSink:
+    seen = []
+
+    def send(self, events):
+        # Estado visto de fora durante a entrega
+        self.seen.append((len(transaction.get_connection().atomic_blocks),
+                          OutboxEvent.objects.get(id=events[0]['id']).available_at))
+
+
+@pytest.fixture
+def memory_sink(settings):
+    settings.OUTBOX_SINKS = [{'BACKEND': 'core.outbox.MemorySink'}]
+    outbox.MemorySink.queue.clear()
+    yield outbox.MemorySink.queue
+    outbox.MemorySink.queue.clear()
+
+
+@pytest.mark.django_db
+class TestOutbox:
+
+    def test_event_is_rolled_back_with_the_change(self):
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                outbox.publish('booking.created', {'booking_ids': [1]})
+                raise RuntimeError
+
+        assert not OutboxEvent.objects.exists()
+
+    def test_dispatch_delivers_in_batches(self, memory_sink, django_assert_num_queries):
+        for i in range(5):
+            outbox.publish('booking.created', {'booking_ids': [i]})
+
+        # leitura e reserva do lote (mais savepoints) e UPDATE marcando como entregue
+        with django_assert_num_queries(5):
+            assert outbox.dispatch(batch_size=3) == 3
+
+        assert outbox.drain(batch_size=3) == 2
+        assert [event['payload']['booking_ids'] for event in memory_sink] == [[0], [1], [2], [3], [4]]
+        assert not OutboxEvent.objects.filter(delivered_at__isnull=True).exists()
+
+    def test_failed_delivery_backs_off(self, settings):
+        settings.OUTBOX_SINKS = [{'BACKEND': f'{__name__}.FailingSink'}]
+        event = outbox.publish('booking.cancelled', {'booking_ids': [1]})
+
+        assert outbox.dispatch() == 0
+
+        event.refresh_from_db()
+        assert event.attempts == 1
+        assert event.available_at >= timezone.now() + timedelta(seconds=1)
+        assert 'consumidor fora do ar' in event.last_error
+        # Ainda não chegou a hora da próxima tentativa
+        assert outbox.dispatch() == 0
+        event.refresh_from_db()
+        assert event.attempts == 1
+
+    def test_delivery_runs_outside_the_claim_transaction(self, settings):
+        settings.OUTBOX_SINKS = [{'BACKEND': f'{__name__}.RecordingSink'}]
+        RecordingSink.seen.clear()
+        outbox.publish('booking.created', {'booking_ids': [1]})
+        # Só a transação do próprio teste
+        depth = len(transaction.get_connection().atomic_blocks)
+
+        assert outbox.dispatch() == 1
+
+        # O lote já estava reservado, com a transação fechada, quando o sink foi chamado
+        atomic_blocks, available_at = RecordingSink.seen[0]
+        assert atomic_blocks == depth
+        assert available_at > timezone.now()
+        assert OutboxEvent.objects.get().delivered_at is not None
+
+    def test_booking_changes_publish_events(self, memory_sink):
+        company = Company.objects.create(user=User.objects.create_user(username='company'), name='Company')
+        client = Client.objects.create(user=User.objects.create_user(username='client'), name='Client')
+        service_type = ServiceType.objects.create(company=company, name='Corte', duration=timedelta(minutes=30))
+        start = timezone.make_aware(datetime(2030, 1, 7, 9))
+        slot = Slot.objects.create(company=company, start_time=start, end_time=start + timedelta(hours=1))
+        api_client = TestClient(BookingController)
+
+        booking_id = api_client.post(f'/?client_id={client.id}', json={
+            'slot_id': slot.id, 'service_type_id': service_type.id
+        }).json()['id']
+        api_client.patch(f'/{booking_id}/status?status=cancelled')
+        outbox.drain()
+
+        assert [(event['topic'], event['payload']['booking_ids']) for event in memory_sink] == [
+            ('booking.created', [booking_id]),
+            ('booking.cancelled', [booking_id]),
+        ]
@@ -0,0 +1,133 @@
+import re
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from booking.controllers import BookingController
+from booking.models import Booking
+from booking.schema import BookingFilter
+from client.models import Client
+from company.models import Company
+from servicetype.models import ServiceType
+from slot.controllers import SlotController
+from slot.models import Slot
+from slot.schema import SlotFilter
+
+pytestmark = pytest.mark.skipif(connection.vendor != 'sqlite', reason='EXPLAIN QUERY PLAN é específico do SQLite')
+
+HOT_TABLES = ('slot_slot', 'booking_booking')
+
+START = timezone.make_aware(datetime(2030, 1, 1))
+
+
+@pytest.fixture
+def seeded_db(db):
+    """Algumas empresas com um mês de slots e metade deles reservados, seguido de ANALYZE"""
+    companies = []
+    for i in range(4):
+        user = User.objects.create_user(username=f'company{i}', password='password123')
+        companies.append(Company.objects.create(user=user, name=f'Company {i}'))
+
+    user = User.objects.create_user(username='client', password='password123')
+    client = Client.objects.create(user=user, name='Client')
+
+    slots = [
+        Slot(
+            company=company,
+            start_time=START + timedelta(hours=hour),
+            end_time=START + timedelta(hours=hour + 1),
+            is_available=hour % 2 == 0
+        )
+        for company in companies
+        for hour in range(24 * 30)
+    ]
+    Slot.objects.bulk_create(slots, batch_size=500)
+
+    bookings = []
+    for company in companies:
+        service_type = ServiceType.objects.create(company=company, name='Corte', price=Decimal('10.00'))
+        bookings += [
+            Booking(slot=slot, service_type=service_type, client=client, status='confirmed')
+            for slot in Slot.objects.filter(company=company, is_available=False)
+        ]
+    Booking.objects.bulk_create(bookings, batch_size=500)
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    return companies[0]
+
+
+def full_scans(queryset):
+    """Tabelas quentes lidas inteiras (SCAN sem índice) no plano da consulta"""
+    plan = queryset.explain()
+    return [
+        table for table in re.findall(r'SCAN (\w+)\b(?! USING)', plan)
+        if table in HOT_TABLES
+    ]
+
+
+def slot_querysets(company_id):
+    controller = SlotController()
+    window = {'start_date': START + timedelta(days=3), 'end_date': START + timedelta(days=10)}
+    return {
+        'list_slots': controller.filter_slots(SlotFilter(company_id=company_id, **window)),
+        'list_slots_all': controller.filter_slots(SlotFilter(company_id=company_id, only_available=False, **window)),
+        'list_slots_cursor': controller.filter_slots(SlotFilter(company_id=company_id)).order_by('start_time', 'id'),
+    }
+
+
+def booking_querysets(company_id, client_id):
+    controller = BookingController()
+    return {
+        'list_bookings_company': controller.filter_bookings(BookingFilter(company_id=company_id)),
+        'list_bookings_window': controller.filter_bookings(BookingFilter(
+            company_id=company_id, start_date=START + timedelta(days=3), end_date=START + timedelta(days=10)
+        )),
+        'list_bookings_client': controller.filter_bookings(BookingFilter(client_id=client_id)).order_by('created_at', 'id'),
+        'list_bookings_status': controller.filter_bookings(BookingFilter(status='cancelled')).order_by('created_at', 'id'),
+    }
+
+
+def test_slot_hot_paths_use_indexes(seeded_db):
+    for name, queryset in slot_querysets(seeded_db.id).items():
+        assert full_scans(queryset) == [], f'{name}: {queryset.explain()}'
+
+
+def test_booking_hot_paths_use_indexes(seeded_db):
+    client_id = Client.objects.get().id
+    for name, queryset in booking_querysets(seeded_db.id, client_id).items():
+        assert full_scans(queryset) == [], f'{name}: {queryset.explain()}'
+
+
+def test_slot_cursor_walk_needs_no_sort(seeded_db):
+    queryset = slot_querysets(seeded_db.id)['list_slots_cursor']
+
+    assert 'TEMP B-TREE' not in queryset.explain()
+
+
+def test_hold_sweep_uses_partial_index(seeded_db):
+    queryset = Booking.objects.filter(status='held', expires_at__lte=timezone.now()).order_by('expires_at')
+
+    assert 'booking_held_expiry_idx' in queryset.explain()
+
+
+def test_outbox_dispatch_uses_partial_index(db):
+    from core.models import OutboxEvent
+
+    queryset = OutboxEvent.objects.filter(
+        delivered_at__isnull=True, available_at__lte=timezone.now(), attempts__lt=10
+    ).order_by('available_at', 'id')
+
+    assert 'outbox_pending_idx' in queryset.explain()
+
+
+def test_company_name_lookup_uses_functional_index(seeded_db):
+    from django.db.models.functions import Lower
+
+    queryset = Company.objects.annotate(lower_name=Lower('name')).filter(lower_name='company 1')
+
+    assert 'company_name_ci_unique' in queryset.explain()
@@ -0,0 +1,60 @@
+import json
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.utils import timezone
+from ninja.renderers import JSONRenderer
+
+from company.models import Company
+from core import benchmarks
+from core.api import api
+from core.renderers import ORJSONRenderer
+from servicetype.models import ServiceType
+
+
+def _render(renderer, data):
+    return json.loads(renderer.render(None, data, response_status=200))
+
+
+class TestORJSONRenderer:
+
+    def test_matches_default_renderer(self):
+        data = {
+            'price': Decimal('35.00'),
+            'duration': timedelta(minutes=45),
+            'by_status': {'confirmed': 2},
+            1: 'chave inteira',
+            'items': [{'id': 1, 'notes': None}],
+        }
+
+        assert _render(ORJSONRenderer(), data) == _render(JSONRenderer(), data)
+
+    def test_keeps_microseconds(self):
+        moment = timezone.make_aware(datetime(2030, 1, 7, 9, 30, 0, 123456))
+
+        assert _render(ORJSONRenderer(), {'at': moment}) == {'at': '2030-01-07T09:30:00.123456Z'}
+
+    @pytest.mark.django_db
+    @pytest.mark.urls('scheduling_api.urls')
+    def test_api_responses(self, client, monkeypatch):
+        monkeypatch.setattr(api, 'renderer', ORJSONRenderer())
+        company = Company.objects.create(user=User.objects.create_user(username='company'), name='Company')
+        ServiceType.objects.create(company=company, name='Corte', duration=timedelta(minutes=30), price=Decimal('10.00'))
+
+        response = client.get('/api/service-types/')
+
+        assert response['Content-Type'] == 'application/json; charset=utf-8'
+        assert response.json()['results'][0]['price'] == '10.00'
+
+
+class TestSerializationBenchmark:
+
+    def test_every_out_schema_has_a_sample(self):
+        assert set(benchmarks.out_schemas()) <= set(benchmarks.SAMPLES)
+
+    def test_samples_validate(self):
+        results = benchmarks.run(rows=2, repeat=1)
+
+        assert len(results) == len(benchmarks.out_schemas())
+        assert set(results['booking.schema.BookingOut']) == {'validate', 'dump', 'json', 'orjson'}
@@ -0,0 +1,105 @@
+import pytest
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from ninja_extra.testing import TestClient
+
+from client.controllers import ClientController
+from client.models import Client
+from company.controllers import CompanyController
+from company.models import Company
+from core.search import FullTextSearching, repair_indexes
+from servicetype.controllers import ServiceTypeController
+from servicetype.models import ServiceType
+
+
+def _company(name, description=None):
+    return Company.objects.create(user=User.objects.create_user(username=name.lower().replace(' ', '_')),
+                                  name=name, description=description)
+
+
+def _names(response):
+    return [item['name'] for item in response.json()['results']]
+
+
+@pytest.mark.django_db
+class TestFullTextSearch:
+
+    def test_companies_ranked_with_prefix_first(self):
+        _company('Salão da Barbara')
+        _company('Barbearia Central', 'Corte e barba')
+        _company('Padaria Pão Quente')
+        api_client = TestClient(CompanyController)
+
+        assert _names(api_client.get('/', query_params={'search': 'BARB'})) == [
+            'Barbearia Central', 'Salão da Barbara'
+        ]
+        # Todos os termos precisam aparecer, em qualquer campo
+        assert _names(api_client.get('/', query_params={'search': 'barb corte'})) == ['Barbearia Central']
+        # Termo curto demais para o trigram: filtro por prefixo
+        assert _names(api_client.get('/', query_params={'search': 'pa'})) == ['Padaria Pão Quente']
+        assert _names(api_client.get('/', query_params={'search': '"barb'})) == []
+
+    def test_index_follows_every_write(self):
+        company = _company('Barbearia Central')
+        Company.objects.filter(id=company.id).update(name='Estúdio Norte')
+        Company.objects.bulk_create([Company(user=User.objects.create_user(username='x'), name='Barbearia Sul')])
+        api_client = TestClient(CompanyController)
+
+        assert _names(api_client.get('/', query_params={'search': 'barbearia'})) == ['Barbearia Sul']
+        assert _names(api_client.get('/', query_params={'search': 'norte'})) == ['Estúdio Norte']
+
+        Company.objects.filter(id=company.id).delete()
+        assert _names(api_client.get('/', query_params={'search': 'norte'})) == []
+
+    def test_clients_by_phone(self):
+        Client.objects.create(user=User.objects.create_user(username='maria'), name='Maria', phone='11988887777')
+        Client.objects.create(user=User.objects.create_user(username='joao'), name='João', phone='21911112222')
+
+        response = TestClient(ClientController).get('/', query_params={'search': '8887'})
+
+        assert _names(response) == ['Maria']
+
+    def test_cached_catalog_is_filtered_in_memory(self):
+        company = _company('Barbearia Central')
+        duration = timedelta(minutes=30)
+        ServiceType.objects.create(company=company, name='Corte', description=None, duration=duration, price=30)
+        ServiceType.objects.create(company=company, name='Barba', description='Com toalha', duration=duration, price=25)
+
+        response = TestClient(ServiceTypeController).get(
+            '/', query_params={'company_id': company.id, 'search': 'toalha'}
+        )
+
+        assert _names(response) == ['Barba']
+
+    def test_query_uses_fts_index(self):
+        queryset = FullTextSearching(search_fields=['name', 'description']).searching_queryset(
+            Company.objects.all(), FullTextSearching.Input(search='barbearia')
+        )
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+        # Só os ids que casaram são lidos da tabela, pela chave primária
+        assert 'SCAN company_company_fts VIRTUAL TABLE INDEX' in plan
+        assert 'SEARCH company_company USING INTEGER PRIMARY KEY' in plan
+
+
+@pytest.mark.django_db
+def test_migrate_restores_dropped_triggers():
+    # O que sobra depois de uma migração que recria a tabela no SQLite
+    with connection.cursor() as cursor:
+        cursor.execute('DROP TRIGGER company_company_fts_ai')
+    _company('Sem Trigger')
+
+    emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+
+    _company('Barbearia Central')
+    api_client = TestClient(CompanyController)
+    # O índice também é reconstruído com o que foi escrito sem o trigger
+    assert _names(api_client.get('/', query_params={'search': 'trigger'})) == ['Sem Trigger']
+    assert _names(api_client.get('/', query_params={'search': 'barbearia'})) == ['Barbearia Central']
+    # Nada faltando: não recria
+    assert repair_indexes('default') == []
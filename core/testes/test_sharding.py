@@ -0,0 +1,212 @@
+import pytest
+from datetime import datetime, time, timedelta
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from ninja_extra.testing import TestClient
+
+from booking.controllers import BookingController
+from booking.models import Booking
+from client.models import Client
+from company.models import Company
+from core import sharding
+from core.models import OutboxEvent
+from servicetype.cache import service_type_cache
+from servicetype.controllers import ServiceTypeController
+from servicetype.models import ServiceType
+from slot.controllers import SlotController
+from slot.models import Slot, SlotTemplate
+
+# Os bancos que o conftest.py da raiz acrescenta aos DATABASES
+TEST_SHARDS = ['shard_0', 'shard_1']
+
+pytestmark = pytest.mark.django_db(databases=['default', *TEST_SHARDS])
+
+START = timezone.make_aware(datetime(2030, 1, 7, 9))
+
+
+@pytest.fixture
+def shards(settings):
+    settings.DATABASE_SHARDS = TEST_SHARDS
+    for alias in TEST_SHARDS:
+        sharding.seed_sequences(alias)
+    return TEST_SHARDS
+
+
+@pytest.fixture
+def replicated(django_capture_on_commit_callbacks):
+    """Executa os on_commit do default, onde as cópias para os shards são gravadas"""
+    return lambda: django_capture_on_commit_callbacks(execute=True)
+
+
+@pytest.fixture
+def companies(shards, replicated):
+    # Uma empresa em cada shard (company_id % 2)
+    with replicated():
+        companies = [
+            Company.objects.create(user=User.objects.create_user(username=f'company_{i}'), name=f'Empresa {i}')
+            for i in range(2)
+        ]
+    return sorted(companies, key=lambda company: sharding.shard_for_company(company.id))
+
+
+def _slots(company, hours):
+    with sharding.for_company(company.id):
+        return Slot.objects.bulk_create([
+            Slot(company=company, start_time=START + timedelta(hours=hour),
+                 end_time=START + timedelta(hours=hour + 1), is_available=True)
+            for hour in hours
+        ])
+
+
+class TestSharding:
+
+    def test_rows_go_to_the_company_shard(self, companies):
+        api_client = TestClient(ServiceTypeController)
+
+        for alias, company in zip(TEST_SHARDS, companies):
+            response = api_client.post(f'/?company_id={company.id}',
+                                       json={'name': 'Corte', 'duration_minutes': 30, 'price': '30.00'})
+
+            assert response.status_code == 201
+            service_type_id = response.json()['id']
+            # O id carrega o shard
+            assert sharding.shard_for_id(service_type_id) == alias
+            assert ServiceType.objects.using(alias).filter(id=service_type_id, company=company).exists()
+            assert api_client.get(f'/{service_type_id}').json()['name'] == 'Corte'
+
+        assert not ServiceType.objects.using('default').exists()
+        # Busca pelo índice de cada shard e mescla por relevância
+        assert api_client.get('/', query_params={'search': 'corte'}).json()['count'] == 2
+
+    def test_listing_fans_out_and_merges(self, companies):
+        first = _slots(companies[0], [0, 2, 4])
+        second = _slots(companies[1], [1, 3])
+        api_client = TestClient(SlotController)
+
+        response = api_client.get('/', query_params={'page': 2, 'page_size': 2}).json()
+
+        # Mescladas por start_time: 0 e 1 na primeira página, 2 e 3 na segunda
+        assert response['count'] == 5
+        assert [slot['id'] for slot in response['results']] == [first[1].id, second[1].id]
+
+        only_one = api_client.get('/', query_params={'company_id': companies[1].id}).json()
+        assert only_one['count'] == 2
+
+        cursor = api_client.get('/cursor', query_params={'page_size': 4}).json()
+        following = api_client.get('/cursor', query_params={'page_size': 4, 'cursor': cursor['next']}).json()
+        hours = [slot['start_time'] for slot in cursor['results'] + following['results']]
+        assert len(hours) == 5 and hours == sorted(hours)
+
+    def test_listing_with_templates_pages_in_the_company_shard(self, companies):
+        company = companies[1]
+        _slots(company, [2])
+        with sharding.for_company(company.id):
+            SlotTemplate.objects.create(company=company, days_of_week=[0], day_start=time(9), day_end=time(11),
+                                        duration=timedelta(hours=1), valid_from=START.date())
+        api_client = TestClient(SlotController)
+
+        response = api_client.get('/', query_params={
+            'company_id': company.id,
+            'start_date': START.isoformat(),
+            'end_date': (START + timedelta(days=1)).isoformat(),
+            'page': 2, 'page_size': 2,
+        }).json()
+
+        # 9h e 10h do template na primeira página, o slot das 11h na segunda
+        assert response['count'] == 3
+        assert [slot['start_time'][11:16] for slot in response['results']] == ['11:00']
+
+    def test_cached_service_type_keeps_its_shard(self, companies):
+        company = companies[1]
+        with sharding.for_company(company.id):
+            service_type = ServiceType.objects.create(company=company, name='Corte',
+                                                      duration=timedelta(minutes=30), price=30)
+
+        for _ in range(2):  # lido do banco e depois do cache
+            cached = service_type_cache.instance(service_type.id)
+            assert cached._state.db == TEST_SHARDS[1]
+        # Fora de um `use`, o router segue a instância
+        assert cached.bookings.count() == 0
+
+    def test_id_routes_to_its_shard(self, companies):
+        slot = _slots(companies[1], [0])[0]
+        api_client = TestClient(SlotController)
+
+        assert sharding.shard_for_id(slot.id) == TEST_SHARDS[1]
+        assert api_client.get(f'/{slot.id}').json()['company_id'] == companies[1].id
+        assert api_client.get(f'/{slot.id - 1}').status_code == 404
+        assert api_client.get(f'/{len(TEST_SHARDS) << sharding.SHARD_ID_BITS}').status_code == 404
+
+    def test_slot_is_created_in_the_company_shard(self, companies):
+        api_client = TestClient(SlotController)
+        company = companies[1]
+        payload = {'start_time': START.isoformat(), 'end_time': (START + timedelta(hours=1)).isoformat()}
+
+        response = api_client.post(f'/?company_id={company.id}', json=payload)
+
+        assert response.status_code == 201
+        assert sharding.shard_for_id(response.json()['id']) == TEST_SHARDS[1]
+        assert api_client.post(f'/?company_id={company.id}', json=payload).status_code == 400
+
+    def test_booking_joins_replicated_client(self, companies, replicated):
+        with replicated():
+            client = Client.objects.create(user=User.objects.create_user(username='maria'), name='Maria')
+        company = companies[1]
+        slot = _slots(company, [0])[0]
+        with sharding.for_company(company.id):
+            service_type = ServiceType.objects.create(company=company, name='Corte',
+                                                      duration=timedelta(minutes=30), price=30)
+        api_client = TestClient(BookingController)
+
+        response = api_client.post(f'/?client_id={client.id}',
+                                   json={'slot_id': slot.id, 'service_type_id': service_type.id})
+
+        assert response.status_code == 201
+        assert response.json()['client']['user']['username'] == 'maria'
+        shard = TEST_SHARDS[1]
+        assert Booking.objects.using(shard).filter(client_id=client.id).exists()
+        # O evento vai para o outbox do mesmo shard, na mesma transação
+        assert OutboxEvent.objects.using(shard).filter(topic='booking.created').exists()
+        assert not Slot.objects.using(shard).get(id=slot.id).is_available
+
+        listed = api_client.get('/', query_params={'client_id': client.id}).json()
+        assert [booking['id'] for booking in listed['results']] == [response.json()['id']]
+
+    def test_reference_rows_are_replicated(self, shards, replicated):
+        with replicated():
+            client = Client.objects.create(user=User.objects.create_user(username='maria'), name='Maria')
+            client.name = 'Maria Silva'
+            client.save()
+
+        for alias in shards:
+            assert Client.objects.using(alias).get(id=client.id).name == 'Maria Silva'
+            assert User.objects.using(alias).filter(username='maria').exists()
+
+        with replicated():
+            client.user.delete()
+        for alias in shards:
+            assert not Client.objects.using(alias).exists()
+            assert not User.objects.using(alias).exists()
+
+    def test_rolled_back_rows_are_not_replicated(self, shards, replicated):
+        with replicated():
+            with transaction.atomic():
+                Client.objects.create(user=User.objects.create_user(username='maria'), name='Maria')
+                transaction.set_rollback(True)
+
+        for alias in shards:
+            assert not User.objects.using(alias).exists()
+
+
+
+def test_unsupported_backend_is_rejected(settings, monkeypatch):
+    settings.DATABASE_SHARDS = ['shard_0']
+    # Um shard em outro banco: sem a faixa de ids, toda busca por id iria ao shard_0
+    monkeypatch.setattr(sharding, 'connections', {'shard_0': type('Connection', (), {'vendor': 'postgresql'})()})
+
+    with pytest.raises(ImproperlyConfigured):
+        sharding.check_backends()
+    with pytest.raises(ImproperlyConfigured):
+        sharding.seed_sequences('shard_0')
@@ -1,9 +1,5 @@
-from django.urls import path, include
-from core.api import api
-
 # Configuração de URLs para testes
-# Não podemos definir namespace diretamente em api.urls pois é uma tupla
-
-urlpatterns = [
-    path('api/', api.urls),
-]
\ No newline at end of file
+# As mesmas rotas do projeto: api.urls só pode ser montado uma vez por processo
+# (o ninja recusa registrar a mesma API de novo), e outros módulos de teste
+# podem ter carregado scheduling_api.urls antes deste
+from scheduling_api.urls import urlpatterns  # noqa: F401
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
     'slot',
     'servicetype',
     'booking',
+    'user',
     #libs
     'ninja',
     'ninja_extra',
@@ -61,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.idempotency.IdempotencyMiddleware',
 ]
 
 ROOT_URLCONF = 'scheduling_api.urls'
@@ -94,6 +97,19 @@ DATABASES = {
     }
 }
 
+# Particionamento por empresa (core.sharding): slots, reservas e tipos de
+# serviço de cada empresa ficam no shard company_id % SHARD_COUNT. Com 0
+# (padrão) tudo fica no default. Em desenvolvimento cada shard é um arquivo
+# SQLite; rode `manage.py migrate_shards` depois do migrate
+SHARD_COUNT = int(os.environ.get('SHARD_COUNT', '0'))
+DATABASE_SHARDS = [f'shard_{i}' for i in range(SHARD_COUNT)]
+for alias in DATABASE_SHARDS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{alias}.sqlite3',
+    }
+DATABASE_ROUTERS = ['core.sharding.CompanyShardRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -141,4 +157,84 @@ REST_FRAMEWORK = {
     'TEST_REQUEST_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
-}
\ No newline at end of file
+}
+
+# Índice em memória de sobreposição de slots: segundos até ser remontado do banco
+SLOT_INDEX_TTL = 60
+
+# Prazo (segundos) de uma pré-reserva antes de o slot ser liberado
+BOOKING_HOLD_TTL = 10 * 60
+
+# Celery: sem broker configurado as tarefas rodam localmente (modo eager)
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'memory://')
+CELERY_TASK_ALWAYS_EAGER = 'CELERY_BROKER_URL' not in os.environ
+CELERY_RESULT_BACKEND = 'django-db'
+CELERY_BEAT_SCHEDULE = {
+    'release-expired-holds': {
+        'task': 'booking.tasks.release_expired_holds',
+        'schedule': 60.0,
+    },
+    'dispatch-outbox': {
+        'task': 'core.tasks.dispatch_outbox',
+        'schedule': 5.0,
+    },
+    'resume-deletion-jobs': {
+        'task': 'core.tasks.resume_deletion_jobs',
+        'schedule': 60.0,
+    },
+    'purge-expired-idempotency-keys': {
+        'task': 'core.tasks.purge_expired_idempotency_keys',
+        'schedule': 60.0 * 60,
+    },
+}
+
+# Idempotency-Key: store das primeiras respostas e por quanto tempo são repetidas.
+# core.idempotency.CacheStore usa o cache IDEMPOTENCY_CACHE_ALIAS (LocMemCache
+# por padrão, um por processo); core.idempotency.DatabaseStore usa a tabela
+# core_idempotencykey, compartilhada entre processos
+IDEMPOTENCY_STORE = os.environ.get('IDEMPOTENCY_STORE', 'core.idempotency.CacheStore')
+IDEMPOTENCY_CACHE_ALIAS = 'default'
+IDEMPOTENCY_TTL = 24 * 60 * 60
+# Por quanto tempo uma requisição em andamento segura a chave
+IDEMPOTENCY_LOCK_TTL = 60
+
+# Outbox: destinos dos eventos (BACKEND + OPTIONS) e política de novas tentativas.
+# Outros sinks: core.outbox.WebhookSink (OPTIONS: url, timeout) e
+# core.outbox.MemorySink (fila em memória, para testes)
+OUTBOX_SINKS = [
+    {'BACKEND': 'core.outbox.LogSink', 'OPTIONS': {'path': BASE_DIR / 'outbox.log'}},
+]
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_MAX_BACKOFF = 60 * 60
+# Por quanto tempo um lote em entrega fica reservado para o despachante que o leu
+OUTBOX_CLAIM_LEASE = 5 * 60
+
+# Cache do catálogo de tipos de serviço (qualquer alias de CACHES) e validade em segundos.
+# Sem CACHES configurado, o 'default' é um LocMemCache por processo: a invalidação
+# só alcança o próprio worker, e os outros mostram o catálogo antigo até a entrada
+# expirar. Com vários workers, use um cache compartilhado (Redis, Memcached) ou
+# mantenha a validade curta. As reservas leem o tipo de serviço do banco
+SERVICE_TYPE_CACHE_ALIAS = 'default'
+SERVICE_TYPE_CACHE_TTL = 60
+
+# Renderer das respostas da API. core.renderers.ORJSONRenderer (requer orjson)
+# gera o JSON bem mais rápido que o padrão da stdlib
+API_RENDERER = os.environ.get('API_RENDERER', 'ninja.renderers.JSONRenderer')
+
+# Importação em lote (/clients/bulk, /companies/bulk): linhas por bulk_create
+BULK_ONBOARDING_CHUNK_SIZE = 1000
+
+# Pool de hashing de senha dos cadastros async (/users/async, /clients/async,
+# /companies/async): threads (padrão: núcleos) e hashes em andamento ou na fila
+# antes de responder 503 (padrão: 4 por thread)
+PASSWORD_HASHING_WORKERS = None
+PASSWORD_HASHING_MAX_PENDING = None
+
+# Cache dos perfis de usuário (GET /users/{id}/profile e /users/profiles)
+USER_PROFILE_CACHE_ALIAS = 'default'
+USER_PROFILE_CACHE_TTL = 60 * 60
+
+# Remoção de empresas e clientes em segundo plano (core.deletion): linhas por
+# DELETE e segundos sem progresso até um job 'running' ser retomado pelo beat
+DELETION_CHUNK_SIZE = 500
+DELETION_STALE_AFTER = 5 * 60
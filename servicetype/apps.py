@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ServicetypeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'servicetype'
+
+    def ready(self):
+        from servicetype import signals  # noqa: F401
@@ -0,0 +1,123 @@
+import threading
+import time
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core import sharding
+from servicetype.models import ServiceType
+
+
+FIELDS = ('id', 'name', 'description', 'duration', 'price', 'company_id')
+
+
+def _row(service_type: ServiceType) -> dict:
+    """Linha do catálogo já com os campos derivados que ServiceTypeOut expõe"""
+    minutes = service_type.duration_minutes
+    row = {field: getattr(service_type, field) for field in FIELDS}
+    row['duration_minutes'] = minutes
+    row['duration_formatted'] = f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+    return row
+
+
+class ServiceTypeCache:
+    """
+    Catálogo de tipos de serviço por empresa, versionado: invalidar uma
+    empresa só incrementa a versão, e as chaves antigas expiram sozinhas.
+    O backend é o cache do Django em SERVICE_TYPE_CACHE_ALIAS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'SERVICE_TYPE_CACHE_ALIAS', 'default')]
+
+    @property
+    def ttl(self) -> int:
+        return getattr(settings, 'SERVICE_TYPE_CACHE_TTL', 60)
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def version(self, company_id: int) -> int:
+        # Começa num valor único: se a chave for descartada pelo cache, a nova
+        # versão não coincide com catálogos antigos que ainda estejam guardados
+        return self.cache.get_or_set(f'servicetype:version:{company_id}', time.time_ns, None)
+
+    def catalog(self, company_id: int) -> List[dict]:
+        """Tipos de serviço da empresa, em ordem de id"""
+        key = f'servicetype:catalog:{company_id}:v{self.version(company_id)}'
+        rows = self.cache.get(key)
+        self._count(rows is not None)
+        if rows is None:
+            rows = [_row(service_type) for service_type in
+                    ServiceType.objects.filter(company_id=company_id).only(*FIELDS).order_by('id')]
+            self.cache.set(key, rows, self.ttl)
+        return rows
+
+    def get(self, service_type_id: int) -> Optional[dict]:
+        """Um tipo de serviço pelo id (None se não existir)"""
+        entry = self.cache.get(f'servicetype:item:{service_type_id}')
+        # A entrada guarda a versão da empresa em que foi lida
+        if entry is not None and entry['version'] == self.version(entry['row']['company_id']):
+            self._count(True)
+            return entry['row']
+
+        self._count(False)
+        # Lido direto do shard do id, mesmo fora de um sharding.use()
+        db = sharding.db_for_id(service_type_id)
+        if db is None:
+            return None
+        service_type = ServiceType.objects.using(db).only(*FIELDS).filter(id=service_type_id).first()
+        if service_type is None:
+            return None
+        row = _row(service_type)
+        self.cache.set(
+            f'servicetype:item:{service_type_id}',
+            {'version': self.version(service_type.company_id), 'row': row},
+            self.ttl
+        )
+        return row
+
+    def instance(self, service_type_id: int) -> Optional[ServiceType]:
+        """ServiceType montado a partir do cache, como se viesse do banco"""
+        row = self.get(service_type_id)
+        if row is None:
+            return None
+        # from_db espera os valores na ordem das colunas do modelo
+        field_names = [field.attname for field in ServiceType._meta.concrete_fields]
+        # O banco de onde a linha veio: o router usa a instância para escolher o shard
+        return ServiceType.from_db(sharding.db_for_id(service_type_id), field_names,
+                                   [row[name] for name in field_names])
+
+    def invalidate(self, company_id: int) -> None:
+        key = f'servicetype:version:{company_id}'
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Versão ainda não existe (ou foi descartada)
+            self.cache.set(key, time.time_ns(), None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+service_type_cache = ServiceTypeCache()
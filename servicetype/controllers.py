@@ -1,32 +1,47 @@
 from ninja_extra import api_controller, route
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from typing import Optional
 from datetime import timedelta
 from ninja_extra.pagination import PaginatedResponseSchema, PageNumberPaginationExtra, paginate
-from ninja_extra.searching import Searching
 from ninja_extra.searching import searching
 
 from company.models import Company
+from core.search import FullTextSearching
+from core.sharding import sharded
+from servicetype.cache import service_type_cache
 from servicetype.models import ServiceType
 from servicetype.schema import (
-    ServiceTypeIn, ServiceTypeOut,
-
+    ServiceTypeIn, ServiceTypeOut, ServiceTypeCacheStatsOut,
 )
 
 
 @api_controller('/service-types', tags=['Service Types'])
 class ServiceTypeController:
     
+    def get_queryset(self):
+        """Só as colunas de ServiceTypeOut; a empresa sai de company_id, sem JOIN"""
+        return ServiceType.objects.only('id', 'name', 'description', 'duration', 'price', 'company_id')
+    
     @route.get('/', response=PaginatedResponseSchema[ServiceTypeOut])
     @paginate(PageNumberPaginationExtra)
-    @searching(Searching)
+    @sharded(company='company_id')
+    @searching(FullTextSearching, search_fields=['name', 'description'])
     def list_service_types(self, company_id: Optional[int] = None):
-        queryset = ServiceType.objects.filter(company_id=company_id) if company_id else ServiceType.objects.all()
-        return queryset  
+        if company_id:
+            # Catálogo da empresa direto do cache
+            return service_type_cache.catalog(company_id)
+        return self.get_queryset()
+    
+    @route.get('/cache-stats', response=ServiceTypeCacheStatsOut)
+    def get_cache_stats(self):
+        """Acertos e falhas do cache de catálogo neste processo"""
+        return service_type_cache.stats()
     
     @route.post('/', response={201: ServiceTypeOut})
+    @sharded(company='company_id')
     def create_service_type(self, payload: ServiceTypeIn, company_id: int):
-        company = get_object_or_404(Company, id=company_id)
+        company = get_object_or_404(Company.objects.active(), id=company_id)
         service_type = ServiceType.objects.create(
             company=company,
             name=payload.name,
@@ -38,10 +53,15 @@ class ServiceTypeController:
     
 
     @route.get('/{service_type_id}', response=ServiceTypeOut)
+    @sharded(pk='service_type_id')
     def get_service_type(self, service_type_id: int):
-        return get_object_or_404(ServiceType, id=service_type_id)
+        service_type = service_type_cache.get(service_type_id)
+        if service_type is None:
+            raise Http404
+        return service_type
     
     @route.put('/{service_type_id}', response=ServiceTypeOut)
+    @sharded(pk='service_type_id')
     def update_service_type(self, service_type_id: int, payload: ServiceTypeIn):
         service_type = get_object_or_404(ServiceType, id=service_type_id)
         service_type.name = payload.name
@@ -49,12 +69,10 @@ class ServiceTypeController:
         service_type.duration = timedelta(minutes=payload.duration_minutes)
         service_type.price = payload.price
         service_type.save()
-        return {
-            **service_type.__dict__,
-            'duration_minutes': int(service_type.duration.total_seconds() / 60)
-        }
+        return service_type
     
     @route.delete('/{service_type_id}', response={204: None})
+    @sharded(pk='service_type_id')
     def delete_service_type(self, service_type_id: int):
         service_type = get_object_or_404(ServiceType, id=service_type_id)
         service_type.delete()
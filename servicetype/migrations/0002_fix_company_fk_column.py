@@ -0,0 +1,26 @@
+# Generated manually
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Mesma correção de slot/0002: company_id ainda era char(32) da época do UUID
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0003_auto_revert_to_default_id'),
+        ('servicetype', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='servicetype',
+            name='company',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='service_types', to='company.company'),
+        ),
+        migrations.AlterField(
+            model_name='servicetype',
+            name='company',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='service_types', to='company.company'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated manually
+
+from django.db import migrations
+
+from core.search import index_operations
+
+# Índice de busca (FTS5 trigram) usado por core.search.FullTextSearching
+forwards, backwards = index_operations('servicetype_servicetype', ['name', 'description'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicetype', '0002_fix_company_fk_column'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
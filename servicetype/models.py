@@ -11,6 +11,14 @@ class ServiceType(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='service_types')
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Empresa lida do banco: se o serviço mudar de empresa, o catálogo da
+        # antiga também é invalidado (servicetype.signals)
+        instance.loaded_company_id = instance.__dict__.get('company_id')
+        return instance
+    
     def __str__(self):
         return f"{self.name} ({self.company.name})"
         
@@ -26,4 +26,10 @@ class ServiceTypeOut(Schema):
         duration_minutes = obj.get('duration_minutes') if isinstance(obj, dict) else int(obj.duration.total_seconds() / 60)
         hours = duration_minutes // 60
         minutes = duration_minutes % 60
-        return f"{hours:02d}:{minutes:02d}:00"  # Segundos sempre 00
\ No newline at end of file
+        return f"{hours:02d}:{minutes:02d}:00"  # Segundos sempre 00
+
+
+class ServiceTypeCacheStatsOut(Schema):
+    hits: int
+    misses: int
+    hit_rate: float
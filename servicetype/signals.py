@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from company.models import Company
+from core import sharding
+from servicetype.cache import service_type_cache
+from servicetype.models import ServiceType
+
+
+def _invalidate(company_id):
+    # De novo após o commit: um leitor concorrente pode ter guardado a versão
+    # antiga entre a escrita e o fim da transação
+    service_type_cache.invalidate(company_id)
+    sharding.on_commit(lambda: service_type_cache.invalidate(company_id))
+
+
+@receiver(post_save, sender=ServiceType)
+@receiver(post_delete, sender=ServiceType)
+def invalidate_service_type(sender, instance, **kwargs):
+    _invalidate(instance.company_id)
+    # Serviço passado para outra empresa: sai do catálogo da antiga
+    previous = getattr(instance, 'loaded_company_id', None)
+    if previous is not None and previous != instance.company_id:
+        _invalidate(previous)
+    instance.loaded_company_id = instance.company_id
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def invalidate_company_catalog(sender, instance, **kwargs):
+    _invalidate(instance.id)
@@ -1,3 +1,123 @@
-from django.test import TestCase
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from ninja_extra.testing import TestClient
 
-# Create your tests here.
+from company.models import Company
+from servicetype.controllers import ServiceTypeController
+from servicetype.models import ServiceType
+
+
+@pytest.fixture
+def api_client():
+    return TestClient(ServiceTypeController)
+
+
+@pytest.fixture
+def company():
+    user = User.objects.create_user(username='testcompany', password='password123')
+    return Company.objects.create(user=user, name='Test Company')
+
+
+@pytest.fixture
+def service_types(company):
+    return ServiceType.objects.bulk_create([
+        ServiceType(company=company, name=f'Serviço {i}', duration=timedelta(minutes=30), price=Decimal('10.00'))
+        for i in range(15)
+    ])
+
+
+@pytest.mark.django_db
+class TestQueryBudget:
+    """Consultas por endpoint fixas, independentes do tamanho da página"""
+
+    def test_list_service_types(self, api_client, company, service_types, django_assert_num_queries):
+        # Sem empresa: COUNT e página direto do banco
+        with django_assert_num_queries(2):
+            response = api_client.get('/', query_params={'page_size': 50})
+
+        assert response.status_code == 200
+        assert len(response.json()['results']) == 15
+
+    def test_company_catalog_is_cached(self, api_client, company, service_types, django_assert_num_queries):
+        params = {'company_id': company.id, 'page_size': 50}
+        with django_assert_num_queries(1):
+            first = api_client.get('/', query_params=params).json()
+        with django_assert_num_queries(0):
+            second = api_client.get('/', query_params=params).json()
+
+        assert first == second
+        assert len(second['results']) == 15
+        assert second['results'][0]['duration_formatted'] == '00:30:00'
+
+    def test_get_service_type(self, api_client, service_types, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            api_client.get(f'/{service_types[0].id}')
+        with django_assert_num_queries(0):
+            response = api_client.get(f'/{service_types[0].id}')
+
+        assert response.json()['duration_minutes'] == 30
+
+    def test_update_service_type(self, api_client, service_types):
+        response = api_client.put(f'/{service_types[0].id}', json={
+            'name': 'Barba', 'duration_minutes': 90, 'price': '25.00'
+        })
+
+        assert response.status_code == 200
+        assert response.json() == {
+            'id': service_types[0].id, 'name': 'Barba', 'description': None, 'duration_minutes': 90,
+            'duration_formatted': '01:30:00', 'price': '25.00', 'company_id': service_types[0].company_id,
+        }
+
+
+@pytest.mark.django_db
+class TestCatalogCache:
+
+    @pytest.fixture(autouse=True)
+    def reset_stats(self):
+        from servicetype.cache import service_type_cache
+
+        service_type_cache.reset_stats()
+
+    def test_save_and_delete_invalidate(self, api_client, company, service_types):
+        params = {'company_id': company.id, 'page_size': 50}
+        api_client.get('/', query_params=params)
+        api_client.get(f'/{service_types[0].id}')
+
+        service_types[0].name = 'Renomeado'
+        service_types[0].save()
+        service_types[1].delete()
+
+        names = [row['name'] for row in api_client.get('/', query_params=params).json()['results']]
+        assert len(names) == 14
+        assert 'Renomeado' in names
+        assert api_client.get(f'/{service_types[0].id}').json()['name'] == 'Renomeado'
+
+    def test_moved_service_type_leaves_old_catalog(self, api_client, company, service_types):
+        other = Company.objects.create(user=User.objects.create_user(username='other'), name='Other Company')
+        api_client.get('/', query_params={'company_id': company.id, 'page_size': 50})
+
+        moved = ServiceType.objects.get(id=service_types[0].id)
+        moved.company = other
+        moved.save()
+
+        ids = [row['id'] for row in api_client.get('/', query_params={
+            'company_id': company.id, 'page_size': 50
+        }).json()['results']]
+        assert moved.id not in ids
+        assert len(ids) == 14
+
+    def test_company_change_invalidates(self, api_client, company, service_types, django_assert_num_queries):
+        api_client.get(f'/{service_types[0].id}')
+        company.save()
+
+        with django_assert_num_queries(1):
+            api_client.get(f'/{service_types[0].id}')
+
+    def test_stats_endpoint(self, api_client, company, service_types):
+        params = {'company_id': company.id}
+        api_client.get('/', query_params=params)
+        api_client.get('/', query_params=params)
+
+        assert api_client.get('/cache-stats').json() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
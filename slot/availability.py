@@ -0,0 +1,168 @@
+import heapq
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterable, List, Union
+
+from django.core.exceptions import ValidationError
+from django.db.models import DurationField, ExpressionWrapper, F, Q
+
+from core import sharding
+from slot.intervals import as_aware
+from slot.models import Slot
+from slot.templates import expand_templates
+
+# Maior janela de /slots/next-available: os templates são expandidos dia a
+# dia até o fim dela quando não há slots livres
+MAX_HORIZON_DAYS = 366
+
+
+def _start(slot: Union[Slot, dict]) -> datetime:
+    return slot['start_time'] if isinstance(slot, dict) else slot.start_time
+
+
+def company_free_slots(company_id: int, min_duration: timedelta, after: datetime, until: datetime, limit: int):
+    """
+    Os primeiros `limit` slots livres de uma empresa, concretos e virtuais,
+    em ordem de início. A parte concreta é uma consulta pelo índice
+    (company, is_available, start_time) que para no LIMIT.
+    """
+    concrete = Slot.objects.filter(
+        company_id=company_id,
+        is_available=True,
+        start_time__gte=after,
+        start_time__lt=until
+    ).annotate(
+        length=ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())
+    ).filter(
+        length__gte=min_duration
+    ).order_by('start_time', 'id')[:limit]
+
+    virtual = (
+        occurrence for occurrence in expand_templates(company_id, after, until)
+        if occurrence['end_time'] - occurrence['start_time'] >= min_duration
+    )
+
+    return islice(heapq.merge(concrete, virtual, key=_start), limit)
+
+
+def next_available_slots(company_ids: Iterable[int], min_duration: timedelta, after: datetime,
+                         until: datetime, limit: int) -> List[Union[Slot, dict]]:
+    """Os `limit` slots livres mais cedo entre várias empresas (merge por heap)"""
+    after, until = as_aware(after), as_aware(until)
+    per_company = []
+    for company_id in company_ids:
+        # Lidos já no shard de cada empresa
+        with sharding.for_company(company_id):
+            per_company.append(list(company_free_slots(company_id, min_duration, after, until, limit)))
+    return list(islice(heapq.merge(*per_company, key=_start), limit))
+
+
+class FreeInterval:
+    """Trecho livre contíguo formado por um ou mais slots disponíveis encostados"""
+
+    def __init__(self, start_time: datetime, end_time: datetime, slot_ids: List[int]):
+        self.start_time = start_time
+        self.end_time = end_time
+        self.slot_ids = slot_ids
+
+    def start_times(self, duration: timedelta, step: timedelta) -> Iterable[datetime]:
+        start = self.start_time
+        while start + duration <= self.end_time:
+            yield start
+            start += step
+
+
+def free_intervals(company_id: int, window_start: datetime, window_end: datetime) -> List[FreeInterval]:
+    """
+    Une os slots livres da empresa na janela em intervalos contíguos, numa
+    única varredura ordenada por início (uma consulta).
+    """
+    window_start, window_end = as_aware(window_start), as_aware(window_end)
+    rows = Slot.objects.filter(
+        company_id=company_id,
+        is_available=True,
+        start_time__lt=window_end,
+        end_time__gt=window_start
+    ).order_by('start_time').values_list('id', 'start_time', 'end_time')
+
+    intervals: List[FreeInterval] = []
+    for slot_id, start, end in rows:
+        if intervals and intervals[-1].end_time == start:
+            intervals[-1].end_time = end
+            intervals[-1].slot_ids.append(slot_id)
+        else:
+            intervals.append(FreeInterval(start, end, [slot_id]))
+
+    # Recorta as pontas que saem da janela pedida
+    for interval in intervals:
+        interval.start_time = max(interval.start_time, window_start)
+        interval.end_time = min(interval.end_time, window_end)
+
+    return intervals
+
+
+@sharding.atomic
+def claim_span(company_id: int, start_time: datetime, end_time: datetime) -> List[Slot]:
+    """
+    Reserva [start_time, end_time) sobre slots livres e contíguos da empresa.
+
+    Os slots cobertos são marcados como indisponíveis com um único UPDATE
+    condicional; se algum já tiver sido tomado, nada é alterado. O horário de
+    uma linha existente nunca é reescrito: uma ponta que passa do trecho é
+    trocada por linhas novas (o trecho reservado e a sobra livre), então um
+    slot grosso pode atender um serviço que começa no meio dele. Se a ponta
+    tiver histórico (reservas ou fila apontando para ela), fica como está e
+    é reservada inteira.
+    """
+    start_time, end_time = as_aware(start_time), as_aware(end_time)
+    covering = list(
+        Slot.objects.select_for_update().filter(
+            company_id=company_id,
+            start_time__lt=end_time,
+            end_time__gt=start_time
+        ).order_by('start_time')
+    )
+
+    contiguous = all(a.end_time == b.start_time for a, b in zip(covering, covering[1:]))
+    if (not covering or not contiguous
+            or covering[0].start_time > start_time or covering[-1].end_time < end_time
+            or not all(slot.is_available for slot in covering)):
+        raise ValidationError('O horário solicitado não está disponível.')
+
+    ids = [slot.id for slot in covering]
+    if Slot.objects.filter(id__in=ids, is_available=True).update(is_available=False) != len(ids):
+        raise ValidationError('O horário solicitado não está disponível.')
+
+    for slot in covering:
+        slot.is_available = False
+
+    partial = {slot.id for slot in (covering[0], covering[-1])
+               if slot.start_time < start_time or slot.end_time > end_time}
+    if partial:
+        partial -= set(Slot.objects.filter(id__in=partial).filter(
+            Q(bookings__isnull=False) | Q(spanning_bookings__isnull=False) | Q(waitlist_entries__isnull=False)
+        ).values_list('id', flat=True))
+    if not partial:
+        return covering
+
+    Slot.objects.filter(id__in=partial).delete()
+
+    claimed = []
+    for slot in covering:
+        if slot.id not in partial:
+            claimed.append(slot)
+            continue
+        if slot.start_time < start_time:
+            Slot.objects.create(company_id=company_id, start_time=slot.start_time, end_time=start_time,
+                                is_available=True)
+        claimed.append(Slot.objects.create(
+            company_id=company_id,
+            start_time=max(slot.start_time, start_time),
+            end_time=min(slot.end_time, end_time),
+            is_available=False
+        ))
+        if slot.end_time > end_time:
+            Slot.objects.create(company_id=company_id, start_time=end_time, end_time=slot.end_time,
+                                is_available=True)
+
+    return claimed
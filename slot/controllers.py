@@ -1,94 +1,169 @@
+from ninja import Query
 from ninja_extra import api_controller, route
+from django.core.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from datetime import datetime, timedelta
 from ninja_extra.pagination import PaginatedResponseSchema, PageNumberPaginationExtra, paginate
 from ninja_extra.searching import Searching
 from ninja_extra.searching import searching
-from typing import List
+from typing import List, Optional
 
 from company.models import Company
-from slot.models import Slot
+from core import sharding
+from core.pagination import CursorPaginatedResponseSchema, CursorPagination
+from core.sharding import sharded
+from servicetype.models import ServiceType
+from slot.models import Slot, SlotTemplate, SlotTemplateException
+from slot.availability import MAX_HORIZON_DAYS, free_intervals, next_available_slots
+from slot.generation import generate_slots
+from slot.intervals import as_aware, slot_index
+from slot.templates import WithTemplates, expand_templates
 from slot.schema import (
-    SlotIn, SlotOut, SlotFilter
+    SlotIn, SlotOut, SlotFilter, AvailabilityOut,
+    SlotTemplateIn, SlotTemplateOut, SlotTemplateExceptionIn
 )
 
 
 @api_controller('/slots', tags=['Slots'])
 class SlotController:
     
-    @property
-    def slot_filters(self):
-        return SlotFilter
+    def filter_slots(self, filters: SlotFilter):
+        queryset = Slot.objects.all()
+        
+        if filters.company_id:
+            queryset = queryset.filter(company_id=filters.company_id)
+        
+        if filters.start_date:
+            queryset = queryset.filter(start_time__gte=filters.start_date)
+        
+        if filters.end_date:
+            queryset = queryset.filter(end_time__lte=filters.end_date)
+        
+        if filters.only_available:
+            queryset = queryset.filter(is_available=True)
+        
+        return queryset
     
     @route.get('/', response=PaginatedResponseSchema[SlotOut])
     @paginate(PageNumberPaginationExtra)
+    @sharded(company='filters.company_id')
     @searching(Searching)
-    def list_slots(self, search_fields=None, **kwargs):
-        queryset = Slot.objects.all()
+    def list_slots(self, filters: SlotFilter = Query(...)):
+        queryset = self.filter_slots(filters)
         
-        filters = self.slot_filters(**kwargs) if kwargs else None
-        
-        if filters:
-            if filters.company_id:
-                queryset = queryset.filter(company_id=filters.company_id)
-            
-            if filters.start_date:
-                queryset = queryset.filter(start_time__gte=filters.start_date)
-            
-            if filters.end_date:
-                queryset = queryset.filter(end_time__lte=filters.end_date)
-            
-            if filters.only_available:
-                queryset = queryset.filter(is_available=True)
+        # Templates recorrentes só são expandidos numa janela fechada de uma empresa
+        if not (filters.company_id and filters.start_date and filters.end_date):
+            return queryset
         
-        return queryset
+        virtual_slots = list(expand_templates(filters.company_id, filters.start_date, filters.end_date))
+        if not virtual_slots:
+            return queryset
+        
+        return WithTemplates(queryset, virtual_slots)
     
-    @route.post('/', response={201: SlotOut})
-    def create_slot(self, payload: SlotIn, company_id: int):
-        company = get_object_or_404(Company, id=company_id)
+    @route.get('/cursor', response=CursorPaginatedResponseSchema[SlotOut])
+    @paginate(CursorPagination, ordering=('start_time', 'id'))
+    @sharded(company='filters.company_id')
+    def list_slots_by_cursor(self, filters: SlotFilter = Query(...)):
+        """Percorre o calendário por (start_time, id) sem OFFSET; apenas slots concretos"""
+        return self.filter_slots(filters)
+    
+    @route.get('/next-available', response={200: List[SlotOut], 400: dict})
+    def list_next_available(self, service_type_id: Optional[int] = None,
+                            company_ids: List[int] = Query(None),
+                            duration_minutes: int = 0,
+                            horizon_days: int = Query(30, ge=1, le=MAX_HORIZON_DAYS), limit: int = 10,
+                            after: Optional[datetime] = None):
+        """Os primeiros slots livres que comportam o serviço, numa ou em várias empresas"""
+        min_duration = timedelta(minutes=duration_minutes)
+        
+        if service_type_id:
+            with sharding.for_id(service_type_id):
+                service_type = get_object_or_404(ServiceType, id=service_type_id)
+            company_ids = [service_type.company_id]
+            min_duration = max(min_duration, service_type.duration)
+        
+        if not company_ids:
+            return 400, {"detail": "Informe service_type_id ou company_ids"}
+        
+        if not 0 < limit <= 100:
+            return 400, {"detail": "limit deve estar entre 1 e 100"}
         
-        # Verificar sobreposição de slots
-        overlapping_slots = Slot.objects.filter(
-            company=company,
-            start_time__lt=payload.end_time,
-            end_time__gt=payload.start_time
+        after = after or timezone.now()
+        return 200, next_available_slots(
+            company_ids,
+            min_duration=min_duration,
+            after=after,
+            until=as_aware(after) + timedelta(days=horizon_days),
+            limit=limit
         )
+    
+    @route.get('/availability', response={200: AvailabilityOut, 400: dict})
+    @sharded(company='company_id')
+    def get_availability(self, company_id: int, start_date: datetime, end_date: datetime,
+                         service_type_id: Optional[int] = None, duration_minutes: int = 0,
+                         step_minutes: int = 15):
+        """Intervalos livres contíguos da empresa e os inícios possíveis para o serviço"""
+        duration = timedelta(minutes=duration_minutes)
+        
+        if service_type_id:
+            service_type = get_object_or_404(ServiceType, id=service_type_id, company_id=company_id)
+            duration = service_type.duration
+        
+        if duration <= timedelta(0) or step_minutes <= 0:
+            return 400, {"detail": "Informe service_type_id ou duration_minutes e um step_minutes positivo"}
+        
+        intervals = free_intervals(company_id, start_date, end_date)
+        start_times = [
+            start
+            for interval in intervals
+            for start in interval.start_times(duration, timedelta(minutes=step_minutes))
+        ]
+        return 200, {"intervals": intervals, "start_times": start_times}
+    
+    @route.post('/', response={201: SlotOut, 400: dict})
+    @sharded(company='company_id')
+    def create_slot(self, payload: SlotIn, company_id: int):
+        company = get_object_or_404(Company.objects.active(), id=company_id)
         
-        if overlapping_slots.exists():
+        # Verificar sobreposição de slots: o índice em memória recusa cedo,
+        # sem ir ao banco; a verificação que vale é a do próprio INSERT
+        if slot_index.overlaps(company.id, payload.start_time, payload.end_time):
             return 400, {"detail": "Este slot se sobrepõe a outro slot existente"}
         
-        slot = Slot.objects.create(
-            company=company,
-            start_time=payload.start_time,
-            end_time=payload.end_time,
-            is_available=True
-        )
+        if payload.end_time <= payload.start_time:
+            return 400, {"detail": "O horário de término deve ser posterior ao de início"}
+        
+        slot = Slot.objects.create_if_free(company.id, payload.start_time, payload.end_time)
+        if slot is None:
+            return 400, {"detail": "Este slot se sobrepõe a outro slot existente"}
+        slot.company = company
         return 201, slot
     
     @route.get('/{slot_id}', response=SlotOut)
+    @sharded(pk='slot_id')
     def get_slot(self, slot_id: int):
         return get_object_or_404(Slot, id=slot_id)
     
-    @route.put('/{slot_id}', response=SlotOut)
+    @route.put('/{slot_id}', response={200: SlotOut, 400: dict})
+    @sharded(pk='slot_id')
     def update_slot(self, slot_id: int, payload: SlotIn):
         slot = get_object_or_404(Slot, id=slot_id)
         
         # Verificar sobreposição de slots (excluindo o próprio slot)
-        overlapping_slots = Slot.objects.filter(
-            company=slot.company,
-            start_time__lt=payload.end_time,
-            end_time__gt=payload.start_time
-        ).exclude(id=slot_id)
-        
-        if overlapping_slots.exists():
+        if slot_index.overlaps(slot.company_id, payload.start_time, payload.end_time, exclude_id=slot_id):
             return 400, {"detail": "Este slot se sobrepõe a outro slot existente"}
         
-        slot.start_time = payload.start_time
-        slot.end_time = payload.end_time
-        slot.save()
+        if payload.end_time <= payload.start_time:
+            return 400, {"detail": "O horário de término deve ser posterior ao de início"}
+        
+        if not Slot.objects.move_if_free(slot, payload.start_time, payload.end_time):
+            return 400, {"detail": "Este slot se sobrepõe a outro slot existente"}
         return slot
     
     @route.delete('/{slot_id}', response={204: None})
+    @sharded(pk='slot_id')
     def delete_slot(self, slot_id: int):
         slot = get_object_or_404(Slot, id=slot_id)
         
@@ -100,45 +175,68 @@ class SlotController:
         return 204, None
     
     @route.post('/bulk-create', response={201: List[SlotOut]})
+    @sharded(company='company_id')
     def bulk_create_slots(self, company_id: int, start_date: datetime, end_date: datetime, 
                           duration_minutes: int = 60, start_hour: int = 8, end_hour: int = 18,
                           days_of_week: List[int] = [0, 1, 2, 3, 4, 5, 6]):  # 0=Segunda, 6=Domingo
         """Criar múltiplos slots para uma empresa com intervalo regular"""
-        company = get_object_or_404(Company, id=company_id)
-        created_slots = []
-        
-        current_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_date = end_date.replace(hour=23, minute=59, second=59)
-        
-        while current_date <= end_date:
-            # Verificar se o dia da semana está incluído
-            if current_date.weekday() in days_of_week:
-                # Criar slots para este dia
-                slot_start = current_date.replace(hour=start_hour, minute=0)
-                
-                while slot_start.hour < end_hour:
-                    slot_end = slot_start + timedelta(minutes=duration_minutes)
-                    
-                    # Verificar sobreposição
-                    overlapping = Slot.objects.filter(
-                        company=company,
-                        start_time__lt=slot_end,
-                        end_time__gt=slot_start
-                    ).exists()
-                    
-                    if not overlapping:
-                        slot = Slot.objects.create(
-                            company=company,
-                            start_time=slot_start,
-                            end_time=slot_end,
-                            is_available=True
-                        )
-                        created_slots.append(slot)
-                    
-                    # Avançar para o próximo slot
-                    slot_start = slot_end
-            
-            # Avançar para o próximo dia
-            current_date += timedelta(days=1)
-        
-        return 201, created_slots
\ No newline at end of file
+        company = get_object_or_404(Company.objects.active(), id=company_id)
+        created_slots = generate_slots(
+            company,
+            start_date=start_date,
+            end_date=end_date,
+            duration_minutes=duration_minutes,
+            start_hour=start_hour,
+            end_hour=end_hour,
+            days_of_week=days_of_week
+        )
+        return 201, created_slots
+
+
+@api_controller('/slot-templates', tags=['Slot Templates'])
+class SlotTemplateController:
+    
+    @route.get('/', response=List[SlotTemplateOut])
+    @sharded(company='company_id')
+    def list_slot_templates(self, company_id: int):
+        return SlotTemplate.objects.filter(company_id=company_id).prefetch_related('exceptions')
+    
+    @route.post('/', response={201: SlotTemplateOut, 400: dict})
+    @sharded(company='company_id')
+    def create_slot_template(self, payload: SlotTemplateIn, company_id: int):
+        company = get_object_or_404(Company.objects.active(), id=company_id)
+        
+        try:
+            template = SlotTemplate.objects.create(
+                company=company,
+                days_of_week=payload.days_of_week,
+                day_start=payload.day_start,
+                day_end=payload.day_end,
+                duration=timedelta(minutes=payload.duration_minutes),
+                valid_from=payload.valid_from,
+                valid_until=payload.valid_until
+            )
+        except ValidationError as e:
+            return 400, {"detail": e.messages[0]}
+        
+        return 201, template
+    
+    @route.get('/{template_id}', response=SlotTemplateOut)
+    @sharded(pk='template_id')
+    def get_slot_template(self, template_id: int):
+        return get_object_or_404(SlotTemplate, id=template_id)
+    
+    @route.delete('/{template_id}', response={204: None})
+    @sharded(pk='template_id')
+    def delete_slot_template(self, template_id: int):
+        """Remove o template; slots já materializados continuam existindo"""
+        template = get_object_or_404(SlotTemplate, id=template_id)
+        template.delete()
+        return 204, None
+    
+    @route.post('/{template_id}/exceptions', response={201: SlotTemplateOut})
+    @sharded(pk='template_id')
+    def add_slot_template_exception(self, template_id: int, payload: SlotTemplateExceptionIn):
+        template = get_object_or_404(SlotTemplate, id=template_id)
+        SlotTemplateException.objects.get_or_create(template=template, date=payload.date)
+        return 201, template
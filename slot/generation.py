@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+
+
+from company import rollups
+from core import sharding
+from slot.intervals import as_aware, slot_index
+from slot.models import Slot
+
+
+# Quantidade de linhas por INSERT no bulk_create
+BULK_CREATE_BATCH_SIZE = 500
+
+Interval = Tuple[datetime, datetime]
+
+
+def build_slot_grid(start_date: datetime, end_date: datetime, duration_minutes: int,
+                    start_hour: int, end_hour: int, days_of_week: Iterable[int]) -> List[Interval]:
+    """Monta em memória a grade de slots candidatos, ordenada por início"""
+    duration = timedelta(minutes=duration_minutes)
+    weekdays = set(days_of_week)
+    grid = []
+
+    current_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    end_date = end_date.replace(hour=23, minute=59, second=59)
+
+    while current_date <= end_date:
+        if current_date.weekday() in weekdays:
+            slot_start = current_date.replace(hour=start_hour, minute=0)
+
+            # A grade de um dia não atravessa a meia-noite
+            while slot_start.hour < end_hour and slot_start.date() == current_date.date():
+                slot_end = slot_start + duration
+                grid.append((as_aware(slot_start), as_aware(slot_end)))
+                slot_start = slot_end
+
+        current_date += timedelta(days=1)
+
+    return grid
+
+
+def subtract_existing(candidates: List[Interval], existing: List[Interval]) -> List[Interval]:
+    """
+    Remove os candidatos que se sobrepõem a slots existentes (ou a candidatos
+    já aceitos) com uma única varredura sobre as duas listas ordenadas.
+    """
+    survivors = []
+    last_end = None
+    j = 0
+
+    for start, end in candidates:
+        # Slots existentes não se sobrepõem entre si, então os fins também estão ordenados
+        while j < len(existing) and existing[j][1] <= start:
+            j += 1
+
+        if j < len(existing) and existing[j][0] < end:
+            continue
+
+        if last_end is not None and last_end > start:
+            continue
+
+        survivors.append((start, end))
+        last_end = end
+
+    return survivors
+
+
+def generate_slots(company, start_date: datetime, end_date: datetime, duration_minutes: int = 60,
+                   start_hour: int = 8, end_hour: int = 18,
+                   days_of_week: Iterable[int] = (0, 1, 2, 3, 4, 5, 6),
+                   batch_size: int = BULK_CREATE_BATCH_SIZE) -> List[Slot]:
+    """
+    Gera os slots de uma empresa em lote: uma consulta para os slots existentes
+    na janela e INSERTs em blocos, sem validação linha a linha.
+    """
+    candidates = build_slot_grid(start_date, end_date, duration_minutes,
+                                 start_hour, end_hour, days_of_week)
+    if not candidates:
+        return []
+
+    window_start = candidates[0][0]
+    window_end = max(end for _, end in candidates)
+
+    existing = list(
+        Slot.objects.filter(
+            company=company,
+            start_time__lt=window_end,
+            end_time__gt=window_start
+        ).order_by('start_time').values_list('start_time', 'end_time')
+    )
+
+    slots = [
+        Slot(company=company, start_time=start, end_time=end, is_available=True)
+        for start, end in subtract_existing(candidates, existing)
+    ]
+
+    with sharding.atomic():
+        created = Slot.objects.bulk_create(slots, batch_size=batch_size)
+
+    # bulk_create não dispara sinais: o índice da empresa é relido no próximo
+    # acesso e os dias gerados entram no resumo diário
+    slot_index.invalidate(company.id)
+    rollups.touch(company.id, window_start, window_end)
+    return created
@@ -0,0 +1,130 @@
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def as_aware(value: datetime) -> datetime:
+    """Garante datetime com fuso, como o Django faria ao salvar"""
+    if timezone.is_naive(value):
+        return timezone.make_aware(value)
+    return value
+
+
+class CompanySlotIndex:
+    """
+    Intervalos [início, fim) dos slots de uma empresa em listas ordenadas.
+
+    Os slots de uma empresa não se sobrepõem, então ordenar por início também
+    ordena por fim: basta olhar o último slot que começa antes de `end`.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[int, datetime, datetime]] = ()):
+        self._starts = []
+        self._ends = []
+        self._ids = []
+        self._by_id: Dict[int, datetime] = {}
+        self.built_at = time.monotonic()
+
+        for slot_id, start, end in sorted(rows, key=lambda row: row[1]):
+            self._starts.append(start)
+            self._ends.append(end)
+            self._ids.append(slot_id)
+            self._by_id[slot_id] = start
+
+    def __len__(self):
+        return len(self._ids)
+
+    def overlaps(self, start: datetime, end: datetime, exclude_id: Optional[int] = None) -> bool:
+        i = bisect_left(self._starts, end) - 1
+
+        if i >= 0 and self._ids[i] == exclude_id:
+            i -= 1
+
+        return i >= 0 and self._ends[i] > start
+
+    def add(self, slot_id: int, start: datetime, end: datetime):
+        self.remove(slot_id)
+        i = bisect_left(self._starts, start)
+        self._starts.insert(i, start)
+        self._ends.insert(i, end)
+        self._ids.insert(i, slot_id)
+        self._by_id[slot_id] = start
+
+    def remove(self, slot_id: int):
+        start = self._by_id.pop(slot_id, None)
+        if start is None:
+            return
+
+        i = bisect_left(self._starts, start)
+        while self._ids[i] != slot_id:
+            i += 1
+
+        del self._starts[i]
+        del self._ends[i]
+        del self._ids[i]
+
+
+class SlotIntervalRegistry:
+    """
+    Índices de intervalos por empresa, mantidos em memória no processo.
+
+    Cada índice é montado com uma única consulta na primeira verificação
+    da empresa, atualizado pelos sinais de `Slot` quando a transação é
+    confirmada e remontado depois de `SLOT_INDEX_TTL` segundos, o que limita
+    a defasagem em relação a escritas feitas por outros processos. Por isso
+    serve só para recusar cedo: a verificação que vale é a do banco
+    (Slot.objects.overlaps), na transação da escrita.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[int, CompanySlotIndex] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'SLOT_INDEX_TTL', 60)
+
+    def _build(self, company_id: int) -> CompanySlotIndex:
+        from slot.models import Slot
+
+        rows = Slot.objects.filter(company_id=company_id).values_list('id', 'start_time', 'end_time')
+        return CompanySlotIndex(rows)
+
+    def get(self, company_id: int) -> CompanySlotIndex:
+        with self._lock:
+            index = self._indexes.get(company_id)
+            if index is None or time.monotonic() - index.built_at > self.ttl:
+                index = self._indexes[company_id] = self._build(company_id)
+            return index
+
+    def overlaps(self, company_id: int, start: datetime, end: datetime, exclude_id: Optional[int] = None) -> bool:
+        with self._lock:
+            return self.get(company_id).overlaps(as_aware(start), as_aware(end), exclude_id=exclude_id)
+
+    def slot_saved(self, company_id: int, slot_id: int, start: datetime, end: datetime):
+        with self._lock:
+            index = self._indexes.get(company_id)
+            if index is not None:
+                index.add(slot_id, as_aware(start), as_aware(end))
+
+    def slot_deleted(self, company_id: int, slot_id: int):
+        with self._lock:
+            index = self._indexes.get(company_id)
+            if index is not None:
+                index.remove(slot_id)
+
+    def invalidate(self, company_id: Optional[int] = None):
+        """Descarta o índice da empresa (ou todos); o próximo acesso relê do banco"""
+        with self._lock:
+            if company_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(company_id, None)
+
+
+slot_index = SlotIntervalRegistry()
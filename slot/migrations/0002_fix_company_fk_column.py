@@ -0,0 +1,30 @@
+# Generated manually
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """
+    A coluna company_id foi criada como char(32) quando Company.id era UUID
+    e não acompanhou a volta para BigAutoField. Alterar db_constraint força a
+    reconstrução da tabela com o tipo atual da chave; o estado final é o mesmo.
+    """
+
+    dependencies = [
+        ('company', '0003_auto_revert_to_default_id'),
+        ('slot', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='slot',
+            name='company',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='company.company'),
+        ),
+        migrations.AlterField(
+            model_name='slot',
+            name='company',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='company.company'),
+        ),
+    ]
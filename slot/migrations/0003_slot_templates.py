@@ -0,0 +1,46 @@
+# Generated by Django 4.2.10 on 2026-10-18 08:24
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0003_auto_revert_to_default_id'),
+        ('slot', '0002_fix_company_fk_column'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('days_of_week', models.JSONField(default=list)),
+                ('day_start', models.TimeField()),
+                ('day_end', models.TimeField()),
+                ('duration', models.DurationField(default=datetime.timedelta(seconds=3600))),
+                ('valid_from', models.DateField()),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_templates', to='company.company')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SlotTemplateException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='slot.slottemplate')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='slottemplateexception',
+            constraint=models.UniqueConstraint(fields=('template', 'date'), name='unique_template_exception_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='slottemplate',
+            constraint=models.CheckConstraint(check=models.Q(('day_end__gt', models.F('day_start'))), name='check_template_day_end_after_day_start'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.10 on 2026-10-18 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('slot', '0003_slot_templates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='slot',
+            index=models.Index(fields=['company', 'is_available', 'start_time'], name='slot_company_avail_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='slot',
+            index=models.Index(fields=['company', 'start_time'], name='slot_company_start_idx'),
+        ),
+    ]
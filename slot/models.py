@@ -1,6 +1,103 @@
-from django.db import models
+from django.db import connections, models, router
+from django.db.models import OuterRef, Q, Subquery
+from django.db.models.signals import post_save
 from django.core.exceptions import ValidationError
+from datetime import timedelta
 from company.models import Company
+from slot.intervals import as_aware
+
+
+class SlotQuerySet(models.QuerySet):
+    
+    def claim(self, slot_id, **conditions):
+        """
+        Marca o slot como indisponível num único UPDATE condicional.
+        Retorna False se o slot não existir, já estiver ocupado ou não
+        atender às condições extras.
+        """
+        return self.filter(id=slot_id, is_available=True, **conditions).update(is_available=False) == 1
+    
+    def overlaps(self, company_id, start, end, exclude_id=None) -> bool:
+        """
+        Verificação de sobreposição no banco, para rodar na transação da
+        escrita. Os slots de uma empresa não se sobrepõem, então basta ler o
+        último que começa antes de `end`: uma busca pelo índice (company, start_time).
+        """
+        previous = self.filter(company_id=company_id, start_time__lt=as_aware(end))
+        if exclude_id is not None:
+            previous = previous.exclude(id=exclude_id)
+        end_time = previous.order_by('-start_time').values_list('end_time', flat=True).first()
+        return end_time is not None and end_time > as_aware(start)
+    
+    def create_if_free(self, company_id, start, end, is_available=True):
+        """
+        INSERT condicionado a não haver sobreposição (INSERT ... SELECT ...
+        WHERE NOT EXISTS, com a mesma busca de `overlaps`): a verificação e a
+        escrita são um único comando. Retorna o slot criado ou None.
+        """
+        slot = self.model(company_id=company_id, start_time=as_aware(start), end_time=as_aware(end),
+                          is_available=is_available)
+        db = self._db or router.db_for_write(self.model, **self._hints)
+        connection = connections[db]
+        opts = self.model._meta
+        fields = [opts.get_field(name) for name in ('company', 'start_time', 'end_time', 'is_available')]
+        end_field = opts.get_field('end_time')
+
+        previous = self.model._base_manager.using(db).filter(
+            company_id=company_id, start_time__lt=slot.end_time
+        ).order_by('-start_time').values('end_time')[:1]
+        previous_sql, previous_params = previous.query.get_compiler(using=db).as_sql()
+
+        sql = 'INSERT INTO {table} ({columns}) SELECT {values} WHERE NOT EXISTS ' \
+              '(SELECT 1 FROM ({previous}) previous WHERE previous.{end} > %s)'.format(
+                  table=connection.ops.quote_name(opts.db_table),
+                  columns=', '.join(connection.ops.quote_name(field.column) for field in fields),
+                  values=', '.join(['%s'] * len(fields)),
+                  previous=previous_sql,
+                  end=connection.ops.quote_name(end_field.column),
+              )
+        params = [field.get_db_prep_save(getattr(slot, field.attname), connection) for field in fields]
+        params += [*previous_params, end_field.get_db_prep_value(slot.start_time, connection)]
+        returning = connection.features.can_return_columns_from_insert
+        if returning:
+            sql += ' RETURNING {}'.format(connection.ops.quote_name(opts.pk.column))
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            if not cursor.rowcount and not returning:
+                return None
+            row = cursor.fetchone() if returning else (cursor.lastrowid,)
+        if row is None:
+            return None
+
+        slot.pk = row[0]
+        slot._state.adding = False
+        slot._state.db = db
+        # Índice em memória e resumo diário, como num save()
+        post_save.send(sender=self.model, instance=slot, created=True, update_fields=None, raw=False, using=db)
+        return slot
+    
+    def move_if_free(self, slot, start, end) -> bool:
+        """
+        UPDATE de horário condicionado a não haver sobreposição com outro
+        slot da empresa, num único comando, como `claim`. Retorna False se
+        o novo horário colide (ou o slot não existe mais).
+        """
+        start, end = as_aware(start), as_aware(end)
+        previous_end = Subquery(
+            self.model._base_manager.filter(company_id=OuterRef('company_id'), start_time__lt=end)
+            .exclude(id=OuterRef('id')).order_by('-start_time').values('end_time')[:1]
+        )
+        moved = self.filter(id=slot.pk).annotate(previous_end=previous_end).filter(
+            Q(previous_end__isnull=True) | Q(previous_end__lte=start)
+        ).update(start_time=start, end_time=end)
+        if not moved:
+            return False
+
+        slot.start_time, slot.end_time = start, end
+        post_save.send(sender=self.model, instance=slot, created=False,
+                       update_fields=frozenset({'start_time', 'end_time'}), raw=False, using=slot._state.db)
+        return True
 
 
 class Slot(models.Model):
@@ -10,8 +107,16 @@ class Slot(models.Model):
     end_time = models.DateTimeField()
     is_available = models.BooleanField(default=True)
     
+    objects = SlotQuerySet.as_manager()
+    
     class Meta:
         ordering = ['start_time']
+        indexes = [
+            # Listagens e buscas de disponibilidade: empresa + disponível + janela de tempo
+            models.Index(fields=['company', 'is_available', 'start_time'], name='slot_company_avail_start_idx'),
+            # Calendário completo da empresa e paginação por (start_time, id)
+            models.Index(fields=['company', 'start_time'], name='slot_company_start_idx'),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=models.Q(end_time__gt=models.F('start_time')),
@@ -19,15 +124,19 @@ class Slot(models.Model):
             )
         ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Início lido do banco: se o slot mudar de dia, o resumo do dia antigo
+        # também é recalculado (slot.signals)
+        instance.loaded_start_time = instance.__dict__.get('start_time')
+        return instance
+    
     def clean(self):
-        # Verificar se há sobreposição de slots para a mesma empresa
-        overlapping_slots = Slot.objects.filter(
-            company=self.company,
-            start_time__lt=self.end_time,
-            end_time__gt=self.start_time
-        ).exclude(pk=self.pk)
-        
-        if overlapping_slots.exists():
+        # Verificar se há sobreposição de slots para a mesma empresa. No banco,
+        # e não no índice em memória: outro processo pode ter gravado um slot
+        # que o índice deste ainda não conhece
+        if Slot.objects.overlaps(self.company_id, self.start_time, self.end_time, exclude_id=self.pk):
             raise ValidationError('Este slot se sobrepõe a outro slot existente.')
     
     def save(self, *args, **kwargs):
@@ -36,3 +145,55 @@ class Slot(models.Model):
     
     def __str__(self):
         return f"{self.company.name}: {self.start_time.strftime('%d/%m/%Y %H:%M')} - {self.end_time.strftime('%H:%M')}"
+
+
+
+class SlotTemplate(models.Model):
+    """Regra semanal de disponibilidade, expandida em slots virtuais na leitura"""
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='slot_templates')
+    days_of_week = models.JSONField(default=list)  # 0=Segunda, 6=Domingo
+    day_start = models.TimeField()
+    day_end = models.TimeField()
+    duration = models.DurationField(default=timedelta(hours=1))
+    valid_from = models.DateField()
+    valid_until = models.DateField(blank=True, null=True)
+    is_active = models.BooleanField(default=True)
+    
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(day_end__gt=models.F('day_start')),
+                name='check_template_day_end_after_day_start'
+            )
+        ]
+    
+    def clean(self):
+        if self.duration <= timedelta(0):
+            raise ValidationError('A duração do slot deve ser positiva.')
+        
+        if any(day not in range(7) for day in self.days_of_week):
+            raise ValidationError('Dias da semana devem estar entre 0 (segunda) e 6 (domingo).')
+        
+        if self.valid_until and self.valid_until < self.valid_from:
+            raise ValidationError('A data final deve ser posterior à data inicial.')
+    
+    def save(self, *args, **kwargs):
+        self.clean()
+        super().save(*args, **kwargs)
+    
+    def __str__(self):
+        return f"{self.company.name}: {self.day_start.strftime('%H:%M')} - {self.day_end.strftime('%H:%M')}"
+
+
+class SlotTemplateException(models.Model):
+    """Data em que o template não gera slots (feriado, folga, etc.)"""
+    template = models.ForeignKey(SlotTemplate, on_delete=models.CASCADE, related_name='exceptions')
+    date = models.DateField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['template', 'date'], name='unique_template_exception_date')
+        ]
+    
+    def __str__(self):
+        return f"{self.template} - {self.date.strftime('%d/%m/%Y')}"
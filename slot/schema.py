@@ -1,6 +1,6 @@
 from ninja import Schema
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime, time
+from typing import List, Optional
 
 
 class SlotIn(Schema):
@@ -9,15 +9,63 @@ class SlotIn(Schema):
     
 
 class SlotOut(Schema):
-    id: int
+    id: Optional[int]  # None para slots virtuais de um template
     start_time: datetime
     end_time: datetime
     is_available: bool
     company_id: int
+    template_id: Optional[int] = None
 
 
 class SlotFilter(Schema):
-    company_id: int
+    company_id: Optional[int] = None
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
-    only_available: bool = True
\ No newline at end of file
+    only_available: bool = True
+
+
+class FreeIntervalOut(Schema):
+    start_time: datetime
+    end_time: datetime
+
+
+class AvailabilityOut(Schema):
+    intervals: List[FreeIntervalOut]
+    start_times: List[datetime]
+
+
+class SlotTemplateIn(Schema):
+    days_of_week: List[int]  # 0=Segunda, 6=Domingo
+    day_start: time
+    day_end: time
+    duration_minutes: int
+    valid_from: date
+    valid_until: Optional[date] = None
+
+
+class SlotTemplateOut(Schema):
+    id: int
+    company_id: int
+    days_of_week: List[int]
+    day_start: time
+    day_end: time
+    duration_minutes: int
+    valid_from: date
+    valid_until: Optional[date]
+    is_active: bool
+    exception_dates: List[date]
+    
+    @staticmethod
+    def resolve_duration_minutes(obj):
+        duration = obj['duration'] if isinstance(obj, dict) else obj.duration
+        return int(duration.total_seconds() / 60)
+    
+    @staticmethod
+    def resolve_exception_dates(obj):
+        if isinstance(obj, dict):
+            return obj.get('exception_dates', [])
+        return [exception.date for exception in obj.exceptions.all()]
+
+
+class SlotTemplateExceptionIn(Schema):
+    date: date
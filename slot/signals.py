@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from company import rollups
+from core import sharding
+from slot.intervals import slot_index
+from slot.models import Slot
+
+
+@receiver(post_save, sender=Slot)
+def index_saved_slot(sender, instance, **kwargs):
+    # Só depois do commit: um slot desfeito junto com a transação (reserva
+    # recusada, lote atômico com erro) não pode ficar no índice
+    company_id, slot_id = instance.company_id, instance.pk
+    start, end = instance.start_time, instance.end_time
+    sharding.on_commit(lambda: slot_index.slot_saved(company_id, slot_id, start, end))
+    rollups.touch(instance.company_id, instance.start_time)
+
+    previous = getattr(instance, 'loaded_start_time', None)
+    if previous is not None and previous != instance.start_time:
+        # Slot movido: o dia de onde ele saiu deixa de contá-lo
+        rollups.touch(instance.company_id, previous)
+    instance.loaded_start_time = instance.start_time
+
+
+@receiver(post_delete, sender=Slot)
+def unindex_deleted_slot(sender, instance, **kwargs):
+    company_id, slot_id = instance.company_id, instance.pk
+    sharding.on_commit(lambda: slot_index.slot_deleted(company_id, slot_id))
+    rollups.touch(instance.company_id, instance.start_time)
@@ -0,0 +1,225 @@
+import heapq
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Iterator, List, Optional
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from slot.generation import subtract_existing
+from slot.intervals import as_aware
+from slot.models import Slot, SlotTemplate
+
+# Trecho de ocorrências confrontado de uma vez com os slots concretos
+EXPANSION_CHUNK = timedelta(days=7)
+
+
+def active_templates(company_id: int, window_start: datetime, window_end: datetime) -> List[SlotTemplate]:
+    """Templates da empresa que podem gerar slots na janela (uma consulta + exceções)"""
+    return list(
+        SlotTemplate.objects.filter(
+            company_id=company_id,
+            is_active=True,
+            valid_from__lte=window_end.date()
+        ).filter(
+            Q(valid_until__isnull=True) | Q(valid_until__gte=window_start.date())
+        ).order_by('id').prefetch_related('exceptions')
+    )
+
+
+def _runs_on(template: SlotTemplate, day: date, exception_dates) -> bool:
+    if day.weekday() not in template.days_of_week or day in exception_dates:
+        return False
+    if day < template.valid_from:
+        return False
+    return template.valid_until is None or day <= template.valid_until
+
+
+def expand_template(template: SlotTemplate, window_start: datetime, window_end: datetime) -> Iterator[dict]:
+    """Gera, em ordem, os slots virtuais do template contidos na janela"""
+    window_start = timezone.localtime(as_aware(window_start))
+    window_end = timezone.localtime(as_aware(window_end))
+    exception_dates = {exception.date for exception in template.exceptions.all()}
+
+    day = window_start.date()
+    while day <= window_end.date():
+        if _runs_on(template, day, exception_dates):
+            slot_start = timezone.make_aware(datetime.combine(day, template.day_start))
+            day_end = timezone.make_aware(datetime.combine(day, template.day_end))
+
+            while slot_start + template.duration <= day_end:
+                slot_end = slot_start + template.duration
+                if slot_start >= window_start and slot_end <= window_end:
+                    yield {
+                        'id': None,
+                        'start_time': slot_start,
+                        'end_time': slot_end,
+                        'is_available': True,
+                        'company_id': template.company_id,
+                        'template_id': template.id,
+                    }
+                slot_start = slot_end
+
+        day += timedelta(days=1)
+
+
+def _without_overlaps(occurrences: Iterator[dict]) -> Iterator[dict]:
+    """Ocorrências em ordem de início, sem as que colidem com uma já aceita"""
+    last_end = None
+    for occurrence in occurrences:
+        if last_end is None or occurrence['start_time'] >= last_end:
+            last_end = occurrence['end_time']
+            yield occurrence
+
+
+def _chunks(occurrences: Iterator[dict], span: timedelta) -> Iterator[List[dict]]:
+    """Agrupa as ocorrências ordenadas em blocos de no máximo `span` a partir do primeiro início"""
+    chunk: List[dict] = []
+    for occurrence in occurrences:
+        if chunk and occurrence['start_time'] >= chunk[0]['start_time'] + span:
+            yield chunk
+            chunk = []
+        chunk.append(occurrence)
+    if chunk:
+        yield chunk
+
+
+def expand_templates(company_id: int, window_start: datetime, window_end: datetime,
+                     templates: Optional[List[SlotTemplate]] = None) -> Iterator[dict]:
+    """
+    Expande os templates da empresa na janela, descartando ocorrências que
+    colidem com slots concretos (materializados ou criados manualmente) ou
+    com a de outro template: entre templates sobrepostos, vale a ocorrência
+    que começa antes (no empate, a do template mais antigo).
+
+    A expansão é preguiçosa: as ocorrências são confrontadas com os slots
+    concretos uma semana por vez, então quem para de consumir (um LIMIT)
+    não expande nem consulta o resto da janela.
+    """
+    if templates is None:
+        templates = active_templates(company_id, window_start, window_end)
+    if not templates:
+        return
+
+    occurrences = _without_overlaps(heapq.merge(
+        *(expand_template(template, window_start, window_end) for template in templates),
+        key=lambda occurrence: occurrence['start_time']
+    ))
+
+    for chunk in _chunks(occurrences, EXPANSION_CHUNK):
+        existing = list(
+            Slot.objects.filter(
+                company_id=company_id,
+                start_time__lt=chunk[-1]['end_time'],
+                end_time__gt=chunk[0]['start_time']
+            ).order_by('start_time').values_list('start_time', 'end_time')
+        )
+
+        free = set(subtract_existing(
+            [(occurrence['start_time'], occurrence['end_time']) for occurrence in chunk],
+            existing
+        ))
+        for occurrence in chunk:
+            if (occurrence['start_time'], occurrence['end_time']) in free:
+                yield occurrence
+
+
+class WithTemplates:
+    """
+    Slots concretos da consulta intercalados por início com as ocorrências de
+    templates da janela, vistos como um queryset pela paginação: a contagem
+    soma as duas partes e uma fatia [a:b] acha quantas ocorrências vêm antes
+    da posição `a` (busca binária com COUNTs pelo índice de início) e lê só
+    a página de cada lado.
+    """
+    ordered = True
+
+    def __init__(self, queryset: QuerySet, occurrences: List[dict]):
+        self.queryset = queryset.order_by('start_time', 'id')
+        self.occurrences = occurrences
+
+    def using(self, alias: str) -> 'WithTemplates':
+        return WithTemplates(self.queryset.using(alias), self.occurrences)
+
+    def all(self) -> 'WithTemplates':
+        return self
+
+    def count(self) -> int:
+        return self.queryset.count() + len(self.occurrences)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def _occurrences_before(self, position: int) -> int:
+        """Quantas ocorrências estão entre as `position` primeiras linhas"""
+        low, high = 0, min(position, len(self.occurrences))
+        while low < high:
+            middle = (low + high) // 2
+            # No empate o slot concreto vem antes, como no heapq.merge abaixo
+            start = self.occurrences[middle]['start_time']
+            if middle + self.queryset.filter(start_time__lte=start).count() < position:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _merge(self, concrete, occurrences):
+        return heapq.merge(
+            concrete, occurrences,
+            key=lambda slot: slot['start_time'] if isinstance(slot, dict) else slot.start_time
+        )
+
+    def __iter__(self):
+        return self._merge(self.queryset, self.occurrences)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        if stop <= start:
+            return []
+
+        virtual = self._occurrences_before(start)
+        concrete = start - virtual
+        size = stop - start
+        return list(islice(self._merge(
+            self.queryset[concrete:concrete + size],
+            self.occurrences[virtual:virtual + size]
+        ), size))
+
+
+def is_occurrence(template: SlotTemplate, start_time: datetime) -> bool:
+    """Verifica se `start_time` é o início de um slot gerado pelo template"""
+    local_start = timezone.localtime(as_aware(start_time))
+    day = local_start.date()
+    exception_dates = set(template.exceptions.values_list('date', flat=True))
+
+    if not template.is_active or not _runs_on(template, day, exception_dates):
+        return False
+
+    day_start = timezone.make_aware(datetime.combine(day, template.day_start))
+    day_end = timezone.make_aware(datetime.combine(day, template.day_end))
+    offset = local_start - day_start
+
+    return (
+        offset >= timedelta(0)
+        and offset % template.duration == timedelta(0)
+        and local_start + template.duration <= day_end
+    )
+
+
+def materialize_slot(template: SlotTemplate, start_time: datetime) -> Slot:
+    """Cria o slot concreto de uma ocorrência do template, no momento da reserva"""
+    if not is_occurrence(template, start_time):
+        raise ValidationError('O horário não corresponde a um slot do template.')
+
+    # Slot.save() rejeita a ocorrência se ela colidir com um slot concreto
+    start_time = as_aware(start_time)
+    return Slot.objects.create(
+        company_id=template.company_id,
+        start_time=start_time,
+        end_time=start_time + template.duration,
+        is_available=True
+    )
@@ -1,3 +1,396 @@
-from django.test import TestCase
+import pytest
+from datetime import date, datetime, time, timedelta
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from ninja_extra.testing import TestClient
 
-# Create your tests here.
+from company.models import Company
+from servicetype.models import ServiceType
+from slot.models import Slot, SlotTemplate, SlotTemplateException
+from slot.controllers import SlotController
+from slot.availability import company_free_slots
+from slot.templates import expand_templates
+from slot.generation import generate_slots, subtract_existing
+from slot.intervals import CompanySlotIndex, slot_index
+
+
+@pytest.fixture
+def company():
+    user = User.objects.create_user(username='testcompany', password='password123')
+    return Company.objects.create(user=user, name='Test Company')
+
+
+def _at(day, hour, minute=0):
+    return timezone.make_aware(datetime(2030, 1, day, hour, minute))
+
+
+def test_subtract_existing_sweep():
+    candidates = [(_at(7, h), _at(7, h + 1)) for h in range(8, 12)]
+    existing = [(_at(7, 9, 30), _at(7, 10, 30))]
+
+    survivors = subtract_existing(candidates, existing)
+
+    assert survivors == [(_at(7, 8), _at(7, 9)), (_at(7, 11), _at(7, 12))]
+
+
+@pytest.mark.django_db
+class TestSlotGeneration:
+
+    def test_generate_slots_skips_existing(self, company):
+        Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 10))
+
+        created = generate_slots(
+            company,
+            start_date=datetime(2030, 1, 7),
+            end_date=datetime(2030, 1, 8),
+            duration_minutes=30,
+            start_hour=8,
+            end_hour=12,
+            days_of_week=[0, 1]
+        )
+
+        # 2 dias x 8 slots de 30 minutos, menos os 2 cobertos pelo slot existente
+        assert len(created) == 14
+        assert Slot.objects.filter(company=company).count() == 15
+        assert all(slot.pk for slot in created)
+
+    def test_generate_slots_query_count_is_constant(self, company, django_assert_max_num_queries):
+        # Um SELECT para os existentes e INSERTs em blocos (o SQLite limita parâmetros por query)
+        with django_assert_max_num_queries(25):
+            created = generate_slots(
+                company,
+                start_date=datetime(2030, 1, 1),
+                end_date=datetime(2030, 3, 31),
+                duration_minutes=15,
+                start_hour=8,
+                end_hour=18
+            )
+
+        assert len(created) == 90 * 40
+
+
+def test_company_slot_index_overlaps():
+    index = CompanySlotIndex([
+        (1, _at(7, 9), _at(7, 10)),
+        (2, _at(7, 11), _at(7, 12)),
+    ])
+
+    assert index.overlaps(_at(7, 9, 30), _at(7, 10, 30))
+    assert index.overlaps(_at(7, 8), _at(7, 13))
+    assert not index.overlaps(_at(7, 10), _at(7, 11))
+    assert not index.overlaps(_at(7, 9), _at(7, 10), exclude_id=1)
+
+    index.remove(1)
+    index.add(3, _at(7, 10), _at(7, 11))
+    assert not index.overlaps(_at(7, 9), _at(7, 10))
+    assert index.overlaps(_at(7, 10, 30), _at(7, 10, 45))
+
+
+@pytest.mark.django_db
+class TestSlotOverlap:
+
+    def test_create_slot_checks_overlap_in_one_indexed_query(self, company, django_assert_num_queries):
+        client = TestClient(SlotController)
+        Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 10))
+        slot_index.get(company.id)
+
+        # Empresa e o INSERT condicionado (a busca do slot anterior vai dentro dele)
+        with django_assert_num_queries(2):
+            response = client.post(f'/?company_id={company.id}', json={
+                'start_time': _at(7, 10).isoformat(),
+                'end_time': _at(7, 11).isoformat(),
+            })
+        assert response.status_code == 201
+
+        response = client.post(f'/?company_id={company.id}', json={
+            'start_time': _at(7, 10, 30).isoformat(),
+            'end_time': _at(7, 11, 30).isoformat(),
+        })
+        assert response.status_code == 400
+        assert "sobrepõe" in response.json()['detail']
+
+    def test_update_slot_rejects_overlap(self, company):
+        client = TestClient(SlotController)
+        Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 10))
+        slot = Slot.objects.create(company=company, start_time=_at(7, 10), end_time=_at(7, 11))
+
+        response = client.put(f'/{slot.id}', json={
+            'start_time': _at(7, 9, 30).isoformat(),
+            'end_time': _at(7, 11).isoformat(),
+        })
+        assert response.status_code == 400
+
+        response = client.put(f'/{slot.id}', json={
+            'start_time': _at(7, 10, 30).isoformat(),
+            'end_time': _at(7, 11, 30).isoformat(),
+        })
+        assert response.status_code == 200
+
+    def test_stale_index_does_not_accept_overlap(self, company):
+        client = TestClient(SlotController)
+        slot_index.get(company.id)
+        # Gravado sem sinais, como por outro processo: o índice não o conhece
+        Slot.objects.bulk_create([Slot(company=company, start_time=_at(7, 9), end_time=_at(7, 10))])
+
+        response = client.post(f'/?company_id={company.id}', json={
+            'start_time': _at(7, 9, 30).isoformat(),
+            'end_time': _at(7, 10, 30).isoformat(),
+        })
+        assert response.status_code == 400
+        assert "sobrepõe" in response.json()['detail']
+
+    def test_stale_index_does_not_accept_overlapping_move(self, company):
+        client = TestClient(SlotController)
+        slot = Slot.objects.create(company=company, start_time=_at(7, 10), end_time=_at(7, 11))
+        slot_index.get(company.id)
+        Slot.objects.bulk_create([Slot(company=company, start_time=_at(7, 8), end_time=_at(7, 9))])
+
+        response = client.put(f'/{slot.id}', json={
+            'start_time': _at(7, 8, 30).isoformat(),
+            'end_time': _at(7, 9, 30).isoformat(),
+        })
+
+        assert response.status_code == 400
+        assert Slot.objects.get(id=slot.id).start_time == _at(7, 10)
+
+    def test_rolled_back_slot_stays_out_of_index(self, company, django_capture_on_commit_callbacks):
+        slot_index.get(company.id)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            with transaction.atomic():
+                Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 10))
+                transaction.set_rollback(True)
+
+        assert not slot_index.overlaps(company.id, _at(7, 9), _at(7, 10))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 10))
+
+        assert slot_index.overlaps(company.id, _at(7, 9), _at(7, 10))
+
+    def test_deleted_slot_leaves_index(self, company):
+        slot = Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 10))
+        slot.delete()
+
+        Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 10))
+        assert Slot.objects.filter(company=company).count() == 1
+
+
+@pytest.fixture
+def template(company):
+    # 07/01/2030 é uma segunda-feira
+    template = SlotTemplate.objects.create(
+        company=company,
+        days_of_week=[0, 1, 2],
+        day_start=time(9),
+        day_end=time(12),
+        duration=timedelta(hours=1),
+        valid_from=date(2030, 1, 1)
+    )
+    SlotTemplateException.objects.create(template=template, date=date(2030, 1, 8))
+    return template
+
+
+@pytest.mark.django_db
+class TestSlotTemplates:
+
+    def test_expand_skips_exceptions_and_concrete_slots(self, company, template):
+        Slot.objects.create(company=company, start_time=_at(7, 10), end_time=_at(7, 11))
+
+        virtual = list(expand_templates(company.id, _at(7, 0), _at(10, 0)))
+
+        # Segunda (sem o das 10h) e quarta; terça é exceção
+        assert [slot['start_time'] for slot in virtual] == [
+            _at(7, 9), _at(7, 11), _at(9, 9), _at(9, 10), _at(9, 11)
+        ]
+        assert all(slot['template_id'] == template.id for slot in virtual)
+
+    def test_overlapping_templates_do_not_duplicate_slots(self, company, template):
+        # Segunda-feira: uma cópia do template e outro das 10h30 às 12h30,
+        # cujas ocorrências colidem com as das 10h e das 11h
+        for day_start, day_end in ((time(9), time(12)), (time(10, 30), time(12, 30))):
+            SlotTemplate.objects.create(company=company, days_of_week=[0], day_start=day_start,
+                                        day_end=day_end, duration=timedelta(hours=1),
+                                        valid_from=date(2030, 1, 1))
+
+        virtual = list(expand_templates(company.id, _at(7, 0), _at(8, 0)))
+
+        assert [(slot['start_time'], slot['end_time']) for slot in virtual] == [
+            (_at(7, 9), _at(7, 10)), (_at(7, 10), _at(7, 11)), (_at(7, 11), _at(7, 12))
+        ]
+        # No empate, a ocorrência do template mais antigo
+        assert all(slot['template_id'] == template.id for slot in virtual)
+
+    def test_free_slots_stop_expanding_at_limit(self, company, template, django_assert_num_queries):
+        # Slots livres concretos, templates (+ exceções) e os slots da primeira semana
+        with django_assert_num_queries(4):
+            found = list(company_free_slots(company.id, timedelta(hours=1), _at(7, 0),
+                                            _at(7, 0) + timedelta(days=366), limit=2))
+
+        assert [slot['start_time'] for slot in found] == [_at(7, 9), _at(7, 10)]
+
+    def test_free_slots_expand_next_week_when_first_is_taken(self, company, template,
+                                                             django_assert_num_queries):
+        for day in (7, 9):
+            Slot.objects.create(company=company, start_time=_at(day, 9), end_time=_at(day, 12),
+                                is_available=False)
+
+        with django_assert_num_queries(5):
+            found = list(company_free_slots(company.id, timedelta(hours=1), _at(7, 0),
+                                            _at(7, 0) + timedelta(days=366), limit=1))
+
+        assert [slot['start_time'] for slot in found] == [_at(14, 9)]
+
+    def test_list_slots_merges_virtual_slots(self, company, template):
+        Slot.objects.create(company=company, start_time=_at(7, 12), end_time=_at(7, 13))
+        client = TestClient(SlotController)
+
+        response = client.get('/', query_params={
+            'company_id': company.id,
+            'start_date': _at(7, 0).isoformat(),
+            'end_date': _at(8, 0).isoformat(),
+        })
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data['count'] == 4
+        assert [slot['id'] is None for slot in data['results']] == [True, True, True, False]
+
+    def test_list_slots_pages_interleave_virtual_slots(self, company, template):
+        concrete = [(7, 8), (7, 12), (8, 10), (9, 8)]
+        for day, hour in concrete:
+            Slot.objects.create(company=company, start_time=_at(day, hour), end_time=_at(day, hour + 1))
+        client = TestClient(SlotController)
+
+        pages = [
+            client.get('/', query_params={
+                'company_id': company.id,
+                'start_date': _at(7, 0).isoformat(),
+                'end_date': _at(10, 0).isoformat(),
+                'page': page,
+                'page_size': 3,
+            }).json()
+            for page in range(1, 5)
+        ]
+
+        assert {page['count'] for page in pages} == {10}
+        assert [
+            (slot['start_time'][8:13], slot['id'] is None)
+            for page in pages for slot in page['results']
+        ] == [
+            ('07T08', False), ('07T09', True), ('07T10', True), ('07T11', True), ('07T12', False),
+            ('08T10', False), ('09T08', False), ('09T09', True), ('09T10', True), ('09T11', True),
+        ]
+
+
+@pytest.mark.django_db
+class TestSlotCursorPagination:
+
+    def test_walks_calendar_forward_and_back(self, company):
+        for hour in range(8, 18):
+            Slot.objects.create(company=company, start_time=_at(7, hour), end_time=_at(7, hour + 1))
+        ids = list(Slot.objects.order_by('start_time').values_list('id', flat=True))
+        client = TestClient(SlotController)
+
+        def page(**params):
+            return client.get('/cursor', query_params={'company_id': company.id, 'page_size': 4, **params}).json()
+
+        first = page()
+        assert first['count'] is None
+        assert first['previous'] is None
+        assert [slot['id'] for slot in first['results']] == ids[:4]
+
+        second = page(cursor=first['next'], include_count=True)
+        assert second['count'] == 10
+        assert [slot['id'] for slot in second['results']] == ids[4:8]
+
+        third = page(cursor=second['next'])
+        assert [slot['id'] for slot in third['results']] == ids[8:]
+        assert third['next'] is None
+
+        back = page(cursor=third['previous'])
+        assert back['results'] == second['results']
+        assert page(cursor=back['previous'])['results'] == first['results']
+
+    def test_invalid_cursor(self, company):
+        client = TestClient(SlotController)
+
+        response = client.get('/cursor', query_params={'company_id': company.id, 'cursor': 'lixo'})
+
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestNextAvailable:
+
+    def test_merges_companies_and_respects_duration(self, company):
+        other_user = User.objects.create_user(username='othercompany', password='password123')
+        other = Company.objects.create(user=other_user, name='Other Company')
+        Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 9, 30))
+        Slot.objects.create(company=company, start_time=_at(7, 11), end_time=_at(7, 12))
+        Slot.objects.create(company=company, start_time=_at(7, 8), end_time=_at(7, 9), is_available=False)
+        Slot.objects.create(company=other, start_time=_at(7, 10), end_time=_at(7, 11))
+        Slot.objects.create(company=other, start_time=_at(8, 10), end_time=_at(8, 11))
+        client = TestClient(SlotController)
+
+        response = client.get('/next-available', query_params={
+            'company_ids': [company.id, other.id],
+            'duration_minutes': 60,
+            'after': _at(7, 0).isoformat(),
+            'limit': 2,
+        })
+
+        assert response.status_code == 200
+        assert [(slot['company_id'], slot['start_time'][11:16]) for slot in response.json()] == [
+            (other.id, '10:00'), (company.id, '11:00')
+        ]
+
+    def test_uses_service_type_duration_and_templates(self, company, template):
+        service_type = ServiceType.objects.create(company=company, name='Corte', duration=timedelta(minutes=45))
+        Slot.objects.create(company=company, start_time=_at(7, 8), end_time=_at(7, 8, 30))
+        client = TestClient(SlotController)
+
+        response = client.get('/next-available', query_params={
+            'service_type_id': service_type.id,
+            'after': _at(7, 0).isoformat(),
+            'limit': 3,
+        })
+
+        assert [slot['template_id'] for slot in response.json()] == [template.id] * 3
+        assert response.json()[0]['start_time'][11:16] == '09:00'
+
+    def test_horizon_is_capped(self, company):
+        client = TestClient(SlotController)
+
+        response = client.get('/next-available', query_params={
+            'company_ids': [company.id], 'horizon_days': 100_000,
+        })
+
+        assert response.status_code == 422
+
+
+@pytest.mark.django_db
+class TestAvailability:
+
+    def test_merges_adjacent_free_slots(self, company):
+        Slot.objects.create(company=company, start_time=_at(7, 9), end_time=_at(7, 10))
+        Slot.objects.create(company=company, start_time=_at(7, 10), end_time=_at(7, 11))
+        Slot.objects.create(company=company, start_time=_at(7, 11), end_time=_at(7, 12), is_available=False)
+        Slot.objects.create(company=company, start_time=_at(7, 14), end_time=_at(7, 16))
+        client = TestClient(SlotController)
+
+        response = client.get('/availability', query_params={
+            'company_id': company.id,
+            'start_date': _at(7, 0).isoformat(),
+            'end_date': _at(8, 0).isoformat(),
+            'duration_minutes': 90,
+            'step_minutes': 30,
+        })
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [(i['start_time'][11:16], i['end_time'][11:16]) for i in data['intervals']] == [
+            ('09:00', '11:00'), ('14:00', '16:00')
+        ]
+        assert [start[11:16] for start in data['start_times']] == ['09:00', '09:30', '14:00', '14:30']
@@ -1,9 +1,18 @@
+from asgiref.sync import sync_to_async
+from typing import List
+from ninja import Query
 from ninja_extra import api_controller, route
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
 from ninja_extra.pagination import PaginatedResponseSchema, PageNumberPaginationExtra, paginate
+from django.core.exceptions import ValidationError
 from django.db import transaction
-from user.schema import UserCreateIn, UserOut
+from user.hashing import PoolSaturated, hashing_pool
+from user.invites import accept_invite, make_invite
+from user import profiles
+from user.schema import UserCreateIn, UserOut, InviteOut, InviteAcceptIn
 from ninja import Schema
 
 class ErrorResponseSchema(Schema):
@@ -17,26 +26,48 @@ class UserController:
     def list_users(self):
         return User.objects.all()
     
-    @route.post('/', response={201: UserOut})
-    @transaction.atomic
+    @route.post('/', response={201: UserOut, 400: dict})
     def create_user(self, payload: UserCreateIn):
         """
         Create a new user with optional company or client profile
         """
-        # Create the user
-        user = User.objects.create_user(
-            username=payload.username,
-            email=payload.email,
-            password=payload.password,
+        return self._create_user(payload, make_password(payload.password))
+    
+    @route.post('/async', response={201: UserOut, 400: dict, 503: dict})
+    async def create_user_async(self, payload: UserCreateIn, response: HttpResponse):
+        """
+        Mesmo cadastro de POST /users/ para servidores ASGI: o hash da senha
+        roda no pool de hashing e o worker atende outras requisições enquanto
+        isso. Com o pool cheio responde 503 com Retry-After.
+        """
+        try:
+            password = await hashing_pool.hash(payload.password)
+        except PoolSaturated:
+            response['Retry-After'] = '1'
+            return 503, {"detail": "Muitos cadastros em andamento; tente novamente"}
+        
+        return await sync_to_async(self._create_user)(payload, password)
+    
+    @transaction.atomic
+    def _create_user(self, payload: UserCreateIn, password: str):
+        """Cria o usuário (e o perfil pedido) com o hash da senha já calculado"""
+        if payload.is_company and not payload.company_name:
+            return 400, {"detail": "Company name is required when is_company=True"}
+        
+        if payload.is_client and not payload.client_name:
+            return 400, {"detail": "Client name is required when is_client=True"}
+        
+        # Create the user (como User.objects.create_user, sem calcular o hash aqui)
+        user = User.objects.create(
+            username=User.normalize_username(payload.username),
+            email=User.objects.normalize_email(payload.email),
+            password=password,
             first_name=payload.first_name or '',
             last_name=payload.last_name or ''
         )
         
         # Create company profile if requested
         if payload.is_company:
-            if not payload.company_name:
-                return 400, {"detail": "Company name is required when is_company=True"}
-            
             from company.models import Company
             Company.objects.create(
                 user=user,
@@ -46,9 +77,6 @@ class UserController:
         
         # Create client profile if requested
         if payload.is_client:
-            if not payload.client_name:
-                return 400, {"detail": "Client name is required when is_client=True"}
-            
             from client.models import Client
             Client.objects.create(
                 user=user,
@@ -58,6 +86,29 @@ class UserController:
         
         return 201, user
     
+    @route.post('/invites/accept', response={200: UserOut, 400: dict})
+    def accept_user_invite(self, payload: InviteAcceptIn):
+        """Define a senha de um usuário criado por importação em lote; o convite vale uma vez"""
+        try:
+            return 200, accept_invite(payload.uid, payload.token, payload.password)
+        except ValidationError as e:
+            return 400, {"detail": e.messages[0]}
+    
+    @route.post('/{user_id}/invite', response={200: InviteOut, 400: dict})
+    def create_invite(self, user_id: int):
+        """Gera um novo convite (ex.: o anterior expirou) para quem ainda não definiu a senha"""
+        user = get_object_or_404(User, id=user_id)
+        if user.has_usable_password():
+            return 400, {"detail": "Este usuário já definiu a senha"}
+        
+        uid, token = make_invite(user)
+        return 200, {"uid": uid, "token": token}
+    
+    @route.get('/profiles', response=List[dict])
+    def get_user_profiles(self, ids: List[int] = Query(..., max_length=200)):
+        """Perfis de vários usuários (?ids=1&ids=2), na ordem pedida; ids inexistentes são ignorados"""
+        return list(profiles.get_profiles(ids).values())
+    
     @route.get('/{user_id}', response=UserOut)
     def get_user(self, user_id: int):
         return get_object_or_404(User, id=user_id)
@@ -92,39 +143,8 @@ class UserController:
     @route.get('/{user_id}/profile', response={200: dict, 400: ErrorResponseSchema, 500: ErrorResponseSchema})
     def get_user_profile(self, user_id: int):
         """Get the user's profile information (company or client)"""
-        user = get_object_or_404(User, id=user_id)
-        result = {
-            "user_id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "is_company": False,
-            "is_client": False,
-            "profile_data": None
-        }
-        
-        # Verificar se o usuário tem perfil de empresa
-        if hasattr(user, 'company'):
-            result["is_company"] = True
-            company = user.company
-            result["profile_data"] = {
-                "company_id": str(company.id),
-                "name": company.name,
-                "description": company.description
-            }
-            return 200, result
-        
-        # Verificar se o usuário tem perfil de cliente
-        if hasattr(user, 'client'):
-            result["is_client"] = True
-            client = user.client
-            result["profile_data"] = {
-                "client_id": client.id,
-                "name": client.name,
-                "phone": client.phone
-            }
-            return 200, result
-        
-        # Se não tem nenhum perfil
-        return 200, result
\ No newline at end of file
+        # Usuário e perfis num único SELECT, guardado em cache até a próxima escrita
+        profile = profiles.get_profile(user_id)
+        if profile is None:
+            raise Http404
+        return 200, profile
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+
+class PoolSaturated(Exception):
+    """Todos os lugares da fila de hashing estão ocupados"""
+
+
+class HashingPool:
+    """
+    Calcula hashes de senha (PBKDF2) num pool de threads limitado, fora do
+    event loop. O hashlib solta o GIL durante o PBKDF2, então as threads
+    usam núcleos diferentes de verdade.
+
+    No máximo PASSWORD_HASHING_MAX_PENDING hashes ficam em andamento ou na
+    fila; acima disso `hash()` recusa na hora com PoolSaturated, para que o
+    endpoint responda 503 em vez de acumular requisições sem limite.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[threading.BoundedSemaphore] = None
+
+    @property
+    def workers(self) -> int:
+        return getattr(settings, 'PASSWORD_HASHING_WORKERS', None) or os.cpu_count() or 1
+
+    @property
+    def max_pending(self) -> int:
+        return getattr(settings, 'PASSWORD_HASHING_MAX_PENDING', None) or self.workers * 4
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hashing')
+                self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    async def hash(self, password: Optional[str]) -> str:
+        """Hash de `password` no formato de make_password, calculado no pool"""
+        if self._executor is None:
+            self._start()
+
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise PoolSaturated()
+
+        try:
+            future = self._executor.submit(make_password, password)
+        except BaseException:
+            slots.release()
+            raise
+        # O lugar fica ocupado até a thread terminar, mesmo que quem esperava
+        # seja cancelado (ex.: o cliente desconectou) antes disso
+        future.add_done_callback(lambda _: slots.release())
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        """Encerra as threads; o próximo hash() monta o pool de novo com as configurações atuais"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            self._executor = None
+            self._slots = None
+
+
+hashing_pool = HashingPool()
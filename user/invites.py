@@ -0,0 +1,33 @@
+from typing import Tuple
+
+from django.contrib.auth.models import User
+from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.exceptions import ValidationError
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+def make_invite(user: User) -> Tuple[str, str]:
+    """
+    Convite (uid, token) para o usuário definir a própria senha. O token é o
+    mesmo da redefinição de senha do Django: vale por PASSWORD_RESET_TIMEOUT
+    e deixa de valer assim que a senha é definida.
+    """
+    return urlsafe_base64_encode(force_bytes(user.pk)), default_token_generator.make_token(user)
+
+
+def accept_invite(uid: str, token: str, password: str) -> User:
+    """Define a senha de quem recebeu o convite; o hash é calculado só aqui, uma vez"""
+    try:
+        user = User.objects.get(pk=urlsafe_base64_decode(uid).decode())
+    except (TypeError, ValueError, OverflowError, User.DoesNotExist):
+        user = None
+
+    if user is None or not default_token_generator.check_token(user, token):
+        raise ValidationError('Convite inválido ou expirado')
+
+    validate_password(password, user)
+    user.set_password(password)
+    user.save(update_fields=['password'])
+    return user
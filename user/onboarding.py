@@ -0,0 +1,129 @@
+import functools
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, models, transaction
+
+from core import sharding
+from user.invites import make_invite
+
+
+def default_username(prefix: str, name: str) -> str:
+    """Mesmo formato dos cadastros individuais (ex.: client_joao_silva)"""
+    return f"{prefix}_{name.lower().replace(' ', '_')}"
+
+
+def bulk_onboard(items: list, profile_model: type, build_profile: Callable[[User, object], models.Model],
+                 prefix: str,
+                 taken_names: Optional[Callable[[Iterable[str]], Tuple[Dict[str, str], Set[str]]]] = None,
+                 chunk_size: Optional[int] = None) -> List[dict]:
+    """
+    Cria usuários e perfis (Client ou Company) em lotes de `chunk_size`, com
+    um bulk_create para os usuários e outro para os perfis em cada lote.
+
+    Os usuários entram com senha inutilizável, sem calcular nenhum hash, e
+    cada um recebe um convite (user.invites) para definir a senha. Itens com
+    nome de usuário já existente ou repetido são recusados; `taken_names`,
+    quando informado, devolve a chave de comparação de cada nome (como o
+    banco a calcula) e quais chaves já estão em uso. Um lote que ainda
+    assim colide no INSERT é refeito item a item, para que só o item em
+    conflito falhe. Retorna o resultado de cada item, na ordem recebida.
+    """
+    chunk_size = chunk_size or getattr(settings, 'BULK_ONBOARDING_CHUNK_SIZE', 1000)
+    results: List[Optional[dict]] = [None] * len(items)
+    seen_usernames: Set[str] = set()
+    seen_names: Set[str] = set()
+
+    for start in range(0, len(items), chunk_size):
+        chunk = range(start, min(start + chunk_size, len(items)))
+        usernames = {index: items[index].username or default_username(prefix, items[index].name) for index in chunk}
+        existing = set(User.objects.filter(username__in=usernames.values()).values_list('username', flat=True))
+        names = {index: items[index].name for index in chunk}
+        used_names = set()
+        if taken_names:
+            keys, used_names = taken_names(set(names.values()))
+            names = {index: keys[name] for index, name in names.items()}
+
+        accepted = []
+        for index in chunk:
+            username, name = usernames[index], names[index]
+            if username in existing:
+                detail = "Nome de usuário já existe"
+            elif username in seen_usernames:
+                detail = "Nome de usuário repetido no lote"
+            elif taken_names and (name in used_names or name in seen_names):
+                detail = "Já existe uma empresa com este nome"
+            else:
+                detail = None
+
+            if detail:
+                results[index] = {'index': index, 'status': 400, 'detail': detail}
+            else:
+                seen_usernames.add(username)
+                seen_names.add(name)
+                accepted.append(index)
+
+        if accepted:
+            _create_chunk(items, accepted, usernames, profile_model, build_profile, results)
+
+    return results
+
+
+def _create_chunk(items: list, accepted: List[int], usernames: Dict[int, str], profile_model: type,
+                  build_profile: Callable, results: List[Optional[dict]]) -> None:
+    try:
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=usernames[index], email=items[index].email or '', password=make_password(None))
+                for index in accepted
+            ])
+            if users[0].pk is None:
+                # Bancos sem RETURNING no INSERT em lote
+                ids = dict(User.objects.filter(username__in=[user.username for user in users])
+                           .values_list('username', 'id'))
+                for user in users:
+                    user.pk = ids[user.username]
+
+            profiles = profile_model.objects.bulk_create([
+                build_profile(user, items[index]) for index, user in zip(accepted, users)
+            ])
+            # bulk_create não dispara os sinais que copiam as linhas para os
+            # shards; a cópia só acontece se o lote for confirmado
+            transaction.on_commit(functools.partial(_replicate, users, profile_model, profiles))
+    except IntegrityError:
+        # Outra requisição criou um dos nomes entre a checagem e o INSERT:
+        # um a um, só o item em conflito falha (e tentar de novo não adianta)
+        if len(accepted) > 1:
+            for index in accepted:
+                _create_chunk(items, [index], usernames, profile_model, build_profile, results)
+            return
+        index = accepted[0]
+        results[index] = {'index': index, 'status': 400, 'detail': "Nome de usuário ou nome já cadastrado"}
+        return
+
+    for index, user, profile in zip(accepted, users, profiles):
+        uid, token = make_invite(user)
+        results[index] = {
+            'index': index,
+            'status': 201,
+            'id': profile.pk,
+            'user_id': user.pk,
+            'username': user.username,
+            'invite_uid': uid,
+            'invite_token': token,
+        }
+
+
+def _replicate(users: List[User], profile_model: type, profiles: list) -> None:
+    sharding.replicate(User, users)
+    sharding.replicate(profile_model, profiles)
+
+
+def onboarding_response(results: List[dict]):
+    """Status e corpo dos endpoints de importação: 400 quando nada foi criado"""
+    created = sum(1 for result in results if result['status'] == 201)
+    if not created:
+        return 400, {'created': 0, 'detail': "Nenhum cadastro foi criado", 'results': results}
+    return 201, {'created': created, 'results': results}
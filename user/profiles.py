@@ -0,0 +1,95 @@
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist
+
+
+def _cache():
+    return caches[getattr(settings, 'USER_PROFILE_CACHE_ALIAS', 'default')]
+
+
+def _key(user_id: int) -> str:
+    return f'user:profile:{user_id}'
+
+
+def _queryset():
+    """Usuário, empresa e cliente num único SELECT (LEFT JOIN nos dois perfis)"""
+    return User.objects.select_related('company', 'client').only(
+        'id', 'username', 'email', 'first_name', 'last_name',
+        'company__id', 'company__name', 'company__description',
+        'client__id', 'client__name', 'client__phone',
+    )
+
+
+def _related(user: User, name: str):
+    # Perfil ausente já vem do JOIN como vazio: o acesso só levanta a exceção, sem consulta
+    try:
+        return getattr(user, name)
+    except ObjectDoesNotExist:
+        return None
+
+
+def build(user: User) -> dict:
+    """Perfil no formato de GET /users/{id}/profile (a empresa tem precedência sobre o cliente)"""
+    result = {
+        "user_id": user.id,
+        "username": user.username,
+        "email": user.email,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "is_company": False,
+        "is_client": False,
+        "profile_data": None
+    }
+
+    company = _related(user, 'company')
+    if company is not None:
+        result["is_company"] = True
+        result["profile_data"] = {
+            "company_id": str(company.id),
+            "name": company.name,
+            "description": company.description
+        }
+        return result
+
+    client = _related(user, 'client')
+    if client is not None:
+        result["is_client"] = True
+        result["profile_data"] = {
+            "client_id": client.id,
+            "name": client.name,
+            "phone": client.phone
+        }
+    return result
+
+
+def get_profiles(user_ids: Iterable[int]) -> Dict[int, dict]:
+    """
+    Perfis por id: os que estão no cache numa leitura só, os demais numa
+    única consulta, que já os guarda. Ids inexistentes ficam de fora.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    cache = _cache()
+    cached = cache.get_many([_key(user_id) for user_id in user_ids])
+    profiles = {profile['user_id']: profile for profile in cached.values()}
+
+    missing = [user_id for user_id in user_ids if user_id not in profiles]
+    if missing:
+        loaded = {user.id: build(user) for user in _queryset().filter(id__in=missing)}
+        cache.set_many(
+            {_key(user_id): profile for user_id, profile in loaded.items()},
+            getattr(settings, 'USER_PROFILE_CACHE_TTL', 60 * 60)
+        )
+        profiles.update(loaded)
+
+    return {user_id: profiles[user_id] for user_id in user_ids if user_id in profiles}
+
+
+def get_profile(user_id: int) -> Optional[dict]:
+    return get_profiles([user_id]).get(user_id)
+
+
+def invalidate(user_id: int) -> None:
+    _cache().delete(_key(user_id))
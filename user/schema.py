@@ -1,5 +1,5 @@
 from ninja import Schema
-from typing import Optional
+from typing import List, Optional
 
 
 class UserCreateIn(Schema):
@@ -19,4 +19,32 @@ class UserOut(Schema):
     username: str
     email: str
     first_name: Optional[str]
-    last_name: Optional[str]
\ No newline at end of file
+    last_name: Optional[str]
+
+class InviteOut(Schema):
+    uid: str
+    token: str
+
+
+class InviteAcceptIn(Schema):
+    uid: str
+    token: str
+    password: str
+
+
+class BulkOnboardItemOut(Schema):
+    index: int
+    status: int
+    id: Optional[int] = None
+    user_id: Optional[int] = None
+    username: Optional[str] = None
+    # Convite para o usuário definir a senha (POST /users/invites/accept)
+    invite_uid: Optional[str] = None
+    invite_token: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class BulkOnboardOut(Schema):
+    created: int
+    detail: Optional[str] = None
+    results: List[BulkOnboardItemOut]
@@ -0,0 +1,34 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from client.models import Client
+from company.models import Company
+from user import profiles
+
+
+def _invalidate(user_id):
+    # De novo após o commit: um leitor concorrente pode ter guardado o perfil
+    # antigo entre a escrita e o fim da transação
+    profiles.invalidate(user_id)
+    transaction.on_commit(lambda: profiles.invalidate(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_profile(sender, instance, **kwargs):
+    _invalidate(instance.id)
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_profile_owner(sender, instance, **kwargs):
+    _invalidate(instance.user_id)
+    # Perfil passado para outro usuário: o antigo dono deixa de tê-lo
+    previous = getattr(instance, 'loaded_user_id', None)
+    if previous is not None and previous != instance.user_id:
+        _invalidate(previous)
+    instance.loaded_user_id = instance.user_id
@@ -1,3 +1,208 @@
-from django.test import TestCase
+import asyncio
+import pytest
+import threading
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from ninja_extra.testing import TestAsyncClient, TestClient
 
-# Create your tests here.
+from client.controllers import ClientController
+from company.controllers import CompanyController
+from user.controllers import UserController
+from user.hashing import PoolSaturated, hashing_pool
+
+
+@pytest.fixture
+def api_client():
+    return TestClient(UserController)
+
+
+@pytest.fixture
+def invite():
+    response = TestClient(ClientController).post('/bulk', json={'items': [{'name': 'Cliente Convidado'}]})
+    return response.json()['results'][0]
+
+
+@pytest.mark.django_db
+class TestInvites:
+
+    def test_accept_sets_password_once(self, api_client, invite):
+        payload = {'uid': invite['invite_uid'], 'token': invite['invite_token'], 'password': 'S3nha-forte-123'}
+
+        response = api_client.post('/invites/accept', json=payload)
+        assert response.status_code == 200
+        assert response.json()['username'] == 'client_cliente_convidado'
+
+        response = api_client.post('/invites/accept', json={**payload, 'password': 'Outra-s3nha-456'})
+        assert response.status_code == 400
+        assert response.json() == {'detail': 'Convite inválido ou expirado'}
+
+    def test_weak_password_is_rejected(self, api_client, invite):
+        response = api_client.post('/invites/accept', json={
+            'uid': invite['invite_uid'], 'token': invite['invite_token'], 'password': '123'
+        })
+
+        assert response.status_code == 400
+
+    def test_reissue_only_while_pending(self, api_client, invite):
+        response = api_client.post(f"/{invite['user_id']}/invite")
+        assert response.status_code == 200
+
+        api_client.post('/invites/accept', json={
+            'uid': response.json()['uid'], 'token': response.json()['token'], 'password': 'S3nha-forte-123'
+        })
+        response = api_client.post(f"/{invite['user_id']}/invite")
+        assert response.status_code == 400
+
+
+@pytest.fixture
+def small_pool(settings):
+    settings.PASSWORD_HASHING_WORKERS = 2
+    settings.PASSWORD_HASHING_MAX_PENDING = 2
+    hashing_pool.shutdown()
+    yield hashing_pool
+    hashing_pool.shutdown()
+
+
+@pytest.mark.django_db
+class TestAsyncSignup:
+
+    def test_creates_user_with_pool_hash(self, small_pool):
+        response = async_to_sync(TestAsyncClient(UserController).post)('/async', json={
+            'username': 'ana', 'email': 'ana@example.com', 'password': 'S3nha-forte-123',
+            'is_client': True, 'client_name': 'Ana',
+        })
+
+        assert response.status_code == 201
+        user = User.objects.get(username='ana')
+        assert user.check_password('S3nha-forte-123')
+        assert user.client.name == 'Ana'
+
+    def test_client_and_company_variants(self, small_pool):
+        client = async_to_sync(TestAsyncClient(ClientController).post)('/async', json={'name': 'Maria'})
+        company = async_to_sync(TestAsyncClient(CompanyController).post)('/async', json={'name': 'Salão Norte'})
+
+        assert client.status_code == 201
+        assert company.status_code == 201
+        assert User.objects.get(username='client_maria').check_password('temporary_password')
+
+    def test_saturated_pool_answers_503(self, small_pool):
+        async def signup():
+            return await TestAsyncClient(UserController).post('/async', json={
+                'username': 'ana', 'email': 'ana@example.com', 'password': 'S3nha-forte-123'
+            })
+
+        small_pool._start()
+        for _ in range(small_pool.max_pending):
+            small_pool._slots.acquire()
+        try:
+            response = async_to_sync(signup)()
+        finally:
+            for _ in range(small_pool.max_pending):
+                small_pool._slots.release()
+
+        assert response.status_code == 503
+        assert response['Retry-After'] == '1'
+        assert not User.objects.exists()
+
+    def test_concurrent_hashes_are_bounded(self, small_pool):
+        async def burst():
+            return await asyncio.gather(*[small_pool.hash('senha') for _ in range(3)], return_exceptions=True)
+
+        results = async_to_sync(burst)()
+
+        assert sum(isinstance(result, PoolSaturated) for result in results) == 1
+        assert all(result.startswith('pbkdf2_sha256$') for result in results if isinstance(result, str))
+
+    def test_cancelled_hash_keeps_its_slot_until_the_thread_ends(self, small_pool, settings, monkeypatch):
+        settings.PASSWORD_HASHING_MAX_PENDING = 1
+        release = threading.Event()
+        monkeypatch.setattr('user.hashing.make_password', lambda password: release.wait(5) and 'hash')
+
+        async def cancel_then_retry():
+            task = asyncio.create_task(small_pool.hash('senha'))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # A thread ainda está calculando o hash cancelado
+            with pytest.raises(PoolSaturated):
+                await small_pool.hash('senha')
+
+            release.set()
+            for _ in range(100):
+                try:
+                    return await small_pool.hash('senha')
+                except PoolSaturated:
+                    await asyncio.sleep(0.01)
+
+        assert async_to_sync(cancel_then_retry)() == 'hash'
+
+
+@pytest.mark.django_db
+class TestProfiles:
+
+    @pytest.fixture
+    def people(self):
+        from client.models import Client
+        from company.models import Company
+
+        owner = User.objects.create_user(username='owner', email='owner@example.com')
+        Company.objects.create(user=owner, name='Barbearia Central')
+        customer = User.objects.create_user(username='customer')
+        Client.objects.create(user=customer, name='Maria', phone='11999999999')
+        admin = User.objects.create_user(username='admin')
+        return owner, customer, admin
+
+    def test_profile_is_one_query_then_cached(self, api_client, people, django_assert_num_queries):
+        owner = people[0]
+        with django_assert_num_queries(1):
+            first = api_client.get(f'/{owner.id}/profile').json()
+        with django_assert_num_queries(0):
+            second = api_client.get(f'/{owner.id}/profile').json()
+
+        assert first == second
+        assert first['is_company'] and not first['is_client']
+        assert first['profile_data'] == {'company_id': str(owner.company.id), 'name': 'Barbearia Central', 'description': None}
+
+    def test_profile_saves_invalidate(self, api_client, people):
+        owner, customer, _ = people
+        api_client.get(f'/{owner.id}/profile')
+        api_client.get(f'/{customer.id}/profile')
+
+        owner.company.name = 'Barbearia Sul'
+        owner.company.save()
+        customer.client.delete()
+
+        assert api_client.get(f'/{owner.id}/profile').json()['profile_data']['name'] == 'Barbearia Sul'
+        assert api_client.get(f'/{customer.id}/profile').json()['profile_data'] is None
+
+    def test_reassigned_profile_invalidates_old_owner(self, api_client, people):
+        from company.models import Company
+
+        owner, _, admin = people
+        api_client.get(f'/{owner.id}/profile')
+        api_client.get(f'/{admin.id}/profile')
+
+        company = Company.objects.get(user=owner)
+        company.user = admin
+        company.save()
+
+        assert api_client.get(f'/{owner.id}/profile').json()['profile_data'] is None
+        assert api_client.get(f'/{admin.id}/profile').json()['profile_data']['name'] == 'Barbearia Central'
+
+    def test_missing_user(self, api_client):
+        assert api_client.get('/999/profile').status_code == 404
+
+    def test_batch_profiles(self, api_client, people, django_assert_num_queries):
+        owner, customer, admin = people
+        api_client.get(f'/{customer.id}/profile')
+        ids = [admin.id, 999, customer.id, owner.id]
+
+        # Só os que não estavam no cache, numa consulta
+        with django_assert_num_queries(1):
+            response = api_client.get('/profiles', query_params={'ids': ids})
+        with django_assert_num_queries(0):
+            api_client.get('/profiles', query_params={'ids': [owner.id, customer.id]})
+
+        assert [profile['user_id'] for profile in response.json()] == [admin.id, customer.id, owner.id]
+        assert response.json()[1]['profile_data']['name'] == 'Maria'